@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark: per-request crew setup cost, fresh build vs. pooled checkout.
+
+Usage: python benchmarks/bench_crew_pool.py [iterations] [endpoint ...]
+
+No LLM calls are made; only crew construction and checkout are timed. Crews are
+built with ApexLLM, CrewAI's LiteLLM-based LLM, which looks for no credentials
+until it makes a call. As in the load benchmark, a placeholder OPENAI_API_KEY is
+set if none is configured, so nothing built with the crew stops for a missing key.
+"""
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+os.environ.setdefault("OPENAI_API_KEY", "sk-benchmark")
+
+from apex_ai_hierarchical_life_companion import crew_registry
+from apex_ai_hierarchical_life_companion.crew_pool import CrewPool
+
+
+def _time(fn, iterations: int):
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+def _row(label: str, samples):
+    samples = sorted(samples)
+    p95 = samples[max(0, int(len(samples) * 0.95) - 1)]
+    return f"{label:<32} mean {statistics.mean(samples):9.3f} ms   p95 {p95:9.3f} ms"
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    endpoints = sys.argv[2:] or ["generate-brief", "daily-path", "voice-command"]
+
+    print(f"\n{'='*72}")
+    print(f"Crew setup cost per request ({iterations} iterations)")
+    print(f"{'='*72}")
+
+    for endpoint in endpoints:
+        try:
+            crew_registry.build_crew(endpoint)
+        except Exception as e:
+            print(f"{endpoint}: skipped ({e})")
+            continue
+
+        fresh = _time(lambda: crew_registry.build_crew(endpoint), iterations)
+
+        pool = CrewPool(size=1)
+        pool.warm([endpoint])
+
+        def checkout():
+            with pool.checkout(endpoint):
+                pass
+
+        pooled = _time(checkout, iterations)
+
+        print(f"\n{endpoint}")
+        print(_row("  build_crew()", fresh))
+        print(_row("  CrewPool.checkout()", pooled))
+        print(f"  speedup: {statistics.mean(fresh) / max(statistics.mean(pooled), 1e-9):.0f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,341 @@
+#!/usr/bin/env python3
+"""
+Offline load benchmark of the API server: orchestration overhead without OpenAI or tool quota.
+
+Usage:
+    python benchmarks/bench_load.py [--scenario NAME ...] [--users N] [--duration SECONDS]
+                                    [--json OUT] [--baseline FILE [--tolerance 0.25]]
+
+The server runs in a subprocess (offline_server.py) against the fake LLM and
+tool backends in fake_backends.py, so results are deterministic and cost
+nothing. Virtual users loop over their scenario's requests with think time in
+between, in the style of locust. Each scenario reports throughput, p50/p95/p99
+latency per endpoint, 429 rejections, errors, and the server's resident
+memory.
+
+Scenarios:
+    brief-burst   every user requests a new Alpha Brief at once, with no think
+                  time; each request is a cache miss and runs a crew
+    brief-cached  the same ticker over and over: cache and coalescing overhead only
+    mixed         interactive users (voice command, logistics check) with short
+                  think time, alongside background users (weekly sync, memory)
+
+With ``--baseline`` (the ``--json`` output of an earlier run), the exit status is
+1 when a scenario has errors, or when its p95 latency rises or its throughput
+falls by more than ``--tolerance`` compared with the baseline. CI uses this to
+catch overhead regressions.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+from fake_backends import FakeBackendServer, FakeConfig, fake_environment
+
+Payload = Callable[[int, int], Dict[str, Any]]
+
+
+class UserType:
+    """A kind of virtual user: the requests it cycles through and its think time between them."""
+
+    def __init__(self, name: str, weight: int, think_time: float, requests: List[Tuple[str, Payload]]):
+        self.name = name
+        self.weight = weight
+        self.think_time = think_time
+        self.requests = requests
+
+
+SCENARIOS: Dict[str, List[UserType]] = {
+    "brief-burst": [
+        UserType("brief", 1, 0.0, [
+            ("generate-brief", lambda user, i: {"userId": f"bench-{user}", "ticker": f"B{user}X{i}"}),
+        ]),
+    ],
+    "brief-cached": [
+        UserType("brief", 1, 0.0, [
+            ("generate-brief", lambda user, i: {"userId": f"bench-{user}", "ticker": "AAPL"}),
+        ]),
+    ],
+    "mixed": [
+        UserType("interactive", 7, 0.5, [
+            ("voice-command", lambda user, i: {
+                "userId": f"bench-{user}", "command": "What's next on my calendar?",
+                "intent": "calendar_query", "entities": {},
+            }),
+            ("logistics/check", lambda user, i: {"userId": f"bench-{user}", "eventId": f"evt-{i}"}),
+        ]),
+        UserType("background", 3, 2.0, [
+            ("weekly-sync", lambda user, i: {"userId": f"bench-{user}"}),
+            ("memory/process", lambda user, i: {
+                "userId": f"bench-{user}", "interactionType": "benchmark", "feedback": "ok",
+            }),
+        ]),
+    ],
+}
+
+
+def _percentile(sorted_values: List[float], q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(round(q * (len(sorted_values) - 1))))]
+
+
+def _summary(samples: List[Tuple[str, int, float]], elapsed: float) -> Dict[str, Any]:
+    latencies = sorted(ms for _, status, ms in samples if 200 <= status < 300)
+    return {
+        "requests": len(samples),
+        "ok": len(latencies),
+        "rejected": sum(1 for _, status, _ in samples if status == 429),
+        "errors": sum(1 for _, status, _ in samples if status != 429 and not 200 <= status < 300),
+        "throughput_rps": round(len(latencies) / elapsed, 3) if elapsed else 0.0,
+        "mean_ms": round(statistics.mean(latencies), 1) if latencies else 0.0,
+        "p50_ms": round(_percentile(latencies, 0.50), 1),
+        "p95_ms": round(_percentile(latencies, 0.95), 1),
+        "p99_ms": round(_percentile(latencies, 0.99), 1),
+    }
+
+
+class MemorySampler:
+    """Samples a process's resident set size from /proc (Linux) while a scenario runs."""
+
+    def __init__(self, pid: int, interval: float = 0.2):
+        self.pid = pid
+        self.interval = interval
+        self.peak_mb = 0.0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def rss_mb(self) -> Optional[float]:
+        try:
+            with open(f"/proc/{self.pid}/status") as f:
+                for line in f:
+                    if line.startswith("VmRSS:"):
+                        return int(line.split()[1]) / 1024
+        except OSError:
+            return None
+        return None
+
+    def _run(self):
+        while not self._stop.is_set():
+            rss = self.rss_mb()
+            if rss is not None:
+                self.peak_mb = max(self.peak_mb, rss)
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+
+def _post(base_url: str, endpoint: str, payload: Dict[str, Any], timeout: float) -> int:
+    request = urllib.request.Request(
+        f"{base_url}/api/{endpoint}",
+        data=json.dumps(payload).encode(),
+        headers={"Content-Type": "application/json"},
+        method="POST",
+    )
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            response.read()
+            return response.status
+    except urllib.error.HTTPError as e:
+        return e.code
+    except OSError:
+        return 0
+
+
+def run_scenario(base_url: str, user_types: List[UserType], users: int, duration: float, timeout: float):
+    """Run ``users`` virtual users for ``duration`` seconds; returns (endpoint, status, ms) samples and elapsed time."""
+    assigned: List[UserType] = []
+    total_weight = sum(t.weight for t in user_types)
+    for user_type in user_types:
+        assigned.extend([user_type] * max(1, round(users * user_type.weight / total_weight)))
+    assigned = assigned[:users] if len(assigned) > users else assigned
+
+    samples: List[Tuple[str, int, float]] = []
+    lock = threading.Lock()
+    start = threading.Barrier(len(assigned) + 1)
+    stop_at: List[float] = []
+
+    def virtual_user(index: int, user_type: UserType):
+        start.wait()
+        iteration = 0
+        while time.monotonic() < stop_at[0]:
+            endpoint, payload = user_type.requests[iteration % len(user_type.requests)]
+            began = time.perf_counter()
+            status = _post(base_url, endpoint, payload(index, iteration), timeout)
+            elapsed_ms = (time.perf_counter() - began) * 1000
+            with lock:
+                samples.append((endpoint, status, elapsed_ms))
+            iteration += 1
+            if user_type.think_time:
+                time.sleep(user_type.think_time)
+
+    threads = [
+        threading.Thread(target=virtual_user, args=(i, user_type), daemon=True)
+        for i, user_type in enumerate(assigned)
+    ]
+    for thread in threads:
+        thread.start()
+    began = time.monotonic()
+    stop_at.append(began + duration)
+    start.wait()
+    for thread in threads:
+        thread.join()
+    return samples, time.monotonic() - began
+
+
+def _wait_ready(base_url: str, server: subprocess.Popen, timeout: float = 180):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError(f"API server exited with status {server.returncode}")
+        try:
+            with urllib.request.urlopen(f"{base_url}/health", timeout=2):
+                return
+        except OSError:
+            time.sleep(0.5)
+    raise RuntimeError("API server did not become ready")
+
+
+def _free_port() -> int:
+    import socket
+
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(backend: FakeBackendServer, store: str = "none", env: Optional[Dict[str, str]] = None):
+    """Start offline_server.py against ``backend``; returns the process and its base URL once it answers."""
+    port = _free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    state_dir = tempfile.mkdtemp(prefix="apex-bench-")
+    server = subprocess.Popen(
+        [sys.executable, os.path.join(os.path.dirname(__file__), "offline_server.py"), backend.url, str(port)],
+        env={
+            **os.environ,
+            **fake_environment(backend.url),
+            "APEX_STORE_URL": store,
+            "APEX_IDEMPOTENCY_DB": os.path.join(state_dir, "idempotency.sqlite3"),
+            "APEX_TRACE_SAMPLE": "0",
+            "PYTHONUNBUFFERED": "1",
+            **(env or {}),
+        },
+    )
+    try:
+        _wait_ready(base_url, server)
+    except BaseException:
+        server.terminate()
+        raise
+    return server, base_url
+
+
+def compare(results: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    """Regressions of ``results`` against ``baseline``, as messages."""
+    problems = []
+    for name, current in results["scenarios"].items():
+        if current["errors"]:
+            problems.append(f"{name}: {current['errors']} failed requests")
+        before = baseline.get("scenarios", {}).get(name)
+        if before is None:
+            continue
+        if before["p95_ms"] and current["p95_ms"] > before["p95_ms"] * (1 + tolerance):
+            problems.append(f"{name}: p95 {current['p95_ms']} ms vs {before['p95_ms']} ms baseline")
+        if before["throughput_rps"] and current["throughput_rps"] < before["throughput_rps"] * (1 - tolerance):
+            problems.append(
+                f"{name}: throughput {current['throughput_rps']} req/s vs {before['throughput_rps']} req/s baseline"
+            )
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenario", action="append", choices=sorted(SCENARIOS), help="Scenario to run (repeatable; default all)")
+    parser.add_argument("--users", type=int, default=16, help="Virtual users per scenario")
+    parser.add_argument("--duration", type=float, default=30, help="Seconds per scenario")
+    parser.add_argument("--timeout", type=float, default=300, help="Per-request client timeout in seconds")
+    parser.add_argument("--llm-latency", type=float, default=0.05, help="Fake LLM latency before the first token (s)")
+    parser.add_argument("--token-interval", type=float, default=0.0005, help="Fake LLM time per token (s)")
+    parser.add_argument("--completion-tokens", type=int, default=150, help="Tokens in each fake final answer")
+    parser.add_argument("--tool-steps", type=int, default=1, help="Tool calls the fake LLM makes per task")
+    parser.add_argument("--tool-latency", type=float, default=0.02, help="Fake tool API latency (s)")
+    parser.add_argument("--store", default="none", help="APEX_STORE_URL for the server (default: none)")
+    parser.add_argument("--json", help="Write results to this file")
+    parser.add_argument("--baseline", help="Fail if results regress against this earlier --json output")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed regression against the baseline")
+    args = parser.parse_args()
+
+    config = FakeConfig(
+        llm_latency=args.llm_latency,
+        token_interval=args.token_interval,
+        completion_tokens=args.completion_tokens,
+        tool_steps=args.tool_steps,
+        tool_latency=args.tool_latency,
+    )
+    backend = FakeBackendServer(config).start()
+    server, base_url = start_server(backend, args.store)
+
+    results: Dict[str, Any] = {
+        "config": {key: value for key, value in vars(args).items() if key not in ("json", "baseline")},
+        "scenarios": {},
+    }
+    try:
+        sampler = MemorySampler(server.pid)
+        results["rss_ready_mb"] = round(sampler.rss_mb() or 0.0, 1)
+
+        for name in args.scenario or list(SCENARIOS):
+            print(f"\n{'='*72}\n{name}: {args.users} users for {args.duration:.0f}s\n{'='*72}")
+            with MemorySampler(server.pid) as memory:
+                samples, elapsed = run_scenario(base_url, SCENARIOS[name], args.users, args.duration, args.timeout)
+            summary = _summary(samples, elapsed)
+            summary["rss_peak_mb"] = round(memory.peak_mb, 1)
+            summary["endpoints"] = {
+                endpoint: _summary([s for s in samples if s[0] == endpoint], elapsed)
+                for endpoint in sorted({s[0] for s in samples})
+            }
+            results["scenarios"][name] = summary
+            print(
+                f"{summary['requests']} requests ({summary['rejected']} rejected, {summary['errors']} errors), "
+                f"{summary['throughput_rps']} req/s, peak RSS {summary['rss_peak_mb']} MB"
+            )
+            for endpoint, stats in summary["endpoints"].items():
+                print(
+                    f"  {endpoint:<18} n={stats['ok']:<5} p50 {stats['p50_ms']:9.1f} ms"
+                    f"   p95 {stats['p95_ms']:9.1f} ms   p99 {stats['p99_ms']:9.1f} ms"
+                )
+        results["fake_backend_calls"] = dict(sorted(backend.calls.items()))
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+        backend.shutdown()
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            problems = compare(results, json.load(f), args.tolerance)
+        for problem in problems:
+            print(f"REGRESSION {problem}")
+        if problems:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
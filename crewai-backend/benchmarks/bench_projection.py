@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark: Monte Carlo financial projection (projection.project).
+
+Usage:
+    python benchmarks/bench_projection.py [--paths N] [--months N] [--repeat N]
+                                          [--python-paths N] [--json OUT]
+
+Times a projection with and without a decision at the requested size (default
+100,000 paths x 120 months) and reports mean and p95 wall time, path-months per
+second and peak memory. For scale, the same model is also run as a plain Python
+loop over ``--python-paths`` paths and extrapolated to the full size.
+No network or LLM calls are made.
+"""
+import argparse
+import json
+import math
+import os
+import random
+import statistics
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from apex_ai_hierarchical_life_companion.projection import Decision, FinancialProfile, project
+
+PROFILE = FinancialProfile(cash=30000, invested=80000, monthly_income=7500, monthly_expenses=5200)
+DECISION = Decision(start_month=3, income_change=-0.4, income_gap_months=6, expense_change=300, one_off_cost=15000)
+
+
+def python_projection(profile: FinancialProfile, decision: Decision, paths: int, months: int, seed: int = 0):
+    """The projection model path by path in plain Python, as a reference for the vectorized engine."""
+    rng = random.Random(seed)
+    return_sigma = profile.annual_volatility / math.sqrt(12)
+    return_mu = math.log1p(profile.annual_return) / 12 - return_sigma ** 2 / 2
+    income_mu = math.log1p(profile.income_growth) - profile.income_volatility ** 2 / 2
+    expense_mu = math.log1p(profile.inflation) - profile.expense_volatility ** 2 / 2
+    shock_hazard = 1 - (1 - profile.income_shock_probability) ** (1 / 12)
+    cash_growth = (1 + profile.cash_rate) ** (1 / 12)
+    finals = []
+    for _ in range(paths):
+        cash, invested = profile.cash, profile.invested
+        income, expenses = profile.monthly_income, profile.monthly_expenses
+        shock_left = 0
+        for month in range(months):
+            invested *= math.exp(return_mu + return_sigma * rng.gauss(0, 1))
+            if month and month % 12 == 0:
+                income *= math.exp(income_mu + profile.income_volatility * rng.gauss(0, 1))
+                expenses *= math.exp(expense_mu + profile.expense_volatility * rng.gauss(0, 1))
+            if shock_left == 0 and rng.random() < shock_hazard:
+                shock_left = profile.income_shock_months
+            earned = 0.0 if shock_left else income
+            shock_left = max(shock_left - 1, 0)
+            spent = expenses
+            if month >= decision.start_month:
+                earned = 0.0 if month < decision.start_month + decision.income_gap_months else earned * (1 + decision.income_change)
+                spent += decision.expense_change + (decision.one_off_cost if month == decision.start_month else 0.0)
+            cash = cash * cash_growth + earned - spent
+            moved = max(cash - spent * profile.cash_buffer_months, 0.0) - min(max(-cash, 0.0), invested)
+            invested += moved
+            cash -= moved
+        finals.append(cash + invested)
+    return finals
+
+
+def _time(fn, repeat: int):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+def _stats(samples, path_months: int):
+    ordered = sorted(samples)
+    mean = statistics.mean(ordered)
+    return {
+        "mean_ms": round(mean, 2),
+        "p95_ms": round(ordered[max(0, math.ceil(len(ordered) * 0.95) - 1)], 2),
+        "path_months_per_s": round(path_months / (mean / 1000)),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--paths", type=int, default=100_000, help="Monte Carlo paths")
+    parser.add_argument("--months", type=int, default=120, help="Months projected")
+    parser.add_argument("--repeat", type=int, default=5, help="Timed runs per case")
+    parser.add_argument("--python-paths", type=int, default=500, help="Paths for the plain Python reference (0 skips it)")
+    parser.add_argument("--json", help="Write the results to this file")
+    args = parser.parse_args()
+
+    path_months = args.paths * args.months
+    project(PROFILE, DECISION, paths=1000, months=12)  # warm up NumPy
+    results = {"paths": args.paths, "months": args.months}
+    for label, decision in (("baseline", None), ("decision", DECISION)):
+        results[label] = _stats(
+            _time(lambda: project(PROFILE, decision, paths=args.paths, months=args.months), args.repeat), path_months
+        )
+    tracemalloc.start()
+    project(PROFILE, DECISION, paths=args.paths, months=args.months)
+    results["peak_memory_mb"] = round(tracemalloc.get_traced_memory()[1] / 2 ** 20, 1)
+    tracemalloc.stop()
+
+    if args.python_paths:
+        samples = _time(lambda: python_projection(PROFILE, DECISION, args.python_paths, args.months), 1)
+        results["python_reference"] = {
+            "paths": args.python_paths,
+            "ms": round(samples[0], 1),
+            "extrapolated_ms": round(samples[0] * args.paths / args.python_paths),
+        }
+
+    print(f"\n{'='*72}")
+    print(f"Monte Carlo projection, {args.paths:,} paths x {args.months} months ({args.repeat} runs)")
+    print(f"{'='*72}")
+    for label in ("baseline", "decision"):
+        stats = results[label]
+        print(
+            f"{label:<12} mean {stats['mean_ms']:9.1f} ms   p95 {stats['p95_ms']:9.1f} ms   "
+            f"{stats['path_months_per_s'] / 1e6:7.1f} M path-months/s"
+        )
+    print(f"peak memory  {results['peak_memory_mb']} MB")
+    if "python_reference" in results:
+        reference = results["python_reference"]
+        speedup = reference["extrapolated_ms"] / results["decision"]["mean_ms"]
+        print(
+            f"plain Python {reference['ms']:.0f} ms for {reference['paths']:,} paths, "
+            f"~{reference['extrapolated_ms'] / 1000:.1f} s extrapolated ({speedup:.0f}x slower)"
+        )
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
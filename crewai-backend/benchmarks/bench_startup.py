@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""
+Startup benchmark: import time of the API module and time to first request.
+
+Usage: python benchmarks/bench_startup.py [runs] [--importtime] [--json OUT]
+
+Each run uses a fresh interpreter. Three things are measured:
+- import: seconds to import api.server in a new process;
+- cold: seconds from spawning a server process until ``/health`` first answers
+  (first request) and until ``/ready`` reports warm crews;
+- preloaded: the same, timed from the fork of a process that already ran
+  crew_registry.preload_modules(). This is what a gunicorn worker started with
+  APEX_PRELOAD=1 sees.
+
+``--importtime`` prints the slowest modules ``python -X importtime`` reports for
+the server import. The server gets placeholder credentials and an unreachable
+LLM endpoint; startup makes no network calls.
+"""
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+from typing import Dict, List, Optional
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+from fake_backends import fake_environment
+
+SRC = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "src"))
+SERVER_MODULE = "apex_ai_hierarchical_life_companion.api.server"
+
+IMPORT_SCRIPT = f"""
+import sys, time
+sys.path.insert(0, {SRC!r})
+started = time.perf_counter()
+import {SERVER_MODULE}
+print(time.perf_counter() - started)
+"""
+
+SERVE_SCRIPT = f"""
+import os, sys, time
+sys.path.insert(0, {SRC!r})
+port = int(sys.argv[1])
+if sys.argv[2] == "preloaded":
+    from apex_ai_hierarchical_life_companion import crew_registry
+    crew_registry.preload_modules()
+    if os.fork():
+        os.wait()
+        sys.exit(0)
+print(time.time(), flush=True)
+import uvicorn
+from {SERVER_MODULE} import app
+uvicorn.run(app, host="127.0.0.1", port=port, log_level="warning")
+"""
+
+
+def _env() -> Dict[str, str]:
+    return {
+        **os.environ,
+        **fake_environment("http://127.0.0.1:9"),
+        "APEX_STORE_URL": "none",
+        "APEX_IDEMPOTENCY_DB": os.path.join("/tmp", f"apex-bench-startup-{os.getpid()}.sqlite3"),
+        "APEX_TRACE_SAMPLE": "0",
+    }
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _wait_for(url: str, started: float, timeout: float = 300) -> Optional[float]:
+    while time.time() - started < timeout:
+        try:
+            with urllib.request.urlopen(url, timeout=2):
+                return time.time() - started
+        except OSError:
+            time.sleep(0.02)
+    return None
+
+
+def time_import() -> float:
+    output = subprocess.run(
+        [sys.executable, "-c", IMPORT_SCRIPT], env=_env(), capture_output=True, text=True, check=True
+    ).stdout
+    return float(output.strip().splitlines()[-1])
+
+
+def time_startup(mode: str) -> Dict[str, Optional[float]]:
+    port = _free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    spawned = time.time()
+    server = subprocess.Popen(
+        [sys.executable, "-c", SERVE_SCRIPT, str(port), mode], env=_env(), stdout=subprocess.PIPE, text=True
+    )
+    try:
+        # Timed from the moment the serving process starts: spawn (cold) or fork (preloaded)
+        started = float(server.stdout.readline()) if mode == "preloaded" else spawned
+        return {
+            "first_request_s": _wait_for(f"{base_url}/health", started),
+            "ready_s": _wait_for(f"{base_url}/ready", started),
+        }
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+
+def slowest_imports(limit: int = 15) -> List[str]:
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", IMPORT_SCRIPT], env=_env(), capture_output=True, text=True
+    )
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        # "import time: <self us> | <cumulative us> | <module>"
+        _, cumulative, name = line[len("import time:"):].split("|", 2)
+        rows.append((int(cumulative), name.strip()))
+    rows.sort(reverse=True)
+    return [f"{us / 1e6:8.3f} s  {name}" for us, name in rows[:limit]]
+
+
+def _stats(values: List[Optional[float]]) -> Dict[str, Optional[float]]:
+    values = [v for v in values if v is not None]
+    if not values:
+        return {"mean": None, "min": None, "max": None}
+    return {"mean": round(statistics.mean(values), 3), "min": round(min(values), 3), "max": round(max(values), 3)}
+
+
+def main():
+    args = sys.argv[1:]
+    runs = int(args[0]) if args and args[0].isdigit() else 3
+    json_out = args[args.index("--json") + 1] if "--json" in args else None
+
+    results: Dict[str, Dict] = {"import_s": _stats([time_import() for _ in range(runs)])}
+    for mode in ("cold", "preloaded"):
+        samples = [time_startup(mode) for _ in range(runs)]
+        results[mode] = {key: _stats([s[key] for s in samples]) for key in ("first_request_s", "ready_s")}
+
+    print(f"\n{'='*72}\nServer startup ({runs} runs)\n{'='*72}")
+    print(f"{'import api.server':<32} mean {results['import_s']['mean']} s   min {results['import_s']['min']} s")
+    for mode in ("cold", "preloaded"):
+        for key, label in (("first_request_s", "first request"), ("ready_s", "ready")):
+            stats = results[mode][key]
+            print(f"{mode + ' ' + label:<32} mean {stats['mean']} s   min {stats['min']} s")
+
+    if "--importtime" in args:
+        print("\nSlowest imports (cumulative):")
+        for row in slowest_imports():
+            print(f"  {row}")
+
+    if json_out:
+        with open(json_out, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+Cost and latency of model tier plans on the offline load scenarios.
+
+Usage:
+    python benchmarks/bench_tiers.py [--scenario NAME ...] [--plan NAME ...] [--users N]
+                                     [--duration SECONDS] [--profiles FILE] [--prices FILE] [--json OUT]
+
+Each plan runs the bench_load.py scenarios on a fresh server:
+    configured   the model_tier values in agents.yaml and tasks.yaml
+    fast, standard, premium
+                 every agent on that one tier (APEX_MODEL_TIER)
+
+For each plan and scenario the report gives throughput, p50/p95 latency, LLM
+requests and tokens per model, and the LLM cost per successful request at the
+prices in PRICES.
+
+Everything runs against the fake LLM, so the prompts and answers are the same
+whatever the model. Token counts therefore match across plans, and cost
+differences come only from which model serves which calls. Latency per model
+follows MODEL_PROFILES, a modelled time to first token and time per token. Pass
+``--profiles`` with figures measured for your account, as JSON
+``{"model": [latency_s, token_interval_s]}``. ``--prices`` takes
+``{"model": [usd_per_1m_prompt_tokens, usd_per_1m_completion_tokens]}``.
+"""
+import argparse
+import json
+import os
+import sys
+from typing import Any, Dict, Tuple
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+from bench_load import SCENARIOS, _summary, run_scenario, start_server
+from fake_backends import FakeBackendServer, FakeConfig
+
+PLANS = ("configured", "fast", "standard", "premium")
+
+# USD per million prompt and completion tokens (list prices)
+PRICES: Dict[str, Tuple[float, float]] = {
+    "gpt-4o-mini": (0.15, 0.60),
+    "gpt-4o": (2.50, 10.00),
+    "gpt-4.1": (2.00, 8.00),
+}
+
+# Modelled (time to first token, seconds per token) of each tier's default model
+MODEL_PROFILES: Dict[str, Tuple[float, float]] = {
+    "gpt-4o-mini": (0.30, 0.006),
+    "gpt-4o": (0.50, 0.012),
+    "gpt-4.1": (0.60, 0.012),
+}
+
+
+def cost(usage: Dict[str, Dict[str, int]], prices: Dict[str, Tuple[float, float]]) -> float:
+    """LLM cost in USD of the per-model ``usage``; models without a price count as free."""
+    total = 0.0
+    for model, counts in usage.items():
+        prompt_price, completion_price = prices.get(model, (0.0, 0.0))
+        total += counts["prompt_tokens"] * prompt_price / 1e6 + counts["completion_tokens"] * completion_price / 1e6
+    return total
+
+
+def run_plan(plan: str, args, backend: FakeBackendServer, prices) -> Dict[str, Any]:
+    # An empty APEX_MODEL_TIER leaves the YAML tiers in effect
+    env = {"APEX_MODEL_TIER": "" if plan == "configured" else plan}
+    server, base_url = start_server(backend, env=env)
+    results: Dict[str, Any] = {}
+    try:
+        for name in args.scenario or list(SCENARIOS):
+            backend.reset_usage()
+            samples, elapsed = run_scenario(base_url, SCENARIOS[name], args.users, args.duration, args.timeout)
+            summary = _summary(samples, elapsed)
+            usage = {model: dict(counts) for model, counts in backend.usage.items()}
+            total = cost(usage, prices)
+            summary["llm_usage"] = usage
+            summary["cost_usd"] = round(total, 6)
+            summary["cost_per_request_usd"] = round(total / summary["ok"], 6) if summary["ok"] else None
+            results[name] = summary
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+    return results
+
+
+def print_report(report: Dict[str, Dict[str, Any]]):
+    for scenario in next(iter(report.values())):
+        print(f"\n{'='*88}\n{scenario}\n{'='*88}")
+        print(f"{'plan':<12}{'req/s':>8}{'p50 ms':>10}{'p95 ms':>10}{'$/request':>12}   calls by model")
+        for plan, scenarios in report.items():
+            stats = scenarios[scenario]
+            per_request = stats["cost_per_request_usd"]
+            calls = ", ".join(f"{model} {counts['requests']}" for model, counts in sorted(stats["llm_usage"].items()))
+            print(
+                f"{plan:<12}{stats['throughput_rps']:>8}{stats['p50_ms']:>10.0f}{stats['p95_ms']:>10.0f}"
+                f"{per_request if per_request is not None else '-':>12}   {calls}"
+            )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenario", action="append", choices=sorted(SCENARIOS), help="Scenario to run (repeatable; default all)")
+    parser.add_argument("--plan", action="append", choices=PLANS, help="Tier plan to run (repeatable; default all)")
+    parser.add_argument("--users", type=int, default=8, help="Virtual users per scenario")
+    parser.add_argument("--duration", type=float, default=60, help="Seconds per scenario")
+    parser.add_argument("--timeout", type=float, default=300, help="Per-request client timeout in seconds")
+    parser.add_argument("--completion-tokens", type=int, default=150, help="Tokens in each fake final answer")
+    parser.add_argument("--tool-steps", type=int, default=1, help="Tool calls the fake LLM makes per task")
+    parser.add_argument("--profiles", help="JSON file of per-model [latency_s, token_interval_s]")
+    parser.add_argument("--prices", help="JSON file of per-model [usd_per_1m_prompt, usd_per_1m_completion]")
+    parser.add_argument("--json", help="Write the report to this file")
+    args = parser.parse_args()
+
+    profiles = dict(MODEL_PROFILES)
+    prices = dict(PRICES)
+    for path, table in ((args.profiles, profiles), (args.prices, prices)):
+        if path:
+            with open(path) as f:
+                table.update({model: tuple(values) for model, values in json.load(f).items()})
+
+    config = FakeConfig(
+        completion_tokens=args.completion_tokens, tool_steps=args.tool_steps, model_profiles=profiles,
+    )
+    backend = FakeBackendServer(config).start()
+    report: Dict[str, Dict[str, Any]] = {}
+    try:
+        for plan in args.plan or list(PLANS):
+            print(f"Running plan '{plan}'...")
+            report[plan] = run_plan(plan, args, backend, prices)
+    finally:
+        backend.shutdown()
+
+    print_report(report)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"prices": prices, "profiles": profiles, "plans": report}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,409 @@
+"""
+Local stand-ins for every external service the crews call, for offline benchmarks.
+
+One threaded HTTP server plays all of them:
+- ``/v1/chat/completions`` and ``/v1/embeddings``: an OpenAI-compatible fake LLM.
+  Replies are deterministic. While a task has tool calls left (``tool_steps``),
+  the LLM asks for the next tool listed in the agent's prompt, with placeholder
+  arguments. After that it gives a final answer of ``completion_tokens`` words.
+  Latency is ``llm_latency`` plus one ``token_interval`` per token, or the
+  pair given for the requested model in ``model_profiles``. Streaming is
+  supported, and requests and tokens are counted per model (``usage``). Crews reach it through ``OPENAI_API_BASE`` (LiteLLM) and
+  ``OPENAI_BASE_URL`` (the openai client used by MemoryTool and SimulationTool).
+- ``/_/<host>/<path>``: canned responses shaped like each tool's API, for example
+  Serper, RapidAPI (Booking, Skyscanner, Viator), Google Maps, Calendar and Gmail,
+  LinkedIn, Notion, Asana, Trello and Jira. Any other GET returns a small HTML page
+  for ScrapeWebsiteTool. Every tool response waits ``tool_latency`` first.
+
+redirect_outbound() runs inside the API process. It rewrites every outbound
+``requests`` and ``httplib2`` call (googleapiclient) to the ``/_/<host>`` routes,
+so the tools run unmodified and nothing leaves the machine.
+"""
+import ast
+import hashlib
+import json
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+# Tool listing in CrewAI's agent prompt
+_TOOL_PATTERN = re.compile(r"Tool Name: (.+?)\nTool Arguments: (\{.*?\})\nTool Description:", re.S)
+
+# CrewAI's built-in delegation tools need real coworker names; the fake never calls them
+_DELEGATION_PREFIXES = ("Delegate work", "Ask question")
+
+_FILLER = (
+    "market", "momentum", "signal", "risk", "portfolio", "outlook", "earnings", "growth",
+    "schedule", "priority", "focus", "energy", "travel", "budget", "mentor", "review",
+)
+
+_PLACEHOLDERS = {"str": "benchmark", "int": 1, "float": 1.0, "bool": False, "dict": {}, "list": []}
+
+
+class FakeConfig:
+    """Latency and size knobs of the fake backends; see the module docstring."""
+
+    def __init__(
+        self,
+        llm_latency: float = 0.05,
+        token_interval: float = 0.0005,
+        completion_tokens: int = 150,
+        tool_steps: int = 1,
+        tool_latency: float = 0.02,
+        model_profiles: Optional[Dict[str, Tuple[float, float]]] = None,
+    ):
+        self.llm_latency = llm_latency
+        self.token_interval = token_interval
+        self.completion_tokens = completion_tokens
+        self.tool_steps = tool_steps
+        self.tool_latency = tool_latency
+        # (latency, token interval) per model, for models that answer faster or slower than the default
+        self.model_profiles = model_profiles or {}
+
+    def timing(self, model: str) -> Tuple[float, float]:
+        return self.model_profiles.get(model, (self.llm_latency, self.token_interval))
+
+
+def _text(content: Any) -> str:
+    if isinstance(content, list):
+        return "".join(part.get("text", "") for part in content if isinstance(part, dict))
+    return content or ""
+
+
+def _tools_in_prompt(messages: List[Dict[str, Any]]) -> List[Tuple[str, Dict[str, Any]]]:
+    prompt = "\n".join(_text(m.get("content")) for m in messages if m.get("role") == "system")
+    if not prompt and messages:
+        prompt = _text(messages[0].get("content"))
+    tools = []
+    for name, arguments in _TOOL_PATTERN.findall(prompt):
+        name = name.strip()
+        if name.startswith(_DELEGATION_PREFIXES):
+            continue
+        try:
+            schema = ast.literal_eval(arguments)
+        except (ValueError, SyntaxError):
+            schema = {}
+        args = {
+            arg: _PLACEHOLDERS.get(spec.get("type"), "benchmark") if isinstance(spec, dict) else "benchmark"
+            for arg, spec in schema.items()
+        }
+        tools.append((name, args))
+    return tools
+
+
+def fake_completion(messages: List[Dict[str, Any]], config: FakeConfig) -> str:
+    """The fake LLM's deterministic reply to ``messages``."""
+    steps = sum(1 for m in messages if m.get("role") == "assistant")
+    tools = _tools_in_prompt(messages)
+    if tools and steps < config.tool_steps:
+        name, args = tools[steps % len(tools)]
+        return (
+            "Thought: I should gather more information first.\n"
+            f"Action: {name}\n"
+            f"Action Input: {json.dumps(args)}"
+        )
+    seed = int(hashlib.sha256(_text(messages[-1].get("content")).encode()).hexdigest(), 16) if messages else 0
+    words = [_FILLER[(seed + i) % len(_FILLER)] for i in range(config.completion_tokens)]
+    return "Thought: I now know the final answer\nFinal Answer: " + " ".join(words)
+
+
+def _prompt_tokens(messages: List[Dict[str, Any]]) -> int:
+    # Roughly four characters per token, as with OpenAI's tokenizers on English text
+    return max(1, sum(len(_text(m.get("content"))) for m in messages) // 4)
+
+
+def _embedding(text: str, dimensions: int = 16) -> List[float]:
+    digest = hashlib.sha256(text.encode()).digest()
+    return [(digest[i % len(digest)] - 128) / 128 for i in range(dimensions)]
+
+
+def _html_page(host: str, path: str) -> str:
+    return (
+        f"<html><head><title>{host}</title></head><body><h1>{host}{path}</h1>"
+        + "".join(f"<p>{' '.join(_FILLER)}</p>" for _ in range(20))
+        + "</body></html>"
+    )
+
+
+def tool_response(host: str, method: str, path: str) -> Tuple[int, str, Any]:
+    """Status, content type and body of the stand-in for ``method host/path``."""
+    if host == "google.serper.dev":
+        return 200, "json", {
+            "searchParameters": {"q": "benchmark"},
+            "organic": [
+                {"title": f"Benchmark result {i}", "link": f"https://news.example.com/{i}", "snippet": " ".join(_FILLER)}
+                for i in range(5)
+            ],
+        }
+    if host == "api.serply.io":
+        return 200, "json", {"results": [{"title": "Benchmark result", "link": "https://news.example.com/0", "description": "benchmark"}]}
+    if host == "booking-com.p.rapidapi.com":
+        return 200, "json", {"result": [
+            {"hotel_name": f"Bench Hotel {i}", "min_total_price": 120 + i * 15, "review_score": 8.5,
+             "review_nr": 200, "address": "1 Example Street", "hotel_facilities": ["wifi", "pool"]}
+            for i in range(5)
+        ]}
+    if host == "skyscanner-api.p.rapidapi.com":
+        return 200, "json", {"content": {"results": {"itineraries": [
+            {"pricingOptions": [{"price": {"amount": 300 + i * 25}}],
+             "legs": [{"durationInMinutes": 180, "stopCount": 0, "carriers": {"marketing": [{"name": "Bench Air"}]},
+                       "departure": "2025-01-01T08:00", "arrival": "2025-01-01T11:00"}]}
+            for i in range(5)
+        ]}}}
+    if host == "viator-api.p.rapidapi.com":
+        return 200, "json", {"products": [
+            {"title": f"Bench Tour {i}", "pricing": {"summary": {"fromPrice": 50 + i * 10}},
+             "reviews": {"combinedAverageRating": 4.6, "totalReviews": 120},
+             "duration": {"fixedDurationInMinutes": 180}, "description": " ".join(_FILLER)}
+            for i in range(5)
+        ]}
+    if host == "maps.googleapis.com":
+        leg = {
+            "duration": {"text": "25 mins", "value": 1500},
+            "duration_in_traffic": {"text": "31 mins", "value": 1860},
+            "distance": {"text": "12 km", "value": 12000},
+            "start_address": "Origin", "end_address": "Destination", "steps": [],
+        }
+        return 200, "json", {"status": "OK", "routes": [{"summary": "Bench Route", "legs": [leg], "warnings": []}]}
+    if host == "api.linkedin.com":
+        if path.endswith("/me"):
+            return 200, "json", {"firstName": "Bench", "lastName": "User", "headline": "Engineer",
+                                 "skills": {"values": [{"name": "Python"}]}, "numConnections": 500}
+        return 200, "json", {"elements": [{"title": "Engineer", "companyName": "Example", "skills": [{"name": "Python"}],
+                                           "industry": "Software", "headline": "Engineer"}]}
+    if host == "api.notion.com":
+        page = {"id": "page-1", "url": "https://notion.example.com/page-1", "created_time": "2025-01-01T00:00:00Z",
+                "properties": {"Name": {"type": "title", "title": [{"plain_text": "Bench page"}]}}}
+        if path.endswith("/children"):
+            return 200, "json", {"results": [{"type": "paragraph", "paragraph": {"rich_text": [{"plain_text": "benchmark"}]}}]}
+        if path.endswith("/search") or path.endswith("/query"):
+            return 200, "json", {"results": [page]}
+        return 200, "json", page
+    if host == "app.asana.com":
+        return 200, "json", {"data": [{"gid": "1", "name": "Bench", "completed": False, "due_on": None}]}
+    if host == "api.trello.com":
+        return 200, "json", [{"id": "1", "name": "Bench", "desc": "", "idList": "1", "due": None}]
+    if host.endswith("atlassian.net"):
+        return 200, "json", {"issues": [], "values": [], "key": "BENCH-1", "id": "1"}
+    if host in ("www.googleapis.com", "gmail.googleapis.com"):
+        if "/messages" in path:
+            if path.endswith("/messages"):
+                return 200, "json", {"messages": [{"id": "m1", "threadId": "t1"}], "resultSizeEstimate": 1}
+            return 200, "json", {"id": "m1", "threadId": "t1", "snippet": "benchmark", "labelIds": ["INBOX"],
+                                 "payload": {"headers": [{"name": "Subject", "value": "Bench"},
+                                                         {"name": "From", "value": "bench@example.com"},
+                                                         {"name": "Date", "value": "Wed, 1 Jan 2025 08:00:00 +0000"}]}}
+        event = {"id": "evt1", "summary": "Bench standup", "htmlLink": "https://calendar.example.com/evt1",
+                 "start": {"dateTime": "2025-01-01T09:00:00Z"}, "end": {"dateTime": "2025-01-01T09:30:00Z"},
+                 "attendees": []}
+        if path.endswith("/events") and method == "GET":
+            return 200, "json", {"items": [event]}
+        return 200, "json", event
+    if host == "oauth2.googleapis.com":
+        return 200, "json", {"access_token": "fake-token", "expires_in": 3600, "token_type": "Bearer"}
+    if method == "GET":
+        return 200, "html", _html_page(host, path)
+    return 200, "json", {}
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server: "FakeBackendServer"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _body(self) -> Any:
+        length = int(self.headers.get("Content-Length") or 0)
+        if not length:
+            return None
+        raw = self.rfile.read(length)
+        try:
+            return json.loads(raw)
+        except ValueError:
+            return raw
+
+    def _send(self, status: int, content_type: str, body: Any):
+        data = body.encode() if isinstance(body, str) else json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "text/html" if content_type == "html" else "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _handle(self):
+        path = urlsplit(self.path).path
+        body = self._body()
+        config = self.server.config
+        self.server.count(path)
+        if path.endswith("/chat/completions"):
+            return self._chat(body or {}, config)
+        if path.endswith("/embeddings"):
+            inputs = (body or {}).get("input", "")
+            inputs = inputs if isinstance(inputs, list) else [inputs]
+            return self._send(200, "json", {
+                "object": "list",
+                "data": [{"object": "embedding", "index": i, "embedding": _embedding(str(text))} for i, text in enumerate(inputs)],
+                "model": (body or {}).get("model", "text-embedding-3-small"),
+                "usage": {"prompt_tokens": 8, "total_tokens": 8},
+            })
+        if path.startswith("/_/"):
+            host, _, rest = path[3:].partition("/")
+            time.sleep(config.tool_latency)
+            status, content_type, payload = tool_response(host, self.command, "/" + rest)
+            return self._send(status, content_type, payload)
+        self._send(404, "json", {"error": f"No fake backend for {path}"})
+
+    def _chat(self, request: Dict[str, Any], config: FakeConfig):
+        messages = request.get("messages") or []
+        text = fake_completion(messages, config)
+        tokens = text.split(" ")
+        usage = {
+            "prompt_tokens": _prompt_tokens(messages),
+            "completion_tokens": len(tokens),
+            "total_tokens": _prompt_tokens(messages) + len(tokens),
+        }
+        model = request.get("model", "gpt-4o")
+        self.server.record_usage(model, usage)
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+        latency, token_interval = config.timing(model)
+        time.sleep(latency)
+        if not request.get("stream"):
+            time.sleep(token_interval * len(tokens))
+            return self._send(200, "json", {
+                "id": completion_id,
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}],
+                "usage": usage,
+            })
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.end_headers()
+
+        def chunk(delta: Dict[str, Any], finish: Optional[str] = None, **extra):
+            payload = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [{"index": 0, "delta": delta, "finish_reason": finish}],
+                **extra,
+            }
+            self.wfile.write(f"data: {json.dumps(payload)}\n\n".encode())
+            self.wfile.flush()
+
+        chunk({"role": "assistant", "content": ""})
+        for i, token in enumerate(tokens):
+            time.sleep(token_interval)
+            chunk({"content": token if i == 0 else " " + token})
+        chunk({}, "stop", usage=usage)
+        self.wfile.write(b"data: [DONE]\n\n")
+
+    do_GET = do_POST = do_PUT = do_PATCH = do_DELETE = _handle
+
+
+class FakeBackendServer(ThreadingHTTPServer):
+    """The fake LLM and tool backends on ``host:port`` (port 0 picks a free one)."""
+
+    daemon_threads = True
+
+    def __init__(self, config: Optional[FakeConfig] = None, host: str = "127.0.0.1", port: int = 0):
+        super().__init__((host, port), _Handler)
+        self.config = config or FakeConfig()
+        self.calls: Dict[str, int] = {}
+        self.usage: Dict[str, Dict[str, int]] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def count(self, path: str):
+        key = path.split("/")[2] if path.startswith("/_/") else path
+        with self._lock:
+            self.calls[key] = self.calls.get(key, 0) + 1
+
+    def record_usage(self, model: str, usage: Dict[str, int]):
+        with self._lock:
+            totals = self.usage.setdefault(model, {"requests": 0, "prompt_tokens": 0, "completion_tokens": 0})
+            totals["requests"] += 1
+            totals["prompt_tokens"] += usage["prompt_tokens"]
+            totals["completion_tokens"] += usage["completion_tokens"]
+
+    def reset_usage(self):
+        with self._lock:
+            self.usage = {}
+
+    def start(self) -> "FakeBackendServer":
+        threading.Thread(target=self.serve_forever, name="fake-backends", daemon=True).start()
+        return self
+
+
+# Environment that points an API process at a fake backend, with placeholder credentials for every tool
+def fake_environment(backend_url: str) -> Dict[str, str]:
+    placeholder = "fake-benchmark-key"
+    env = {
+        "OPENAI_API_KEY": "sk-" + placeholder,
+        "OPENAI_API_BASE": backend_url + "/v1",
+        "OPENAI_BASE_URL": backend_url + "/v1",
+        "APEX_FAKE_BACKEND": backend_url,
+        "CREWAI_DISABLE_TELEMETRY": "true",
+        "OTEL_SDK_DISABLED": "true",
+        # Every run must reach the fake LLM for latencies to mean anything
+        "APEX_LLM_CACHE": "off",
+        "APEX_SIMULATION_CACHE": "0",
+        # The fake LLM has no rate limits, and the host's real budget must not be spent or throttle the run
+        "APEX_LLM_RATE_LIMITS": "0",
+        "JIRA_URL": "https://bench.atlassian.net",
+        "JIRA_EMAIL": "bench@example.com",
+        "GOOGLE_CLIENT_ID": placeholder,
+        "GOOGLE_CLIENT_SECRET": placeholder,
+    }
+    for name in (
+        "SERPER_API_KEY", "SERPLY_API_KEY", "BOOKING_API_KEY", "SKYSCANNER_API_KEY", "VIATOR_API_KEY",
+        "GOOGLE_MAPS_API_KEY", "LINKEDIN_API_KEY", "NOTION_API_KEY", "ASANA_API_KEY", "TRELLO_API_KEY",
+        "TRELLO_API_TOKEN", "JIRA_API_TOKEN", "UBER_API_KEY", "LYFT_API_KEY", "GOOGLE_ACCESS_TOKEN",
+        "GOOGLE_REFRESH_TOKEN",
+    ):
+        env[name] = placeholder
+    return env
+
+
+def _redirect(url: str, backend_url: str) -> str:
+    parts = urlsplit(url)
+    if f"{parts.scheme}://{parts.netloc}" == backend_url:
+        return url
+    rewritten = f"{backend_url}/_/{parts.hostname}{parts.path or '/'}"
+    return rewritten + (f"?{parts.query}" if parts.query else "")
+
+
+def redirect_outbound(backend_url: str):
+    """Send every outbound requests/httplib2 call of this process to the fake backend."""
+    import requests
+
+    send = requests.Session.send
+
+    def redirected_send(session, request, **kwargs):
+        request.url = _redirect(request.url, backend_url)
+        return send(session, request, **kwargs)
+
+    requests.Session.send = redirected_send
+
+    try:
+        import httplib2
+    except ImportError:
+        return
+    http_request = httplib2.Http.request
+
+    def redirected_request(http, uri, method="GET", *args, **kwargs):
+        return http_request(http, _redirect(uri, backend_url), method, *args, **kwargs)
+
+    httplib2.Http.request = redirected_request
+
@@ -0,0 +1,35 @@
+#!/usr/bin/env python3
+"""
+Run the API server with every external call sent to a fake backend.
+
+Usage: python benchmarks/offline_server.py <fake backend url> [port]
+
+bench_load.py starts this in a subprocess. The process overrides the OpenAI
+base URLs and all tool credentials (fake_backends.fake_environment()), so real
+keys in the environment are never used. To run it on its own, start a
+FakeBackendServer first and pass its URL.
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+sys.path.insert(0, os.path.dirname(__file__))
+
+from fake_backends import fake_environment, redirect_outbound
+
+
+def main():
+    backend_url = sys.argv[1]
+    port = int(sys.argv[2]) if len(sys.argv) > 2 else 8000
+    for name, value in fake_environment(backend_url).items():
+        os.environ[name] = value
+    redirect_outbound(backend_url)
+
+    import uvicorn
+    from apex_ai_hierarchical_life_companion.api.server import app
+
+    uvicorn.run(app, host="127.0.0.1", port=port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,39 @@
+"""
+Gunicorn settings for the Apex backend.
+
+    gunicorn -c gunicorn.conf.py src.apex_ai_hierarchical_life_companion.api.server:app
+
+With ``APEX_PRELOAD=1`` the master imports CrewAI, LiteLLM and every tool
+module once, before it forks workers. Each worker, including replacements after
+``max_requests`` recycling, then starts with them already loaded and shares
+their memory copy-on-write. Only modules are preloaded, not the app: the app
+opens SQLite connections and thread pools, which must not cross a fork, so do
+not use gunicorn's own ``--preload`` with it.
+"""
+import importlib
+import os
+import sys
+
+bind = f"0.0.0.0:{os.getenv('PORT', 8000)}"
+workers = int(os.getenv("WEB_CONCURRENCY", 4))
+worker_class = "uvicorn.workers.UvicornWorker"
+
+# Recycle workers after this many requests (0 = never), with jitter so they do not restart together
+max_requests = int(os.getenv("APEX_MAX_REQUESTS", 0))
+max_requests_jitter = max_requests // 10
+
+# On SIGTERM a worker drains in-flight crews for APEX_DRAIN_TIMEOUT seconds; give it a margin
+graceful_timeout = float(os.getenv("APEX_DRAIN_TIMEOUT", 25)) + 5
+
+PRELOAD = os.getenv("APEX_PRELOAD", "1").lower() not in ("0", "false", "no")
+
+
+def on_starting(server):
+    if not PRELOAD:
+        return
+    here = os.path.dirname(os.path.abspath(__file__))
+    if here not in sys.path:
+        sys.path.insert(0, here)
+    # Same module path as the app, so workers find it in sys.modules
+    crew_registry = importlib.import_module("src.apex_ai_hierarchical_life_companion.crew_registry")
+    crew_registry.preload_modules()
@@ -0,0 +1,259 @@
+"""
+Admission control and backpressure for crew endpoints.
+
+Every kickoff costs LLM rate limit and memory, so the number running at once is
+capped globally and per user. Requests over the cap wait in a bounded queue;
+anything beyond that (or over the per-user cap, or waiting too long) is
+rejected immediately with a Retry-After hint instead of piling up.
+
+Work is split into priority lanes:
+- interactive: latency-critical requests (voice commands, logistics checks).
+  A number of slots is reserved for this lane and never used by the others.
+- standard: user-facing requests that can tolerate some queueing.
+- background: throughput work (weekly syncs, career reviews, scheduler jobs),
+  additionally capped so it cannot fill every unreserved slot.
+
+Freed slots go to the highest-priority waiter that its lane limit allows.
+
+The controller lives on the event loop: acquire() and release() must be called
+from the loop thread.
+"""
+import asyncio
+import math
+import os
+import time
+from collections import deque
+from enum import Enum
+from typing import Any, Deque, Dict, Optional
+
+
+class Lane(str, Enum):
+    INTERACTIVE = "interactive"
+    STANDARD = "standard"
+    BACKGROUND = "background"
+
+
+# Highest priority first
+LANE_ORDER = (Lane.INTERACTIVE, Lane.STANDARD, Lane.BACKGROUND)
+
+
+class AdmissionRejected(Exception):
+    """Raised when a request cannot be admitted; maps to HTTP 429."""
+
+    def __init__(self, reason: str, retry_after: int):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class Ticket:
+    """Proof of admission; hand it back to release() when the crew run finishes."""
+
+    def __init__(self, user_id: Optional[str], lane: Lane):
+        self.user_id = user_id
+        self.lane = lane
+        self.enqueued_at = time.monotonic()
+        self.admitted_at: Optional[float] = None
+
+
+class AdmissionController:
+    """
+    Args:
+        max_concurrent: Crew runs allowed at once across all lanes and users
+        per_user: Runs (active or queued) allowed per userId, across all lanes
+        max_queue: Requests allowed to wait for a free slot, per lane
+        max_wait: Seconds a request may wait before it is rejected
+        reserved_interactive: Slots only the interactive lane may use
+        background_max: Upper bound on concurrent background runs
+    """
+
+    def __init__(
+        self,
+        max_concurrent: Optional[int] = None,
+        per_user: Optional[int] = None,
+        max_queue: Optional[int] = None,
+        max_wait: Optional[float] = None,
+        reserved_interactive: Optional[int] = None,
+        background_max: Optional[int] = None,
+    ):
+        self.max_concurrent = max_concurrent or int(os.getenv("APEX_MAX_CONCURRENT_CREWS", 8))
+        self.per_user = per_user or int(os.getenv("APEX_MAX_CREWS_PER_USER", 2))
+        self.max_queue = max_queue if max_queue is not None else int(os.getenv("APEX_ADMISSION_QUEUE", 32))
+        self.max_wait = max_wait or float(os.getenv("APEX_ADMISSION_MAX_WAIT", 30))
+        if reserved_interactive is None:
+            reserved_interactive = int(os.getenv("APEX_RESERVED_INTERACTIVE", 2))
+        self.reserved_interactive = min(reserved_interactive, self.max_concurrent - 1)
+        shared = self.max_concurrent - self.reserved_interactive
+        if background_max is None:
+            background_max = int(os.getenv("APEX_BACKGROUND_MAX", max(1, shared // 2)))
+        self.limits: Dict[Lane, int] = {
+            Lane.INTERACTIVE: self.max_concurrent,
+            Lane.STANDARD: shared,
+            Lane.BACKGROUND: min(background_max, shared),
+        }
+        self.active: Dict[Lane, int] = {lane: 0 for lane in Lane}
+        self._per_user: Dict[str, int] = {}
+        self._waiters: Dict[Lane, Deque[asyncio.Future]] = {lane: deque() for lane in Lane}
+        # Metrics
+        self.admitted: Dict[Lane, int] = {lane: 0 for lane in Lane}
+        self.rejected: Dict[str, int] = {"queue_full": 0, "user_limit": 0, "wait_timeout": 0}
+        self.max_queue_depth: Dict[Lane, int] = {lane: 0 for lane in Lane}
+        self.wait_seconds_total: Dict[Lane, float] = {lane: 0.0 for lane in Lane}
+        self.wait_seconds_max: Dict[Lane, float] = {lane: 0.0 for lane in Lane}
+        self._run_seconds_avg = 30.0
+
+    @property
+    def total_active(self) -> int:
+        return sum(self.active.values())
+
+    @property
+    def queue_depth(self) -> int:
+        return sum(len(waiters) for waiters in self._waiters.values())
+
+    def _has_slot(self, lane: Lane) -> bool:
+        if self.total_active >= self.max_concurrent or self.active[lane] >= self.limits[lane]:
+            return False
+        if lane is Lane.INTERACTIVE:
+            return True
+        # Standard and background work together may never touch the reserved slots.
+        shared_active = self.total_active - self.active[Lane.INTERACTIVE]
+        return shared_active < self.max_concurrent - self.reserved_interactive
+
+    def has_capacity(self) -> bool:
+        """Whether a run could start right now without queueing (used to pull shared work)."""
+        return self.queue_depth == 0 and self.total_active < self.max_concurrent
+
+    def retry_after(self, lane: Lane = Lane.STANDARD) -> int:
+        """Estimate in seconds until a slot frees up for ``lane``, from the average run time."""
+        backlog = len(self._waiters[lane]) + 1
+        return max(1, math.ceil(self._run_seconds_avg * backlog / self.limits[lane]))
+
+    def _reject(self, reason: str, lane: Lane):
+        self.rejected[reason] += 1
+        raise AdmissionRejected(reason, self.retry_after(lane))
+
+    async def acquire(
+        self,
+        user_id: Optional[str] = None,
+        lane: Lane = Lane.STANDARD,
+        max_wait: Optional[float] = None,
+    ) -> Ticket:
+        """
+        Wait for a crew slot in ``lane``, or raise AdmissionRejected right away if none can be had.
+
+        ``max_wait`` shortens the configured wait, e.g. to what is left of a request's deadline.
+        """
+        wait = self.max_wait if max_wait is None else max(0.0, min(self.max_wait, max_wait))
+        ticket = Ticket(user_id, lane)
+        if user_id is not None:
+            self._count_user(ticket)
+
+        waiters = self._waiters[lane]
+        if waiters or not self._has_slot(lane):
+            if len(waiters) >= self.max_queue:
+                self._forget_user(ticket)
+                self._reject("queue_full", lane)
+            waiter = asyncio.get_running_loop().create_future()
+            waiters.append(waiter)
+            self.max_queue_depth[lane] = max(self.max_queue_depth[lane], len(waiters))
+            try:
+                await asyncio.wait_for(asyncio.shield(waiter), timeout=wait)
+            except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+                if waiter.done() and not waiter.cancelled():
+                    # A slot was handed over just as we gave up; pass it on.
+                    self.active[lane] -= 1
+                    self._wake_next()
+                else:
+                    waiter.cancel()
+                    waiters.remove(waiter)
+                self._forget_user(ticket)
+                if isinstance(e, asyncio.CancelledError):
+                    raise
+                self._reject("wait_timeout", lane)
+        else:
+            self.active[lane] += 1
+
+        ticket.admitted_at = time.monotonic()
+        waited = ticket.admitted_at - ticket.enqueued_at
+        self.admitted[lane] += 1
+        self.wait_seconds_total[lane] += waited
+        self.wait_seconds_max[lane] = max(self.wait_seconds_max[lane], waited)
+        return ticket
+
+    def reserve_user(self, user_id: str, lane: Lane = Lane.STANDARD) -> Ticket:
+        """
+        Count one run against ``user_id``'s cap without taking a crew slot.
+
+        A batch holds one reservation for all of its runs, which are then
+        admitted without a user. Hand the ticket to release_user() when it ends.
+        """
+        ticket = Ticket(user_id, lane)
+        self._count_user(ticket)
+        return ticket
+
+    def release_user(self, ticket: Ticket):
+        """Return a reservation made by reserve_user()."""
+        self._forget_user(ticket)
+
+    def release(self, ticket: Ticket):
+        """Return a slot once the crew run for ``ticket`` has finished."""
+        if ticket.admitted_at is not None:
+            ran = time.monotonic() - ticket.admitted_at
+            self._run_seconds_avg = 0.9 * self._run_seconds_avg + 0.1 * ran
+        self._forget_user(ticket)
+        self.active[ticket.lane] -= 1
+        self._wake_next()
+
+    def _wake_next(self):
+        """Hand free slots to waiters, highest-priority lane first."""
+        progress = True
+        while progress and self.total_active < self.max_concurrent:
+            progress = False
+            for lane in LANE_ORDER:
+                waiters = self._waiters[lane]
+                while waiters and waiters[0].done():
+                    waiters.popleft()
+                if waiters and self._has_slot(lane):
+                    # The slot is transferred to the waiter before it resumes.
+                    self.active[lane] += 1
+                    waiters.popleft().set_result(None)
+                    progress = True
+                    break
+
+    def _count_user(self, ticket: Ticket):
+        if self._per_user.get(ticket.user_id, 0) >= self.per_user:
+            self._reject("user_limit", ticket.lane)
+        self._per_user[ticket.user_id] = self._per_user.get(ticket.user_id, 0) + 1
+
+    def _forget_user(self, ticket: Ticket):
+        if ticket.user_id is None:
+            return
+        remaining = self._per_user.get(ticket.user_id, 0) - 1
+        if remaining > 0:
+            self._per_user[ticket.user_id] = remaining
+        else:
+            self._per_user.pop(ticket.user_id, None)
+
+    def stats(self) -> Dict[str, Any]:
+        lanes = {}
+        for lane in LANE_ORDER:
+            admitted = self.admitted[lane]
+            lanes[lane.value] = {
+                "active": self.active[lane],
+                "limit": self.limits[lane],
+                "queue_depth": len(self._waiters[lane]),
+                "max_queue_depth_seen": self.max_queue_depth[lane],
+                "admitted": admitted,
+                "wait_seconds_avg": round(self.wait_seconds_total[lane] / admitted, 4) if admitted else 0.0,
+                "wait_seconds_max": round(self.wait_seconds_max[lane], 4),
+            }
+        return {
+            "active": self.total_active,
+            "max_concurrent": self.max_concurrent,
+            "reserved_interactive": self.reserved_interactive,
+            "per_user_limit": self.per_user,
+            "queue_depth": self.queue_depth,
+            "max_queue": self.max_queue,
+            "rejected": dict(self.rejected),
+            "lanes": lanes,
+        }
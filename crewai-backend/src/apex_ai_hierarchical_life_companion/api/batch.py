@@ -0,0 +1,126 @@
+"""
+Shared research for batch Alpha Briefs.
+
+Briefing a watchlist runs one crew per ticker, and those crews repeat the same
+searches: macro news, market movers, sector pages. SharedToolResults is
+attached to every crew in a batch and routes their search and scrape tools,
+on both agents and tasks, through one memo, so identical calls run once per batch and concurrent
+identical calls wait for the first. The batch also gathers macro market
+context once up front and hands it to every brief.
+"""
+import json
+import threading
+from concurrent.futures import Future
+from typing import Any, Dict, List, Optional, Type
+
+from crewai.tools import BaseTool
+from pydantic import BaseModel
+
+from ..deadlines import Deadline, DeadlineExceeded, deadline_scope
+from ..execution import unwrap_tool, with_deadline
+
+# Tool classes whose results are identical for every ticker given the same arguments
+SHAREABLE_TOOLS = {"SerperDevTool", "SerplyWebSearchTool", "ScrapeWebsiteTool"}
+
+MARKET_CONTEXT_QUERIES = [
+    "stock market macro news today",
+    "stock market sector performance today",
+]
+
+
+class SharedToolResults:
+    """Single-flight memo of tool results shared by every crew in one batch."""
+
+    def __init__(self):
+        self._results: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+        self._swapped: Dict[int, List[Any]] = {}
+        self.calls = 0
+        self.shared = 0
+
+    def call(self, tool: Any, kwargs: Dict[str, Any]) -> Any:
+        key = json.dumps([type(unwrap_tool(tool)).__name__, kwargs], sort_keys=True, default=str)
+        with self._lock:
+            future = self._results.get(key)
+            owner = future is None
+            if owner:
+                future = Future()
+                self._results[key] = future
+                self.calls += 1
+            else:
+                self.shared += 1
+        if owner:
+            try:
+                future.set_result(tool._run(**kwargs))
+            except Exception as e:
+                # Only successes are kept; the next identical call runs the tool again.
+                with self._lock:
+                    del self._results[key]
+                future.set_exception(e)
+        return future.result()
+
+    # Crew observer interface (see run_crew)
+
+    def attach(self, crew):
+        # CrewAI runs a task with its own tools, which Task copies from its agent when
+        # it is built, and falls back to the agent's; both are swapped.
+        wrapped: Dict[int, Any] = {}
+        for owner in (*crew.agents, *crew.tasks):
+            if not owner.tools:
+                continue
+            self._swapped[id(owner)] = owner.tools
+            owner.tools = [self._shared_tool(tool, wrapped) for tool in owner.tools]
+
+    def detach(self, crew):
+        for owner in (*crew.agents, *crew.tasks):
+            if id(owner) in self._swapped:
+                owner.tools = self._swapped.pop(id(owner))
+
+    def _shared_tool(self, tool: Any, wrapped: Dict[int, Any]) -> Any:
+        if type(unwrap_tool(tool)).__name__ not in SHAREABLE_TOOLS:
+            return tool
+        if id(tool) not in wrapped:
+            wrapped[id(tool)] = SharedTool.wrap(tool, self)
+        return wrapped[id(tool)]
+
+    def stats(self) -> Dict[str, int]:
+        return {"tool_calls": self.calls, "shared_results": self.shared}
+
+
+class SharedTool(BaseTool):
+    """Stand-in for a search or scrape tool that answers from the batch's shared results."""
+
+    inner: Any = None
+    results: Any = None
+
+    @classmethod
+    def wrap(cls, tool: Any, results: SharedToolResults) -> "SharedTool":
+        args_schema: Optional[Type[BaseModel]] = getattr(tool, "args_schema", None)
+        fields = {"name": tool.name, "description": tool.description, "inner": tool, "results": results}
+        if args_schema is not None:
+            fields["args_schema"] = args_schema
+        return cls(**fields)
+
+    def _run(self, **kwargs: Any) -> Any:
+        return self.results.call(self.inner, kwargs)
+
+
+def gather_market_context(results: SharedToolResults, deadline: Optional[float] = None) -> str:
+    """
+    Search macro market news once for the whole batch, within the batch's deadline.
+
+    Raises DeadlineExceeded if the deadline passes before every search has returned.
+    """
+    from crewai_tools import SerperDevTool
+
+    search = with_deadline(SerperDevTool(), third_party=True)
+    budget = Deadline(deadline) if deadline is not None else None
+    sections = []
+    with deadline_scope(budget):
+        for query in MARKET_CONTEXT_QUERIES:
+            if budget is not None:
+                budget.check("gathering market context")
+            sections.append(f"## {query}\n{results.call(search, {'search_query': query})}")
+    if budget is not None and budget.degraded:
+        raise DeadlineExceeded("Deadline passed while gathering market context")
+    return "\n\n".join(sections)
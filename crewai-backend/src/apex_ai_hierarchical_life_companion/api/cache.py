@@ -0,0 +1,243 @@
+"""
+Result caching and request coalescing for crew endpoints.
+
+A ResultCache combines two things:
+- single-flight coalescing: concurrent requests for the same key attach to the
+  one crew job already in flight instead of starting their own kickoff;
+- a TTL + LRU cache of finished results that serves repeats instantly.
+
+Hit, miss and coalesced counters are kept so the cache can be sized.
+
+With a SharedStore, finished results and the id of the job in flight for each
+key are also kept there, so a result computed on one API worker is served by
+all of them and a request on one worker coalesces onto a run on another.
+"""
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, time as dtime
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+from zoneinfo import ZoneInfo
+
+from fastapi.encoders import jsonable_encoder
+
+from ..deadlines import is_degraded
+from .store import SharedStore
+
+logger = logging.getLogger(__name__)
+
+MARKET_TZ = ZoneInfo("America/New_York")
+
+
+def market_session(now: Optional[datetime] = None) -> str:
+    """
+    Identify the US equity market session a request falls into, e.g. ``2025-03-14:regular``.
+
+    Briefs generated in the same session see the same market state, so the
+    session is part of the cache key.
+    """
+    now = (now or datetime.now(MARKET_TZ)).astimezone(MARKET_TZ)
+    if now.weekday() >= 5:
+        session = "closed"
+    elif now.time() < dtime(4, 0):
+        session = "closed"
+    elif now.time() < dtime(9, 30):
+        session = "pre"
+    elif now.time() < dtime(16, 0):
+        session = "regular"
+    elif now.time() < dtime(20, 0):
+        session = "post"
+    else:
+        session = "closed"
+    return f"{now.date().isoformat()}:{session}"
+
+
+class ResultCache:
+    """
+    Thread-safe TTL/LRU result cache with single-flight tracking of in-flight jobs.
+
+    Args:
+        max_entries: Maximum number of cached results before the least recently used is evicted
+        ttl: Seconds a cached result stays fresh
+        store: Shared store for results and in-flight job ids across workers
+        namespace: Prefix for this cache's keys in the shared store
+        resolve_job: Returns the Job for a job id, including jobs run by other workers
+    """
+
+    # Upper bound on how long an in-flight marker outlives a worker that died mid-run
+    INFLIGHT_TTL = 3600.0
+
+    def __init__(
+        self,
+        max_entries: int = 256,
+        ttl: float = 900.0,
+        store: Optional[SharedStore] = None,
+        namespace: str = "cache",
+        resolve_job: Optional[Callable[[str], Any]] = None,
+    ):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.store = store
+        self.namespace = namespace
+        self.resolve_job = resolve_job
+        self._entries: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._inflight: Dict[Hashable, Any] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+
+    @classmethod
+    def from_env(
+        cls,
+        prefix: str,
+        store: Optional[SharedStore] = None,
+        resolve_job: Optional[Callable[[str], Any]] = None,
+    ) -> "ResultCache":
+        """Build a cache sized by ``<prefix>_SIZE`` and ``<prefix>_TTL`` environment variables."""
+        return cls(
+            max_entries=int(os.getenv(f"{prefix}_SIZE", 256)),
+            ttl=float(os.getenv(f"{prefix}_TTL", 900)),
+            store=store,
+            namespace=prefix.lower(),
+            resolve_job=resolve_job,
+        )
+
+    def get(self, key: Hashable) -> Tuple[bool, Any]:
+        """Return ``(True, value)`` for a fresh entry, else ``(False, None)``."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                stored_at, value = entry
+                if time.monotonic() - stored_at < self.ttl:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return True, value
+                del self._entries[key]
+        shared = self._shared_get(self._shared_key("result", key))
+        if shared is None:
+            return False, None
+        # Keep the shared entry's age, so a copy expires with it rather than a full TTL later.
+        age = max(0.0, time.time() - shared.get("stored_at", time.time()))
+        if age >= self.ttl:
+            return False, None
+        with self._lock:
+            self._store(key, shared["value"], time.monotonic() - age)
+            self.hits += 1
+        return True, shared["value"]
+
+    def set(self, key: Hashable, value: Any):
+        with self._lock:
+            self._store(key, value)
+
+    def join(self, key: Hashable):
+        """Return the job already running for ``key``, counting the request as coalesced."""
+        with self._lock:
+            job = self._inflight.get(key)
+        if job is None:
+            job = self._shared_job(key)
+        with self._lock:
+            if job is not None:
+                self.coalesced += 1
+            else:
+                self.misses += 1
+        return job
+
+    def rejoin(self, key: Hashable):
+        """
+        Look for an in-flight job again after a request waited (e.g. for admission).
+
+        If one has appeared meanwhile, the request is reclassified from miss to coalesced.
+        """
+        with self._lock:
+            job = self._inflight.get(key)
+        if job is None:
+            job = self._shared_job(key)
+        if job is not None:
+            with self._lock:
+                self.misses -= 1
+                self.coalesced += 1
+        return job
+
+    def track(self, key: Hashable, job):
+        """Register a newly submitted job as the in-flight run for ``key``."""
+        with self._lock:
+            self._inflight[key] = job
+        inflight_key = self._shared_key("inflight", key)
+        self._shared_set(inflight_key, job.id, self.INFLIGHT_TTL)
+
+        def _done(future):
+            # Partial results cut short by a deadline are served once but never cached.
+            succeeded = not future.cancelled() and future.exception() is None and not is_degraded(future.result())
+            with self._lock:
+                if self._inflight.get(key) is job:
+                    del self._inflight[key]
+                if succeeded:
+                    self._store(key, future.result())
+            if succeeded:
+                self._shared_set(
+                    self._shared_key("result", key), {"value": future.result(), "stored_at": time.time()}, self.ttl
+                )
+            if self._shared_get(inflight_key) == job.id:
+                self._shared_delete(inflight_key)
+
+        job.future.add_done_callback(_done)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses + self.coalesced
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "coalesced": self.coalesced,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "entries": len(self._entries),
+                "inflight": len(self._inflight),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl,
+            }
+
+    def _shared_key(self, kind: str, key: Hashable) -> str:
+        return f"{self.namespace}:{kind}:{json.dumps(key, default=str)}"
+
+    def _shared_get(self, shared_key: str) -> Any:
+        if self.store is None:
+            return None
+        try:
+            return self.store.get_json(shared_key)
+        except Exception as e:
+            logger.warning(f"Shared store read failed for {shared_key}: {e}")
+            return None
+
+    def _shared_set(self, shared_key: str, value: Any, ttl: float):
+        if self.store is None:
+            return
+        try:
+            self.store.set_json(shared_key, jsonable_encoder(value), ttl)
+        except Exception as e:
+            logger.warning(f"Shared store write failed for {shared_key}: {e}")
+
+    def _shared_delete(self, shared_key: str):
+        try:
+            self.store.delete(shared_key)
+        except Exception as e:
+            logger.warning(f"Shared store delete failed for {shared_key}: {e}")
+
+    def _shared_job(self, key: Hashable):
+        """The job another worker is running for ``key``, if the shared store knows of one."""
+        if self.resolve_job is None:
+            return None
+        job_id = self._shared_get(self._shared_key("inflight", key))
+        return None if job_id is None else self.resolve_job(job_id)
+
+    def _store(self, key: Hashable, value: Any, stored_at: Optional[float] = None):
+        self._entries[key] = (time.monotonic() if stored_at is None else stored_at, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
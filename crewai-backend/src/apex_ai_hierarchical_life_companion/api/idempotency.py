@@ -0,0 +1,334 @@
+"""
+Idempotency keys for crew endpoints.
+
+Clients (notably the Next.js API routes) retry POSTs on timeouts. Without a
+key, every retry starts another full crew run. A request carrying an
+``Idempotency-Key`` header claims that key for its endpoint and user:
+- the first request runs the crew as usual;
+- duplicates that arrive while it runs attach to the same job;
+- duplicates that arrive after it finished get the stored response replayed.
+
+Finished responses are kept in a small SQLite file so they survive restarts,
+bounded by entry count and expiry. With a SharedStore, a key is also claimed
+there, so a duplicate that reaches another API worker while the first request
+runs attaches to that worker's job through the shared job record instead of
+starting a second run. Failed and degraded (deadline-cut) runs
+are not stored, so a retry after one runs the crew again. Reusing a key with a different payload
+is rejected.
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from fastapi.encoders import jsonable_encoder
+
+from ..deadlines import is_degraded
+from .store import SharedStore
+
+logger = logging.getLogger(__name__)
+
+MAX_KEY_LENGTH = 255
+
+# Seconds between checks for the job of a key claimed on another worker
+REMOTE_POLL_SECONDS = 0.2
+
+
+class IdempotencyConflict(Exception):
+    """Raised when a key is reused with a different request payload; maps to HTTP 422."""
+
+
+def fingerprint(inputs: Dict[str, Any]) -> str:
+    """Stable hash of a request's crew inputs."""
+    payload = json.dumps(jsonable_encoder(inputs), sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class IdempotencyClaim:
+    """
+    Outcome of claiming a key.
+
+    Exactly one of these holds:
+    - ``replay`` is set: a stored response to return as-is;
+    - ``owner`` is True: this request runs the crew and must bind() or abandon();
+    - otherwise: another request, on this worker or another one, owns the key;
+      await job() for its Job.
+    """
+
+    def __init__(
+        self,
+        store: "IdempotencyStore",
+        key: str,
+        fingerprint: str,
+        owner: bool = False,
+        pending: Optional[Future] = None,
+        replay: Optional[Dict[str, Any]] = None,
+        token: Optional[str] = None,
+    ):
+        self.store = store
+        self.key = key
+        self.fingerprint = fingerprint
+        self.owner = owner
+        self.pending = pending
+        self.replay = replay
+        # Identifies the owner's claim in the shared store
+        self.token = token
+
+    async def job(self):
+        """
+        Wait for the owning request to submit its crew run and return the Job.
+
+        Returns None if the owner finished without a job or gave up, in which
+        case the key should be claimed again. Raises the owner's error if it was
+        rejected (e.g. by admission control); an owner on another worker that
+        fails only releases the key.
+        """
+        if self.pending is None:
+            return await self.store.remote_job(self)
+        return await asyncio.shield(asyncio.wrap_future(self.pending))
+
+    def bind(self, job, result_key: str, extra: Optional[Dict[str, Any]] = None):
+        """Attach the owner's job; its response is stored once the job succeeds."""
+        self.store.bind(self, job, result_key, extra)
+
+    def complete(self, response: Dict[str, Any]):
+        """Store a response the owner produced without a job (e.g. a cache hit)."""
+        self.store.complete(self, response)
+
+    def abandon(self, error: Optional[BaseException] = None):
+        """
+        Release the key after the owner failed before submitting a job.
+
+        Waiting duplicates receive ``error``, or claim the key again when it is None.
+        """
+        self.store.abandon(self, error)
+
+
+class IdempotencyStore:
+    """
+    Bounded, expiring on-disk store of responses per idempotency key.
+
+    Args:
+        path: SQLite file holding finished responses
+        ttl: Seconds a stored response can be replayed
+        max_entries: Stored responses kept before the oldest are dropped
+        shared: Shared store in which keys are claimed across workers
+        resolve_job: Returns the Job for a job id, including jobs run by other workers
+    """
+
+    # Upper bound on how long a claim outlives a worker that died mid-run
+    CLAIM_TTL = 3600.0
+    # Upper bound on how long a claim lasts before its owner submits a job (e.g. while it waits for admission)
+    SUBMIT_TTL = 300.0
+
+    def __init__(
+        self,
+        path: str,
+        ttl: float = 86400.0,
+        max_entries: int = 10000,
+        shared: Optional[SharedStore] = None,
+        resolve_job: Optional[Callable[[str], Any]] = None,
+    ):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.shared = shared
+        self.resolve_job = resolve_job
+        self._inflight: Dict[str, Tuple[str, Future]] = {}
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=10)
+        # WAL lets every API worker process share the file
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS idempotency ("
+            " key TEXT PRIMARY KEY,"
+            " fingerprint TEXT NOT NULL,"
+            " response TEXT NOT NULL,"
+            " created_at REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS idempotency_created ON idempotency (created_at)")
+        self.replayed = 0
+        self.attached = 0
+        self.stored = 0
+        self.conflicts = 0
+
+    @classmethod
+    def from_env(
+        cls, shared: Optional[SharedStore] = None, resolve_job: Optional[Callable[[str], Any]] = None
+    ) -> "IdempotencyStore":
+        """Build a store from ``APEX_IDEMPOTENCY_DB``, ``APEX_IDEMPOTENCY_TTL`` and ``APEX_IDEMPOTENCY_SIZE``."""
+        return cls(
+            path=os.getenv("APEX_IDEMPOTENCY_DB", ".apex/idempotency.sqlite3"),
+            ttl=float(os.getenv("APEX_IDEMPOTENCY_TTL", 86400)),
+            max_entries=int(os.getenv("APEX_IDEMPOTENCY_SIZE", 10000)),
+            shared=shared,
+            resolve_job=resolve_job,
+        )
+
+    def claim(self, key: str, request_fingerprint: str) -> IdempotencyClaim:
+        """Claim ``key`` for a request, or find the response or run that already owns it."""
+        with self._lock:
+            inflight = self._inflight.get(key)
+            if inflight is not None:
+                self._check(inflight[0], request_fingerprint)
+                self.attached += 1
+                return IdempotencyClaim(self, key, request_fingerprint, pending=inflight[1])
+
+            row = self._db.execute(
+                "SELECT fingerprint, response, created_at FROM idempotency WHERE key = ?", (key,)
+            ).fetchone()
+            if row is not None:
+                stored_fingerprint, response, created_at = row
+                if time.time() - created_at < self.ttl:
+                    self._check(stored_fingerprint, request_fingerprint)
+                    self.replayed += 1
+                    return IdempotencyClaim(self, key, request_fingerprint, replay=json.loads(response))
+                self._db.execute("DELETE FROM idempotency WHERE key = ?", (key,))
+
+            token = uuid.uuid4().hex
+            if not self._shared_claim(key, {"fingerprint": request_fingerprint, "token": token}):
+                entry = self._shared_get(key)
+                if entry is not None:
+                    self._check(entry["fingerprint"], request_fingerprint)
+                self.attached += 1
+                return IdempotencyClaim(self, key, request_fingerprint)
+
+            pending: Future = Future()
+            self._inflight[key] = (request_fingerprint, pending)
+            return IdempotencyClaim(self, key, request_fingerprint, owner=True, pending=pending, token=token)
+
+    async def remote_job(self, claim: IdempotencyClaim):
+        """
+        Wait until the worker that claimed ``claim.key`` submits its job and return it,
+        or None once the key is released (the response is then stored, or the owner gave up).
+        """
+        while True:
+            entry = await asyncio.to_thread(self._shared_get, claim.key)
+            if entry is None:
+                return None
+            if entry.get("job") is not None:
+                return self.resolve_job(entry["job"]) if self.resolve_job is not None else None
+            await asyncio.sleep(REMOTE_POLL_SECONDS)
+
+    def bind(self, claim: IdempotencyClaim, job, result_key: str, extra: Optional[Dict[str, Any]] = None):
+        claim.pending.set_result(job)
+        self._shared_set(claim.key, {"fingerprint": claim.fingerprint, "token": claim.token, "job": job.id})
+
+        def _done(future):
+            if not future.cancelled() and future.exception() is None and not is_degraded(future.result()):
+                self.complete(claim, {"success": True, **(extra or {}), result_key: future.result()})
+            else:
+                self._release(claim)
+
+        job.future.add_done_callback(_done)
+
+    def complete(self, claim: IdempotencyClaim, response: Dict[str, Any]):
+        body = json.dumps(jsonable_encoder(response), default=str)
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO idempotency (key, fingerprint, response, created_at) VALUES (?, ?, ?, ?)",
+                (claim.key, claim.fingerprint, body, time.time()),
+            )
+            self.stored += 1
+            self._forget(claim)
+            self._evict()
+        # Only wake waiting duplicates once the response can be replayed to them.
+        if not claim.pending.done():
+            claim.pending.set_result(None)
+
+    def abandon(self, claim: IdempotencyClaim, error: Optional[BaseException] = None):
+        if not claim.pending.done():
+            if error is None:
+                claim.pending.set_result(None)
+            else:
+                claim.pending.set_exception(error)
+        self._release(claim)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            (entries,) = self._db.execute("SELECT COUNT(*) FROM idempotency").fetchone()
+            return {
+                "entries": entries,
+                "inflight": len(self._inflight),
+                "replayed": self.replayed,
+                "attached": self.attached,
+                "stored": self.stored,
+                "conflicts": self.conflicts,
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl,
+            }
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    def _check(self, stored_fingerprint: str, request_fingerprint: str):
+        if stored_fingerprint != request_fingerprint:
+            self.conflicts += 1
+            raise IdempotencyConflict("Idempotency-Key was already used with a different request payload")
+
+    def _release(self, claim: IdempotencyClaim):
+        with self._lock:
+            self._forget(claim)
+
+    def _forget(self, claim: IdempotencyClaim):
+        inflight = self._inflight.get(claim.key)
+        if inflight is not None and inflight[1] is claim.pending:
+            del self._inflight[claim.key]
+        if claim.owner and self.shared is not None:
+            entry = self._shared_get(claim.key)
+            if entry is not None and entry.get("token") == claim.token:
+                try:
+                    self.shared.delete(self._shared_key(claim.key))
+                except Exception as e:
+                    logger.warning(f"Shared store delete failed for idempotency key {claim.key}: {e}")
+
+    @staticmethod
+    def _shared_key(key: str) -> str:
+        return f"idempotency:{key}"
+
+    def _shared_claim(self, key: str, entry: Dict[str, Any]) -> bool:
+        """Claim ``key`` in the shared store; True if this worker now owns it (or there is no shared store)."""
+        if self.shared is None:
+            return True
+        try:
+            return self.shared.add(self._shared_key(key), json.dumps(entry), self.SUBMIT_TTL)
+        except Exception as e:
+            logger.warning(f"Shared store claim failed for idempotency key {key}: {e}")
+            return True
+
+    def _shared_get(self, key: str) -> Optional[Dict[str, Any]]:
+        if self.shared is None:
+            return None
+        try:
+            return self.shared.get_json(self._shared_key(key))
+        except Exception as e:
+            logger.warning(f"Shared store read failed for idempotency key {key}: {e}")
+            return None
+
+    def _shared_set(self, key: str, entry: Dict[str, Any]):
+        if self.shared is None:
+            return
+        try:
+            self.shared.set_json(self._shared_key(key), entry, self.CLAIM_TTL)
+        except Exception as e:
+            logger.warning(f"Shared store write failed for idempotency key {key}: {e}")
+
+    def _evict(self):
+        """Drop expired responses, then the oldest ones beyond max_entries."""
+        self._db.execute("DELETE FROM idempotency WHERE created_at < ?", (time.time() - self.ttl,))
+        self._db.execute(
+            "DELETE FROM idempotency WHERE key IN ("
+            " SELECT key FROM idempotency ORDER BY created_at DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,),
+        )
@@ -0,0 +1,441 @@
+"""
+Job execution engine for crew runs.
+
+Crew kickoffs are blocking and can take a minute or more, so they must never
+run on the uvicorn event loop. The JobManager owns a bounded worker pool that
+executes kickoffs off the loop and keeps a short history of submitted jobs so
+clients can poll for status and results.
+
+With a SharedStore, job records are also published there so any API worker
+can answer a status poll, async jobs can be put on a shared queue that every
+worker drains as it has capacity, and a worker can wait on a job another
+worker runs (see watch()).
+
+On shutdown, drain() stops new submissions and gives running jobs a grace
+period. Jobs still unfinished after it are put back on the shared queue, with
+the outputs of their finished tasks, so another worker resumes them instead of
+starting over.
+"""
+import asyncio
+import concurrent.futures
+import contextvars
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime, timezone
+from enum import Enum
+from typing import Any, Callable, Dict, Optional
+
+from fastapi.encoders import jsonable_encoder
+
+from .. import tracing
+from .store import SharedStore
+
+logger = logging.getLogger(__name__)
+
+# Shared queue of async jobs waiting for any worker
+SHARED_QUEUE = "jobs"
+
+
+class JobStatus(str, Enum):
+    QUEUED = "queued"
+    RUNNING = "running"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+class SharedQueueFull(Exception):
+    """Raised when the shared job queue is at its limit; maps to HTTP 429."""
+
+
+class WorkerDraining(Exception):
+    """Raised by submit() once this worker is shutting down; maps to HTTP 503."""
+
+
+class JobHandedOff(Exception):
+    """Set on a job's future when a draining worker hands the job to another worker."""
+
+    def __init__(self, job_id: str):
+        super().__init__(f"Job {job_id} was handed to another worker; poll /api/jobs/{job_id} for its result")
+        self.job_id = job_id
+
+
+class Job:
+    """A single crew run submitted to the JobManager."""
+
+    def __init__(
+        self,
+        endpoint: str,
+        inputs: Dict[str, Any],
+        result_key: str = "result",
+        observer: Any = None,
+        job_id: Optional[str] = None,
+        deadline: Optional[float] = None,
+        lane: str = "standard",
+        checkpoint: Optional[Dict[str, Any]] = None,
+    ):
+        self.id = job_id or uuid.uuid4().hex
+        self.endpoint = endpoint
+        self.inputs = inputs
+        self.result_key = result_key
+        self.status = JobStatus.QUEUED
+        self.created_at = _now()
+        self.started_at: Optional[str] = None
+        self.finished_at: Optional[str] = None
+        self.result: Any = None
+        self.error: Optional[str] = None
+        self.observer = observer
+        self.deadline = deadline
+        self.lane = lane
+        # Outputs of finished tasks by task name, filled in as the run progresses
+        self.checkpoint: Dict[str, Any] = dict(checkpoint or {})
+        self.handed_off = False
+        self.settled = False
+        self.future: Optional[Future] = None
+
+    @property
+    def done(self) -> bool:
+        return self.status in (JobStatus.SUCCEEDED, JobStatus.FAILED)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "jobId": self.id,
+            "endpoint": self.endpoint,
+            "status": self.status.value,
+            "createdAt": self.created_at,
+            "startedAt": self.started_at,
+            "finishedAt": self.finished_at,
+            self.result_key: self.result,
+            "error": self.error,
+        }
+
+
+class JobManager:
+    """
+    Runs crew kickoffs on a bounded thread pool.
+
+    Args:
+        runner: Callable that executes a crew for ``(endpoint, inputs, observer=..., deadline=..., checkpoint=...)``
+            and returns its result
+        max_workers: Maximum number of kickoffs running at the same time
+        max_jobs: Number of jobs kept for status polling before the oldest finished ones are dropped
+        store: Shared store for job records and the shared queue; None keeps jobs local to this process
+        job_ttl: Seconds job records are kept in the shared store
+        poll_interval: Seconds between checks of jobs this worker waits on but does not run
+        queue_limit: Jobs allowed on the shared queue before enqueue() is refused
+    """
+
+    def __init__(
+        self,
+        runner: Callable[..., Any],
+        max_workers: Optional[int] = None,
+        max_jobs: Optional[int] = None,
+        store: Optional[SharedStore] = None,
+        job_ttl: Optional[float] = None,
+        poll_interval: Optional[float] = None,
+        queue_limit: Optional[int] = None,
+    ):
+        self.runner = runner
+        self.max_workers = max_workers or int(os.getenv("APEX_CREW_WORKERS", 8))
+        self.max_jobs = max_jobs or int(os.getenv("APEX_JOB_HISTORY", 1000))
+        self.store = store
+        self.job_ttl = job_ttl or float(os.getenv("APEX_JOB_TTL", 86400))
+        self.poll_interval = poll_interval or float(os.getenv("APEX_STORE_POLL", 0.5))
+        self.queue_limit = queue_limit or int(os.getenv("APEX_SHARED_QUEUE_MAX", 256))
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.max_workers,
+            thread_name_prefix="crew-worker",
+        )
+        self._jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._watched: Dict[str, Job] = {}
+        self._watcher: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self.draining = False
+
+    def submit(
+        self,
+        endpoint: str,
+        inputs: Dict[str, Any],
+        result_key: str = "result",
+        observer: Any = None,
+        job_id: Optional[str] = None,
+        deadline: Optional[float] = None,
+        lane: str = "standard",
+        checkpoint: Optional[Dict[str, Any]] = None,
+    ) -> Job:
+        """
+        Queue a crew run on this worker and return immediately with its Job record.
+
+        ``observer`` is handed to the runner to receive progress events (e.g. a CrewEventStream).
+        ``job_id`` is given when running a job taken from the shared queue.
+        ``deadline`` is the Unix time by which the run must return.
+        ``checkpoint`` holds the finished task outputs of a job resumed from another worker.
+        """
+        if self.draining:
+            raise WorkerDraining("This worker is shutting down")
+        job = Job(endpoint, inputs, result_key, observer, job_id, deadline, lane, checkpoint)
+        with self._lock:
+            self._jobs[job.id] = job
+            self._evict()
+        self._publish(job)
+        # The job span covers queueing and the run, and keeps the request's trace open until it finishes.
+        span = tracing.start_span("job", endpoint=endpoint, job_id=job.id)
+        context = contextvars.copy_context()
+        # Resolved by _execute, or by drain() when the job is handed off while still running
+        job.future = Future()
+        self._executor.submit(context.run, self._execute, job, span)
+        return job
+
+    def enqueue(
+        self,
+        endpoint: str,
+        inputs: Dict[str, Any],
+        result_key: str = "result",
+        lane: str = "standard",
+        deadline: Optional[float] = None,
+    ) -> Job:
+        """
+        Put a crew run on the shared queue for whichever worker has a free slot.
+
+        The returned Job's future resolves once the worker that ran it publishes the outcome.
+        """
+        if self.store.length(SHARED_QUEUE) >= self.queue_limit:
+            raise SharedQueueFull(f"Shared job queue is full ({self.queue_limit} jobs)")
+        job = Job(endpoint, inputs, result_key, deadline=deadline)
+        self._publish(job)
+        item = {
+            "jobId": job.id,
+            "endpoint": endpoint,
+            "inputs": inputs,
+            "resultKey": result_key,
+            "lane": lane,
+            "deadline": deadline,
+        }
+        self.store.push(SHARED_QUEUE, json.dumps(item, default=str))
+        return self._watch(job)
+
+    def next_queued(self) -> Optional[Dict[str, Any]]:
+        """Take the oldest job off the shared queue, if any. Blocking; call off the event loop."""
+        value = self.store.pop(SHARED_QUEUE)
+        return None if value is None else json.loads(value)
+
+    def requeue(self, item: Dict[str, Any]):
+        """Return a job taken with next_queued() that this worker could not run."""
+        self.store.push(SHARED_QUEUE, json.dumps(item, default=str))
+
+    def watch(self, job_id: str) -> Optional[Job]:
+        """
+        Return the Job for ``job_id``, whether this worker runs it or another one does.
+
+        For another worker's job, the returned Job mirrors the shared record and its
+        future resolves when that record reaches a final state.
+        """
+        job = self.get(job_id)
+        if job is not None or self.store is None:
+            return job
+        record = self.store.get_json(self._key(job_id))
+        if record is None:
+            return None
+        job = Job(record["endpoint"], {}, record.get("resultKey", "result"), job_id=job_id)
+        self._apply(job, record)
+        return self._watch(job)
+
+    def record(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Status and result of a job for polling, from this worker or the shared store."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            local = job is not None and job_id not in self._watched
+        if local:
+            return job.to_dict()
+        if self.store is not None:
+            record = self.store.get_json(self._key(job_id))
+            if record is not None:
+                record.pop("resultKey", None)
+                return record
+        return None if job is None else job.to_dict()
+
+    async def run(self, endpoint: str, inputs: Dict[str, Any], result_key: str = "result") -> Any:
+        """Run a crew on the worker pool and await its result without blocking the event loop."""
+        job = self.submit(endpoint, inputs, result_key)
+        return await asyncio.wrap_future(job.future)
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            counts = {status.value: 0 for status in JobStatus}
+            for job in self._jobs.values():
+                counts[job.status.value] += 1
+        counts["max_workers"] = self.max_workers
+        return counts
+
+    def shutdown(self, wait: bool = True):
+        self._executor.shutdown(wait=wait)
+
+    def drain(self, timeout: float) -> Dict[str, int]:
+        """
+        Stop accepting jobs, give the ones this worker runs up to ``timeout`` seconds
+        to finish, then hand the rest to other workers through the shared queue.
+
+        Blocking; call off the event loop. Without a shared store unfinished jobs
+        cannot be handed off and are left to finish if the process lives long enough.
+        """
+        self.draining = True
+        with self._lock:
+            pending = [job for job_id, job in self._jobs.items() if not job.done and job_id not in self._watched]
+        concurrent.futures.wait([job.future for job in pending], timeout=timeout)
+        unfinished = [job for job in pending if not job.future.done()]
+        handed_off = 0
+        if self.store is not None:
+            for job in unfinished:
+                try:
+                    handed_off += self._hand_off(job)
+                except Exception as e:
+                    logger.warning(f"Could not hand off job {job.id}: {e}")
+        # Jobs that were handed off must not start here; without a store, queued jobs still run.
+        self._executor.shutdown(wait=False, cancel_futures=self.store is not None)
+        return {
+            "finished": len(pending) - len(unfinished),
+            "handedOff": handed_off,
+            "abandoned": len(unfinished) - handed_off,
+        }
+
+    def _hand_off(self, job: Job) -> bool:
+        """Put an unfinished job back on the shared queue, keeping its id and finished task outputs."""
+        with self._lock:
+            if job.settled:
+                return False
+            # From here on this worker's run, should it still finish, is ignored.
+            job.handed_off = True
+        job.status = JobStatus.QUEUED
+        job.started_at = None
+        self._publish(job)
+        item = {
+            "jobId": job.id,
+            "endpoint": job.endpoint,
+            "inputs": job.inputs,
+            "resultKey": job.result_key,
+            "lane": job.lane,
+            "deadline": job.deadline,
+            "checkpoint": dict(job.checkpoint),
+        }
+        self.store.push(SHARED_QUEUE, json.dumps(item, default=str))
+        job.future.set_exception(JobHandedOff(job.id))
+        return True
+
+    @staticmethod
+    def _key(job_id: str) -> str:
+        return f"job:{job_id}"
+
+    def _publish(self, job: Job):
+        if self.store is None:
+            return
+        try:
+            record = jsonable_encoder({**job.to_dict(), "resultKey": job.result_key})
+            self.store.set_json(self._key(job.id), record, self.job_ttl)
+        except Exception as e:
+            logger.warning(f"Could not publish job {job.id} to the shared store: {e}")
+
+    @staticmethod
+    def _apply(job: Job, record: Dict[str, Any]):
+        job.status = JobStatus(record["status"])
+        job.started_at = record.get("startedAt")
+        job.finished_at = record.get("finishedAt")
+        job.result = record.get(job.result_key)
+        job.error = record.get("error")
+
+    def _watch(self, job: Job) -> Job:
+        job.future = Future()
+        with self._lock:
+            self._jobs.setdefault(job.id, job)
+            self._watched[job.id] = job
+            self._evict()
+            if self._watcher is None:
+                self._watcher = threading.Thread(target=self._watch_loop, name="job-watcher", daemon=True)
+                self._watcher.start()
+        return job
+
+    def _watch_loop(self):
+        """Poll the shared records of watched jobs and resolve their futures once they finish."""
+        while True:
+            time.sleep(self.poll_interval)
+            with self._lock:
+                watched = list(self._watched.values())
+            for job in watched:
+                try:
+                    record = self.store.get_json(self._key(job.id))
+                except Exception as e:
+                    logger.warning(f"Could not read job {job.id} from the shared store: {e}")
+                    continue
+                if record is None:
+                    record = {"status": JobStatus.FAILED.value, "error": "Job record expired from the shared store"}
+                self._apply(job, record)
+                if not job.done:
+                    continue
+                with self._lock:
+                    self._watched.pop(job.id, None)
+                if job.status is JobStatus.SUCCEEDED:
+                    job.future.set_result(job.result)
+                else:
+                    job.future.set_exception(RuntimeError(job.error or "Job failed"))
+
+    def _execute(self, job: Job, span: Optional[tracing.Span] = None):
+        if job.handed_off:
+            if span is not None:
+                span.end()
+            return
+        job.status = JobStatus.RUNNING
+        job.started_at = _now()
+        self._publish(job)
+        try:
+            with tracing.use_span(span):
+                result = self.runner(
+                    job.endpoint, job.inputs, observer=job.observer, deadline=job.deadline, checkpoint=job.checkpoint,
+                )
+        except Exception as e:
+            if self._settle(job):
+                job.error = str(e)
+                job.status = JobStatus.FAILED
+                self._finish(job)
+                job.future.set_exception(e)
+            return
+        if self._settle(job):
+            job.result = result
+            job.status = JobStatus.SUCCEEDED
+            self._finish(job)
+            job.future.set_result(result)
+
+    def _settle(self, job: Job) -> bool:
+        """Claim the right to record a job's outcome; False once the job was handed off."""
+        with self._lock:
+            if job.handed_off:
+                return False
+            job.settled = True
+            return True
+
+    def _finish(self, job: Job):
+        job.finished_at = _now()
+        self._publish(job)
+        with self._lock:
+            self._evict()
+
+    def _evict(self):
+        """Drop the oldest finished jobs once the history exceeds max_jobs."""
+        if len(self._jobs) <= self.max_jobs:
+            return
+        for job_id in list(self._jobs):
+            if len(self._jobs) <= self.max_jobs:
+                break
+            if self._jobs[job_id].done:
+                del self._jobs[job_id]
@@ -1,11 +1,110 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.encoders import jsonable_encoder
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from pydantic import BaseModel
 from typing import Optional, Dict, Any
+from contextlib import asynccontextmanager
+import asyncio
+import logging
+import os
+import signal
+import time
 import uvicorn
-from ..crew import ApexAiHierarchicalLifeCompanionCrew
+from .. import compaction, crew_registry, llm_cache, llm_gateway, prompts, simulation_cache, tracing
+from ..crew_pool import CrewPool
+from ..deadlines import Deadline, deadline_scope, degraded_result
+from ..metrics import HTTP_REQUEST_SECONDS, record_token_usage, registry as metrics_registry
+from .admission import LANE_ORDER, AdmissionController, AdmissionRejected, Lane
+from .cache import ResultCache, market_session
+from .idempotency import MAX_KEY_LENGTH, IdempotencyClaim, IdempotencyConflict, IdempotencyStore, fingerprint
+from .jobs import JobHandedOff, JobManager, SharedQueueFull, WorkerDraining
+from .store import store_from_env
+from .streaming import CrewEventStream, format_sse
 
-app = FastAPI(title="Apex AI CrewAI Backend", version="1.0.0")
+logger = logging.getLogger(__name__)
+
+IMPORTED_AT = time.time()
+
+# Warm crews checked out per request instead of being rebuilt every time
+crew_pool = CrewPool()
+
+# Build the pool's crews in the background after startup; 0 builds each crew on first use
+WARM_CREWS = os.getenv("APEX_WARM_CREWS", "1").lower() not in ("0", "false", "no")
+
+# Set once startup work is done; /ready reports it, /health only reports that the process is up
+ready = asyncio.Event()
+startup: Dict[str, Any] = {"readyAfterSeconds": None}
+
+async def warm_up():
+    if WARM_CREWS:
+        try:
+            await asyncio.to_thread(crew_pool.warm)
+        except Exception as e:
+            logger.warning(f"Crew warm-up failed; crews will be built on first use: {e}")
+    startup["readyAfterSeconds"] = round(time.time() - IMPORTED_AT, 3)
+    ready.set()
+
+# Seconds in-flight crew runs get to finish on shutdown before they are handed to another worker.
+# Keep it below the process manager's kill timeout (gunicorn's graceful_timeout defaults to 30).
+DRAIN_TIMEOUT = float(os.getenv("APEX_DRAIN_TIMEOUT", 25))
+shutdown: Dict[str, Any] = {"drain": None}
+
+def begin_drain():
+    """
+    Enter drain mode: /ready fails, new crew jobs are refused with 503, and jobs in
+    flight get DRAIN_TIMEOUT seconds before the rest are checkpointed to the shared queue.
+    """
+    if shutdown["drain"] is None:
+        logger.info(f"Draining crew jobs (up to {DRAIN_TIMEOUT:.0f}s)")
+        ready.clear()
+        shutdown["drain"] = asyncio.ensure_future(asyncio.to_thread(jobs.drain, DRAIN_TIMEOUT))
+    return shutdown["drain"]
+
+def drain_on_signal():
+    """
+    Start draining when SIGTERM arrives. The ASGI server only runs lifespan shutdown
+    after open requests finish, and requests waiting on a crew would hold it until killed.
+    """
+    loop = asyncio.get_running_loop()
+    previous = signal.getsignal(signal.SIGTERM)
+    if not callable(previous):
+        # No server handler to chain to; draining starts at lifespan shutdown instead.
+        return
+
+    def handler(signum, frame):
+        loop.call_soon_threadsafe(begin_drain)
+        previous(signum, frame)
+
+    try:
+        signal.signal(signal.SIGTERM, handler)
+    except ValueError:
+        # Not on the main thread (e.g. under a test client)
+        pass
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # The server accepts requests at once; crews not yet warm are built on demand.
+    warm = asyncio.create_task(warm_up())
+    queue_runner = asyncio.create_task(drain_shared_queue()) if SHARED_QUEUE_ENABLED else None
+    drain_on_signal()
+    yield
+    warm.cancel()
+    if queue_runner is not None:
+        queue_runner.cancel()
+    logger.info(f"Crew jobs drained: {await begin_drain()}")
+    idempotency.close()
+    cache = llm_cache.get_cache()
+    if cache is not None:
+        cache.close()
+    simulations = simulation_cache.get_cache()
+    if simulations is not None:
+        simulations.close()
+    llm_gateway.close()
+    if shared_store is not None:
+        shared_store.close()
+
+app = FastAPI(title="Apex AI CrewAI Backend", version="1.0.0", lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -15,92 +114,760 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Outbound requests/httplib2 calls become child spans of the traced request
+tracing.instrument_http()
+
+@app.middleware("http")
+async def record_latency(request: Request, call_next):
+    started = time.perf_counter()
+    status = 500
+    root = None
+    if request.url.path.startswith("/api/"):
+        root = tracing.start_root(
+            f"{request.method} {request.url.path}",
+            force=request.headers.get("X-Apex-Trace") == "1",
+            method=request.method,
+        )
+    error = None
+    try:
+        # The root span is ended below, once it has the route and status: the trace is
+        # exported as soon as its last span ends.
+        with tracing.use_span(root, end=False):
+            response = await call_next(request)
+        status = response.status_code
+        if root is not None:
+            response.headers["X-Apex-Trace-Id"] = root.trace.trace_id
+        return response
+    except BaseException as e:
+        error = e
+        raise
+    finally:
+        # Route templates, not raw paths, so job ids do not explode the label set
+        route = getattr(request.scope.get("route"), "path", "unmatched")
+        HTTP_REQUEST_SECONDS.observe(time.perf_counter() - started, route, request.method, str(status))
+        if root is not None:
+            root.set("route", route)
+            root.set("http.status_code", status)
+            root.end(error)
+
 # Request models
-class AlphaBriefRequest(BaseModel):
+class CrewRequest(BaseModel):
+    # Time budget for the whole request; overrides X-Apex-Timeout when shorter
+    timeoutSeconds: Optional[float] = None
+
+class AlphaBriefRequest(CrewRequest):
     userId: str
     ticker: str
 
-class DailyPathRequest(BaseModel):
+class BatchAlphaBriefRequest(CrewRequest):
+    userId: str
+    tickers: list[str]
+    maxConcurrency: Optional[int] = None
+
+class DailyPathRequest(CrewRequest):
     userId: str
 
-class MentorshipRequest(BaseModel):
+class MentorshipRequest(CrewRequest):
     userId: str
     questId: str
 
-class TravelRequest(BaseModel):
+class TravelRequest(CrewRequest):
     userId: str
     destination: str
     budget: float
     dates: Dict[str, str]
     preferences: list[str]
 
-class CareerReviewRequest(BaseModel):
+class CareerReviewRequest(CrewRequest):
     userId: str
 
-class WeeklySyncRequest(BaseModel):
+class WeeklySyncRequest(CrewRequest):
     userId: str
 
-class VoiceCommandRequest(BaseModel):
+class VoiceCommandRequest(CrewRequest):
     userId: str
     command: str
     intent: str
     entities: Dict[str, Any]
 
-class LogisticsRequest(BaseModel):
+class LogisticsRequest(CrewRequest):
     userId: str
     eventId: str
 
-class MemoryProcessRequest(BaseModel):
+class MemoryProcessRequest(CrewRequest):
     userId: str
     interactionType: str
     feedback: Optional[str] = None
     context: Optional[Dict[str, Any]] = None
 
-# Initialize crew
-crew = ApexAiHierarchicalLifeCompanionCrew()
+def run_crew(
+    endpoint: str,
+    inputs: Dict[str, Any],
+    observer: Any = None,
+    deadline: Optional[float] = None,
+    checkpoint: Optional[Dict[str, str]] = None,
+):
+    """
+    Run the endpoint's crew on a pooled instance. Executes on a JobManager worker thread.
+
+    An observer (e.g. CrewEventStream or SharedToolResults) is attached to the
+    crew for this run only and detached before the crew returns to the pool.
+    With a deadline (Unix time), tasks and tools run within that budget and a run
+    that runs out of time returns its finished work marked as degraded.
+    Finished task outputs are recorded into ``checkpoint``, and tasks already in
+    it (from a run interrupted on another worker) are not run again.
+    """
+    budget = Deadline(deadline) if deadline is not None else None
+    if budget is not None and budget.expired:
+        # Out of time before anything ran: an empty partial result, not a failed job
+        budget.skip("crew")
+        return degraded_result(None, budget)
+    # A checked-out crew belongs to this run alone: CrewBase memoizes agents
+    # and tasks per instance, so concurrent runs must not share one crew object.
+    with (
+        tracing.span("crew.kickoff", endpoint=endpoint) as span,
+        compaction.report_scope() as compacted,
+        crew_pool.checkout(endpoint) as crew,
+        deadline_scope(budget),
+    ):
+        observers = [observer] if observer is not None else []
+        if checkpoint is not None:
+            from ..execution import TaskCheckpoint
+
+            observers.append(TaskCheckpoint(checkpoint))
+        for attached in observers:
+            attached.attach(crew)
+        try:
+            result = crew.kickoff(inputs=crew_registry.prepare_inputs(endpoint, inputs))
+        finally:
+            for attached in observers:
+                attached.detach(crew)
+            record_token_usage(crew.agents)
+            if compacted.saved:
+                logger.info(f"{endpoint}: context compaction saved {compacted.saved} of {compacted.before} tokens")
+                if span is not None:
+                    span.set("context_tokens_saved", compacted.saved)
+    return degraded_result(result, budget)
+
+# Caps on concurrent kickoffs, globally and per user, with bounded priority queues
+admission = AdmissionController()
+
+# Job records, cached results and in-flight runs shared by all API worker processes
+shared_store = store_from_env()
+
+# Bounded worker pool that keeps blocking kickoffs off the event loop; sized so
+# every admitted run gets a worker immediately
+jobs = JobManager(runner=run_crew, max_workers=admission.max_concurrent, store=shared_store)
+
+# Async-mode jobs go on a queue that every worker drains as it has free slots
+SHARED_QUEUE_ENABLED = shared_store is not None and os.getenv("APEX_SHARED_QUEUE", "1").lower() not in ("0", "false", "no")
+
+# Budget for requests that set no timeout of their own; unset means no deadline
+DEFAULT_TIMEOUT = float(os.environ["APEX_DEFAULT_TIMEOUT"]) if os.getenv("APEX_DEFAULT_TIMEOUT") else None
+
+def request_deadline(http_request: Request, timeout: Optional[float] = None) -> Optional[float]:
+    """
+    Unix time by which a request must be answered: the shorter of the
+    `X-Apex-Timeout` header and the body's timeoutSeconds (both in seconds),
+    else APEX_DEFAULT_TIMEOUT, else no deadline.
+    """
+    budgets = [timeout] if timeout is not None else []
+    header = http_request.headers.get("x-apex-timeout")
+    if header is not None:
+        try:
+            budgets.append(float(header))
+        except ValueError:
+            raise HTTPException(status_code=400, detail="X-Apex-Timeout must be a number of seconds")
+    if not budgets and DEFAULT_TIMEOUT is not None:
+        budgets.append(DEFAULT_TIMEOUT)
+    if not budgets:
+        return None
+    if min(budgets) <= 0:
+        raise HTTPException(status_code=400, detail="Timeout must be positive")
+    return time.time() + min(budgets)
+
+def remaining(deadline: Optional[float]) -> Optional[float]:
+    return None if deadline is None else deadline - time.time()
+
+# Batch Alpha Briefs: tickers per request and briefs generated at once per batch
+BATCH_MAX_TICKERS = int(os.getenv("APEX_BATCH_MAX_TICKERS", 50))
+BATCH_CONCURRENCY = int(os.getenv("APEX_BATCH_CONCURRENCY", 4))
+
+# Priority lane per endpoint; anything not listed runs in the standard lane
+ENDPOINT_LANES = {
+    "voice-command": Lane.INTERACTIVE,
+    "logistics/check": Lane.INTERACTIVE,
+    "weekly-sync": Lane.BACKGROUND,
+    "career/review": Lane.BACKGROUND,
+    "memory/process": Lane.BACKGROUND,
+}
+
+def request_lane(http_request: Request, endpoint: str) -> Lane:
+    """
+    Lane for a request. Callers such as schedulers and batch jobs may lower the
+    priority with `X-Apex-Priority: background`, but never raise it.
+    """
+    lane = ENDPOINT_LANES.get(endpoint, Lane.STANDARD)
+    requested = http_request.headers.get("x-apex-priority", "").lower()
+    if requested in Lane._value2member_map_:
+        requested_lane = Lane(requested)
+        if LANE_ORDER.index(requested_lane) > LANE_ORDER.index(lane):
+            return requested_lane
+    return lane
+
+# Alpha Briefs for the same ticker in the same market session are shared
+brief_cache = ResultCache.from_env("APEX_BRIEF_CACHE", store=shared_store, resolve_job=jobs.watch)
+
+def wants_stream(http_request: Request) -> bool:
+    """Clients opt into server-sent events with ?stream=true or `Accept: text/event-stream`."""
+    if http_request.query_params.get("stream", "").lower() in ("1", "true"):
+        return True
+    return "text/event-stream" in http_request.headers.get("accept", "")
+
+def wants_async(http_request: Request) -> bool:
+    """Clients opt into 202 + job-id mode with ?mode=async or `Prefer: respond-async`."""
+    if http_request.query_params.get("mode") == "async":
+        return True
+    return "respond-async" in http_request.headers.get("prefer", "")
+
+async def submit_admitted(
+    lane: Lane,
+    endpoint: str,
+    inputs: Dict[str, Any],
+    result_key: str,
+    cache: Optional[ResultCache] = None,
+    cache_key: Any = None,
+    observer: Any = None,
+    per_user: bool = True,
+    deadline: Optional[float] = None,
+):
+    """
+    Submit a crew job once admission control grants a slot; the slot is held until the job ends.
+
+    ``observer`` is attached to the crew for the run (see run_crew). Batches hold one
+    per-user reservation for all their runs and pass ``per_user=False``.
+    A request with a deadline waits for a slot no longer than its deadline allows.
+    """
+    try:
+        user_id = inputs.get("user_id") if per_user else None
+        with tracing.span("admission.wait", lane=lane.value):
+            ticket = await admission.acquire(user_id, lane, max_wait=remaining(deadline))
+    except AdmissionRejected as e:
+        raise HTTPException(
+            status_code=429,
+            detail=f"Too many crew runs in progress ({e.reason}); retry later",
+            headers={"Retry-After": str(e.retry_after)},
+        )
+
+    if cache is not None:
+        # Another request may have started the same run while this one waited.
+        job = await asyncio.to_thread(cache.rejoin, cache_key)
+        if job is not None:
+            admission.release(ticket)
+            return job
+
+    try:
+        job = await asyncio.to_thread(
+            jobs.submit, endpoint, inputs, result_key, observer=observer, deadline=deadline, lane=lane.value,
+        )
+    except WorkerDraining as e:
+        admission.release(ticket)
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
+    hold_slot(ticket, job)
+    if cache is not None:
+        cache.track(cache_key, job)
+    return job
+
+def hold_slot(ticket, job):
+    """Keep an admission slot until ``job`` finishes."""
+    loop = asyncio.get_running_loop()
+    job.future.add_done_callback(lambda _: loop.call_soon_threadsafe(admission.release, ticket))
+
+async def enqueue_shared(
+    lane: Lane,
+    endpoint: str,
+    inputs: Dict[str, Any],
+    result_key: str,
+    cache: Optional[ResultCache] = None,
+    cache_key: Any = None,
+    deadline: Optional[float] = None,
+):
+    """Put an async-mode job on the shared queue; admission is applied by the worker that takes it."""
+    try:
+        job = await asyncio.to_thread(jobs.enqueue, endpoint, inputs, result_key, lane.value, deadline)
+    except SharedQueueFull as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(admission.retry_after(lane))})
+    if cache is not None:
+        cache.track(cache_key, job)
+    return job
+
+async def drain_shared_queue():
+    """Run jobs from the shared queue, whichever worker queued them, while this worker has free slots."""
+    while not jobs.draining:
+        try:
+            item = await asyncio.to_thread(jobs.next_queued) if admission.has_capacity() else None
+            if item is None:
+                await asyncio.sleep(jobs.poll_interval)
+                continue
+            lane = Lane(item.get("lane", Lane.STANDARD.value))
+            deadline = item.get("deadline")
+            try:
+                ticket = await admission.acquire(item["inputs"].get("user_id"), lane, max_wait=remaining(deadline))
+            except AdmissionRejected:
+                await asyncio.to_thread(jobs.requeue, item)
+                await asyncio.sleep(jobs.poll_interval)
+                continue
+            try:
+                job = await asyncio.to_thread(
+                    jobs.submit, item["endpoint"], item["inputs"], item["resultKey"],
+                    job_id=item["jobId"], deadline=deadline, lane=lane.value, checkpoint=item.get("checkpoint"),
+                )
+            except WorkerDraining:
+                admission.release(ticket)
+                await asyncio.to_thread(jobs.requeue, item)
+                return
+            hold_slot(ticket, job)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning(f"Shared queue error: {e}")
+            await asyncio.sleep(jobs.poll_interval)
+
+# Responses of requests sent with an Idempotency-Key, replayed to retries
+idempotency = IdempotencyStore.from_env(shared=shared_store, resolve_job=jobs.watch)
+
+REPLAYED_HEADERS = {"Idempotent-Replayed": "true"}
+
+async def idempotency_claim(http_request: Request, endpoint: str, inputs: Dict[str, Any]) -> Optional[IdempotencyClaim]:
+    """Claim the request's `Idempotency-Key`, scoped to the endpoint and user, if it sent one."""
+    key = http_request.headers.get("idempotency-key")
+    if key is None:
+        return None
+    key = key.strip()
+    if not key or len(key) > MAX_KEY_LENGTH:
+        raise HTTPException(status_code=400, detail=f"Idempotency-Key must be 1-{MAX_KEY_LENGTH} characters")
+    try:
+        return await asyncio.to_thread(
+            idempotency.claim, f"{endpoint}:{inputs.get('user_id', '')}:{key}", fingerprint(inputs),
+        )
+    except IdempotencyConflict as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+async def follow_claim(http_request: Request, endpoint: str, inputs: Dict[str, Any], claim: IdempotencyClaim):
+    """
+    Wait for the request that owns an idempotency key to submit its run.
+
+    Returns ``(claim, job)``: the owner's job to attach to, or ``None`` with a
+    claim that now either holds a stored response or owns the key itself.
+    """
+    while not claim.owner and claim.replay is None:
+        job = await claim.job()
+        if job is not None:
+            return claim, job
+        claim = await idempotency_claim(http_request, endpoint, inputs)
+    return claim, None
+
+async def dispatch(
+    http_request: Request,
+    endpoint: str,
+    inputs: Dict[str, Any],
+    result_key: str,
+    extra: Optional[Dict[str, Any]] = None,
+    cache: Optional[ResultCache] = None,
+    cache_key: Any = None,
+    timeout: Optional[float] = None,
+):
+    """
+    Run a crew for an endpoint: inline (awaited), streamed as server-sent events,
+    or as a background job.
+
+    With a cache, fresh results are served immediately and concurrent requests
+    for the same key share the job already in flight. Retries carrying the same
+    `Idempotency-Key` attach to the original run or get its stored response.
+    With a deadline (see request_deadline) the crew returns partial, degraded
+    results rather than overrunning it.
+    """
+    deadline = request_deadline(http_request, timeout)
+    claim = await idempotency_claim(http_request, endpoint, inputs)
+
+    if wants_stream(http_request):
+        return StreamingResponse(
+            stream_crew(http_request, endpoint, inputs, result_key, cache, cache_key, claim, extra, deadline),
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        )
+
+    job = None
+    if claim is not None:
+        claim, job = await follow_claim(http_request, endpoint, inputs, claim)
+        if claim.replay is not None:
+            return JSONResponse(content=claim.replay, headers=REPLAYED_HEADERS)
+
+    if job is None:
+        try:
+            if cache is not None:
+                hit, value = await asyncio.to_thread(cache.get, cache_key)
+                if hit:
+                    response = {"success": True, "cached": True, **(extra or {}), result_key: value}
+                    if claim is not None:
+                        claim.complete(response)
+                    return response
+                job = await asyncio.to_thread(cache.join, cache_key)
+            if job is None:
+                lane = request_lane(http_request, endpoint)
+                if SHARED_QUEUE_ENABLED and wants_async(http_request):
+                    job = await enqueue_shared(lane, endpoint, inputs, result_key, cache, cache_key, deadline)
+                else:
+                    job = await submit_admitted(
+                        lane, endpoint, inputs, result_key, cache, cache_key, deadline=deadline,
+                    )
+        except BaseException as e:
+            if claim is not None:
+                # Retries waiting on this key see a rejection as-is and otherwise take the key over.
+                claim.abandon(e if isinstance(e, HTTPException) else None)
+            raise
+        if claim is not None:
+            claim.bind(job, result_key, extra)
+
+    if wants_async(http_request):
+        return accepted(job)
+    try:
+        # Shielded so a disconnecting client (or the deadline) cannot cancel a job other requests share
+        result = await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(job.future)), timeout=remaining(deadline))
+    except asyncio.TimeoutError:
+        # The crew overran its deadline; hand back the job so the client can still collect it.
+        return accepted(job, deadlineExceeded=True)
+    except JobHandedOff:
+        # This worker is shutting down and another one finishes the job.
+        return accepted(job, handedOff=True)
+    return {"success": True, **(extra or {}), result_key: result}
+
+def accepted(job, **content):
+    """202 response pointing the client at a job's status URL."""
+    status_url = f"/api/jobs/{job.id}"
+    return JSONResponse(
+        status_code=202,
+        content={"success": True, "jobId": job.id, "status": job.status.value, "statusUrl": status_url, **content},
+        headers={"Location": status_url},
+    )
+
+async def stream_crew(
+    http_request: Request,
+    endpoint: str,
+    inputs: Dict[str, Any],
+    result_key: str,
+    cache: Optional[ResultCache] = None,
+    cache_key: Any = None,
+    claim: Optional[IdempotencyClaim] = None,
+    extra: Optional[Dict[str, Any]] = None,
+    deadline: Optional[float] = None,
+):
+    """Event stream for one crew run: progress, tool calls and tokens, then the result."""
+    try:
+        async for chunk in _stream_crew(
+            http_request, endpoint, inputs, result_key, cache, cache_key, claim, extra, deadline,
+        ):
+            yield chunk
+    finally:
+        # A client that disconnects before its run was submitted must not hold the key.
+        if claim is not None and claim.owner and not claim.pending.done():
+            claim.abandon()
+
+async def _stream_crew(
+    http_request: Request,
+    endpoint: str,
+    inputs: Dict[str, Any],
+    result_key: str,
+    cache: Optional[ResultCache],
+    cache_key: Any,
+    claim: Optional[IdempotencyClaim],
+    extra: Optional[Dict[str, Any]],
+    deadline: Optional[float],
+):
+    stream = CrewEventStream(asyncio.get_running_loop())
+    yield format_sse("queued", {"endpoint": endpoint})
+
+    job = None
+    try:
+        if claim is not None:
+            claim, job = await follow_claim(http_request, endpoint, inputs, claim)
+            if claim.replay is not None:
+                yield format_sse("result", {**claim.replay, "replayed": True})
+                yield format_sse("done", {})
+                return
+            if job is not None:
+                yield format_sse("coalesced", {"jobId": job.id})
+
+        if job is None and cache is not None:
+            hit, value = await asyncio.to_thread(cache.get, cache_key)
+            if hit:
+                response = {"success": True, "cached": True, **(extra or {}), result_key: value}
+                if claim is not None:
+                    claim.complete(response)
+                yield format_sse("result", response)
+                yield format_sse("done", {})
+                return
+            job = await asyncio.to_thread(cache.join, cache_key)
+            if job is not None:
+                if claim is not None:
+                    claim.bind(job, result_key, extra)
+                yield format_sse("coalesced", {"jobId": job.id})
+
+        if job is None:
+            lane = request_lane(http_request, endpoint)
+            try:
+                job = await submit_admitted(
+                    lane, endpoint, inputs, result_key, cache, cache_key, observer=stream, deadline=deadline,
+                )
+            except BaseException as e:
+                if claim is not None:
+                    claim.abandon(e if isinstance(e, HTTPException) else None)
+                raise
+            if claim is not None:
+                claim.bind(job, result_key, extra)
+            yield format_sse("started", {"jobId": job.id})
+    except HTTPException as e:
+        retry_after = (e.headers or {}).get("Retry-After")
+        yield format_sse("error", {"success": False, "status": e.status_code, "error": e.detail, "retryAfter": retry_after})
+        yield format_sse("done", {})
+        return
+
+    async for chunk in stream.relay(job.future, result_key):
+        yield chunk
+
+metrics_registry.gauge_callback(
+    "apex_admission_active", "Crew runs in progress by priority lane", ("lane",),
+    lambda: {(name,): lane["active"] for name, lane in admission.stats()["lanes"].items()},
+)
+metrics_registry.gauge_callback(
+    "apex_admission_queue_depth", "Requests waiting for a crew slot by priority lane", ("lane",),
+    lambda: {(name,): lane["queue_depth"] for name, lane in admission.stats()["lanes"].items()},
+)
+
+@app.get("/metrics")
+async def metrics():
+    """Prometheus metrics: route, task and tool latency, tool errors, LLM tokens, admission state"""
+    return PlainTextResponse(metrics_registry.render(), media_type="text/plain; version=0.0.4")
 
 @app.get("/health")
 async def health_check():
     return {"status": "healthy", "service": "apex-ai-crewai-backend"}
 
+@app.get("/ready")
+async def readiness_check():
+    """Readiness probe: 503 until startup warm-up is done, so load balancers hold traffic until then"""
+    if shutdown["drain"] is not None:
+        return JSONResponse(status_code=503, content={"status": "draining"})
+    if not ready.is_set():
+        return JSONResponse(status_code=503, content={"status": "starting"})
+    return {"status": "ready", **startup}
+
+@app.get("/api/admission")
+async def admission_stats():
+    """Admission control state per priority lane: active runs, queue depth, wait times and rejections"""
+    return {"success": True, "admission": admission.stats()}
+
+@app.get("/api/idempotency")
+async def idempotency_stats():
+    """Stored, replayed and attached Idempotency-Key requests"""
+    return {"success": True, "idempotency": idempotency.stats()}
+
+@app.get("/api/tracing")
+async def tracing_stats():
+    """Trace sampling settings and export counts"""
+    return tracing.exporter.stats()
+
+@app.get("/api/llm-cache")
+async def llm_cache_stats():
+    """Mode, size and hit counters of the on-disk LLM completion cache"""
+    cache = llm_cache.get_cache()
+    return {"mode": "off"} if cache is None else cache.stats()
+
+@app.get("/api/simulation-cache")
+async def simulation_cache_stats():
+    """Hit rate, partial re-simulations and time saved by the life simulation cache"""
+    cache = simulation_cache.get_cache()
+    return {"enabled": False} if cache is None else {"enabled": True, **cache.stats()}
+
+@app.get("/api/prompt-cache")
+async def prompt_cache_stats():
+    """Share of LLM prompt tokens served from the provider's prefix cache, overall and per agent"""
+    return prompts.prompt_cache_stats()
+
+@app.get("/api/crew-pool")
+async def crew_pool_stats():
+    """Pre-built crew pool usage"""
+    return {"success": True, "pool": crew_pool.stats()}
+
+@app.get("/api/jobs/{job_id}")
+async def get_job(job_id: str):
+    """Get the status and, once finished, the result of a submitted crew job"""
+    record = await asyncio.to_thread(jobs.record, job_id)
+    if record is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+    return {"success": True, "job": jsonable_encoder(record)}
+
+@app.get("/api/generate-brief/cache")
+async def brief_cache_stats():
+    """Hit, miss and coalesced counters for the Alpha Brief cache"""
+    return {"success": True, "cache": brief_cache.stats()}
+
 @app.post("/api/generate-brief")
-async def generate_alpha_brief(request: AlphaBriefRequest):
+async def generate_alpha_brief(request: AlphaBriefRequest, http_request: Request):
     """Generate an Alpha Brief for a stock ticker"""
     try:
         inputs = {
             "user_id": request.userId,
             "ticker": request.ticker
         }
-        result = crew.crew().kickoff(inputs=inputs)
-        return {"success": True, "brief": result}
+        return await dispatch(
+            http_request, "generate-brief", inputs, "brief",
+            cache=brief_cache,
+            cache_key=(request.ticker.strip().upper(), market_session()),
+            timeout=request.timeoutSeconds,
+        )
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+async def stream_brief_batch(
+    http_request: Request,
+    user_id: str,
+    tickers: list[str],
+    concurrency: int,
+    deadline: Optional[float] = None,
+):
+    """Event stream for a batch of Alpha Briefs, one `brief` event per ticker as each finishes."""
+    from .batch import SharedToolResults
+
+    shared = SharedToolResults()
+    yield format_sse("queued", {"tickers": tickers, "concurrency": concurrency})
+
+    cached = {}
+    for ticker in tickers:
+        hit, value = await asyncio.to_thread(brief_cache.get, (ticker, market_session()))
+        if hit:
+            cached[ticker] = value
+
+    reservation = None
+    if len(cached) < len(tickers):
+        # The whole batch counts as one run against the user's cap.
+        try:
+            reservation = admission.reserve_user(user_id, request_lane(http_request, "generate-brief"))
+        except AdmissionRejected as e:
+            # Cached briefs are still served; the rest are rejected as one run would be.
+            for ticker, value in cached.items():
+                yield format_sse("brief", {"ticker": ticker, "success": True, "cached": True, "brief": value})
+            yield format_sse("error", {
+                "success": False, "status": 429, "retryAfter": e.retry_after,
+                "tickers": [ticker for ticker in tickers if ticker not in cached],
+                "error": f"Too many crew runs in progress ({e.reason}); retry later",
+            })
+            yield format_sse("done", {"tickers": len(tickers), "succeeded": len(cached), **shared.stats()})
+            return
+    try:
+        async for chunk in _stream_brief_batch(
+            http_request, user_id, tickers, concurrency, deadline, shared, cached,
+        ):
+            yield chunk
+    finally:
+        if reservation is not None:
+            admission.release_user(reservation)
+
+async def _stream_brief_batch(
+    http_request: Request,
+    user_id: str,
+    tickers: list[str],
+    concurrency: int,
+    deadline: Optional[float],
+    shared: Any,
+    cached: Dict[str, Any],
+):
+    from .batch import gather_market_context
+
+    market_context = "not provided"
+    if len(cached) < len(tickers):
+        try:
+            market_context = await asyncio.to_thread(gather_market_context, shared, deadline)
+            yield format_sse("market_context", {"gathered": True})
+        except Exception as e:
+            yield format_sse("market_context", {"gathered": False, "error": str(e)})
+
+    lane = request_lane(http_request, "generate-brief")
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def brief(ticker: str) -> Dict[str, Any]:
+        if ticker in cached:
+            return {"ticker": ticker, "success": True, "cached": True, "brief": cached[ticker]}
+        key = (ticker, market_session())
+        async with semaphore:
+            try:
+                job = await asyncio.to_thread(brief_cache.join, key)
+                if job is None:
+                    inputs = {"user_id": user_id, "ticker": ticker, "market_context": market_context}
+                    job = await submit_admitted(
+                        lane, "generate-brief", inputs, "brief", brief_cache, key,
+                        observer=shared, per_user=False, deadline=deadline,
+                    )
+                result = await asyncio.shield(asyncio.wrap_future(job.future))
+                return {"ticker": ticker, "success": True, "cached": False, "brief": result}
+            except HTTPException as e:
+                return {"ticker": ticker, "success": False, "status": e.status_code, "error": e.detail}
+            except Exception as e:
+                return {"ticker": ticker, "success": False, "error": str(e)}
+
+    completed = 0
+    for next_brief in asyncio.as_completed([brief(ticker) for ticker in tickers]):
+        outcome = await next_brief
+        completed += outcome["success"]
+        yield format_sse("brief" if outcome["success"] else "error", outcome)
+
+    yield format_sse("done", {"tickers": len(tickers), "succeeded": completed, **shared.stats()})
+
+@app.post("/api/generate-brief/batch")
+async def generate_alpha_brief_batch(request: BatchAlphaBriefRequest, http_request: Request):
+    """Generate Alpha Briefs for a watchlist, streaming each brief as soon as it completes"""
+    tickers = list(dict.fromkeys(t.strip().upper() for t in request.tickers if t.strip()))
+    if not tickers:
+        raise HTTPException(status_code=400, detail="At least one ticker is required")
+    if len(tickers) > BATCH_MAX_TICKERS:
+        raise HTTPException(status_code=400, detail=f"At most {BATCH_MAX_TICKERS} tickers per batch")
+    concurrency = max(1, min(request.maxConcurrency or BATCH_CONCURRENCY, BATCH_CONCURRENCY))
+    deadline = request_deadline(http_request, request.timeoutSeconds)
+    return StreamingResponse(
+        stream_brief_batch(http_request, request.userId, tickers, concurrency, deadline),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
 @app.post("/api/daily-path")
-async def generate_daily_path(request: DailyPathRequest):
+async def generate_daily_path(request: DailyPathRequest, http_request: Request):
     """Generate the Daily Optimal Path briefing"""
     try:
         inputs = {"user_id": request.userId}
-        result = crew.crew().kickoff(inputs=inputs)
-        return {"success": True, "briefing": result}
+        return await dispatch(http_request, "daily-path", inputs, "briefing", timeout=request.timeoutSeconds)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/api/mentorship")
-async def facilitate_mentorship(request: MentorshipRequest):
+async def facilitate_mentorship(request: MentorshipRequest, http_request: Request):
     """Facilitate mentorship connection"""
     try:
         inputs = {
             "user_id": request.userId,
             "quest_id": request.questId
         }
-        result = crew.crew().kickoff(inputs=inputs)
-        return {"success": True, "connection": result}
+        return await dispatch(http_request, "mentorship", inputs, "connection", timeout=request.timeoutSeconds)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/api/travel/plan")
-async def plan_travel(request: TravelRequest):
+async def plan_travel(request: TravelRequest, http_request: Request):
     """Plan a personalized getaway"""
     try:
         inputs = {
@@ -110,33 +877,36 @@ async def plan_travel(request: TravelRequest):
             "dates": request.dates,
             "preferences": request.preferences
         }
-        result = crew.crew().kickoff(inputs=inputs)
-        return {"success": True, "itinerary": result}
+        return await dispatch(http_request, "travel/plan", inputs, "itinerary", timeout=request.timeoutSeconds)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/api/career/review")
-async def conduct_career_review(request: CareerReviewRequest):
+async def conduct_career_review(request: CareerReviewRequest, http_request: Request):
     """Conduct quarterly career review"""
     try:
         inputs = {"user_id": request.userId}
-        result = crew.crew().kickoff(inputs=inputs)
-        return {"success": True, "review": result}
+        return await dispatch(http_request, "career/review", inputs, "review", timeout=request.timeoutSeconds)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/api/weekly-sync")
-async def conduct_weekly_sync(request: WeeklySyncRequest):
+async def conduct_weekly_sync(request: WeeklySyncRequest, http_request: Request):
     """Conduct weekly sync and strategy session"""
     try:
         inputs = {"user_id": request.userId}
-        result = crew.crew().kickoff(inputs=inputs)
-        return {"success": True, "session": result}
+        return await dispatch(http_request, "weekly-sync", inputs, "session", timeout=request.timeoutSeconds)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/api/voice-command")
-async def execute_voice_command(request: VoiceCommandRequest):
+async def execute_voice_command(request: VoiceCommandRequest, http_request: Request):
     """Execute a voice command"""
     try:
         inputs = {
@@ -145,26 +915,28 @@ async def execute_voice_command(request: VoiceCommandRequest):
             "intent": request.intent,
             "entities": request.entities
         }
-        result = crew.crew().kickoff(inputs=inputs)
-        return {"success": True, "result": result}
+        return await dispatch(http_request, "voice-command", inputs, "result", timeout=request.timeoutSeconds)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/api/logistics/check")
-async def check_logistics(request: LogisticsRequest):
+async def check_logistics(request: LogisticsRequest, http_request: Request):
     """Check travel logistics and suggest solutions"""
     try:
         inputs = {
             "user_id": request.userId,
             "event_id": request.eventId
         }
-        result = crew.crew().kickoff(inputs=inputs)
-        return {"success": True, "recommendation": result}
+        return await dispatch(http_request, "logistics/check", inputs, "recommendation", timeout=request.timeoutSeconds)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/api/memory/process")
-async def process_memory(request: MemoryProcessRequest):
+async def process_memory(request: MemoryProcessRequest, http_request: Request):
     """Process user feedback and update adaptive memory"""
     try:
         inputs = {
@@ -175,13 +947,13 @@ async def process_memory(request: MemoryProcessRequest):
         }
         
         # Trigger memory processing crew to extract learnings
-        result = crew.crew().kickoff(inputs=inputs)
-        
-        return {
-            "success": True,
-            "message": "Memory processed successfully",
-            "learnings_extracted": result
-        }
+        return await dispatch(
+            http_request, "memory/process", inputs, "learnings_extracted",
+            extra={"message": "Memory processed successfully"},
+            timeout=request.timeoutSeconds,
+        )
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -0,0 +1,223 @@
+"""
+Shared state for API workers.
+
+Under gunicorn every worker is its own process, so job records, cached results
+and in-flight coalescing kept in memory are invisible to the other workers. A
+SharedStore holds that state in one place all workers on a host (or cluster)
+can reach:
+- keys with an optional expiry, for job records, cached results and the job
+  that currently owns a coalescing key;
+- FIFO queues, for async jobs any worker may pick up.
+
+Backends are selected with ``APEX_STORE_URL``:
+- ``sqlite:///path/to/file.sqlite3`` (default ``sqlite:///.apex/apex.sqlite3``):
+  one SQLite file in WAL mode, shared by the workers of one host;
+- ``redis://host:port/db``: Redis or any Redis-compatible server (Valkey,
+  KeyDB, Dragonfly), shared across hosts; requires the ``redis`` package;
+- ``none``: no shared store; every worker keeps its state to itself.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Optional
+
+
+class SharedStore:
+    """Key/value and queue operations every backend provides. Values are strings."""
+
+    def get(self, key: str) -> Optional[str]:
+        raise NotImplementedError
+
+    def set(self, key: str, value: str, ttl: Optional[float] = None):
+        raise NotImplementedError
+
+    def add(self, key: str, value: str, ttl: Optional[float] = None) -> bool:
+        """Set ``key`` only if it is absent (or expired). Returns whether it was set."""
+        raise NotImplementedError
+
+    def delete(self, key: str):
+        raise NotImplementedError
+
+    def push(self, queue: str, value: str):
+        raise NotImplementedError
+
+    def pop(self, queue: str) -> Optional[str]:
+        """Remove and return the oldest item of ``queue``; each item goes to exactly one caller."""
+        raise NotImplementedError
+
+    def length(self, queue: str) -> int:
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+    def get_json(self, key: str) -> Any:
+        value = self.get(key)
+        return None if value is None else json.loads(value)
+
+    def set_json(self, key: str, value: Any, ttl: Optional[float] = None):
+        self.set(key, json.dumps(value, default=str), ttl)
+
+
+class SQLiteStore(SharedStore):
+    """
+    SharedStore on a SQLite file in WAL mode.
+
+    WAL lets every worker read while one writes, and BEGIN IMMEDIATE makes
+    set-if-absent and queue pops atomic across processes.
+    """
+
+    # Expired keys are swept after this many writes
+    PURGE_EVERY = 200
+
+    def __init__(self, path: str):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=10)
+        self._lock = threading.Lock()
+        self._writes = 0
+        with self._lock:
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS kv (key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL)"
+            )
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS queue ("
+                " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+                " name TEXT NOT NULL,"
+                " value TEXT NOT NULL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS queue_name ON queue (name, id)")
+
+    @staticmethod
+    def _expiry(ttl: Optional[float]) -> Optional[float]:
+        return None if ttl is None else time.time() + ttl
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            row = self._db.execute("SELECT value, expires_at FROM kv WHERE key = ?", (key,)).fetchone()
+        if row is None or (row[1] is not None and row[1] <= time.time()):
+            return None
+        return row[0]
+
+    def set(self, key: str, value: str, ttl: Optional[float] = None):
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO kv (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, value, self._expiry(ttl)),
+            )
+            self._written()
+
+    def add(self, key: str, value: str, ttl: Optional[float] = None) -> bool:
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                self._db.execute("DELETE FROM kv WHERE key = ? AND expires_at <= ?", (key, time.time()))
+                cursor = self._db.execute(
+                    "INSERT OR IGNORE INTO kv (key, value, expires_at) VALUES (?, ?, ?)",
+                    (key, value, self._expiry(ttl)),
+                )
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+            self._written()
+            return cursor.rowcount == 1
+
+    def delete(self, key: str):
+        with self._lock:
+            self._db.execute("DELETE FROM kv WHERE key = ?", (key,))
+
+    def push(self, queue: str, value: str):
+        with self._lock:
+            self._db.execute("INSERT INTO queue (name, value) VALUES (?, ?)", (queue, value))
+
+    def pop(self, queue: str) -> Optional[str]:
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._db.execute(
+                    "SELECT id, value FROM queue WHERE name = ? ORDER BY id LIMIT 1", (queue,)
+                ).fetchone()
+                if row is not None:
+                    self._db.execute("DELETE FROM queue WHERE id = ?", (row[0],))
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+        return None if row is None else row[1]
+
+    def length(self, queue: str) -> int:
+        with self._lock:
+            (count,) = self._db.execute("SELECT COUNT(*) FROM queue WHERE name = ?", (queue,)).fetchone()
+        return count
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    def _written(self):
+        self._writes += 1
+        if self._writes % self.PURGE_EVERY == 0:
+            self._db.execute("DELETE FROM kv WHERE expires_at <= ?", (time.time(),))
+
+
+class RedisStore(SharedStore):
+    """SharedStore on Redis or a Redis-compatible server. Keys are namespaced with ``prefix``."""
+
+    def __init__(self, url: str, prefix: str = "apex:"):
+        try:
+            import redis
+        except ImportError as e:
+            raise RuntimeError("APEX_STORE_URL points at Redis but the 'redis' package is not installed") from e
+        self.url = url
+        self.prefix = prefix
+        self._redis = redis.Redis.from_url(url, decode_responses=True)
+
+    @staticmethod
+    def _ttl_ms(ttl: Optional[float]) -> Optional[int]:
+        return None if ttl is None else max(1, int(ttl * 1000))
+
+    def get(self, key: str) -> Optional[str]:
+        return self._redis.get(self.prefix + key)
+
+    def set(self, key: str, value: str, ttl: Optional[float] = None):
+        self._redis.set(self.prefix + key, value, px=self._ttl_ms(ttl))
+
+    def add(self, key: str, value: str, ttl: Optional[float] = None) -> bool:
+        return bool(self._redis.set(self.prefix + key, value, px=self._ttl_ms(ttl), nx=True))
+
+    def delete(self, key: str):
+        self._redis.delete(self.prefix + key)
+
+    def push(self, queue: str, value: str):
+        self._redis.rpush(self.prefix + queue, value)
+
+    def pop(self, queue: str) -> Optional[str]:
+        return self._redis.lpop(self.prefix + queue)
+
+    def length(self, queue: str) -> int:
+        return self._redis.llen(self.prefix + queue)
+
+    def close(self):
+        self._redis.close()
+
+
+def open_store(url: str) -> Optional[SharedStore]:
+    """Open the SharedStore for ``url``; ``none`` (or empty) means no shared store."""
+    if not url or url.lower() in ("none", "memory"):
+        return None
+    if url.startswith("sqlite:///"):
+        return SQLiteStore(url[len("sqlite:///"):])
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        return RedisStore(url)
+    raise ValueError(f"Unsupported APEX_STORE_URL: {url}")
+
+
+def store_from_env() -> Optional[SharedStore]:
+    return open_store(os.getenv("APEX_STORE_URL", "sqlite:///.apex/apex.sqlite3"))
@@ -0,0 +1,129 @@
+"""
+Server-sent event streaming of crew progress.
+
+A CrewEventStream is attached to the crew for a single run. It collects
+task-started, tool-call, task-completed, LLM token and Echo Path events from
+the worker thread executing the crew and relays them to the client as SSE while the run
+is in progress, so the first bytes reach the client within milliseconds
+instead of after the full kickoff.
+"""
+import asyncio
+import json
+from concurrent.futures import Future
+from typing import Any, AsyncIterator, Dict, Optional
+
+from fastapi.encoders import jsonable_encoder
+
+from ..execution import unwrap_tool
+from ..llm import current_agent
+from .jobs import JobHandedOff
+
+
+def format_sse(event: str, data: Any) -> str:
+    return f"event: {event}\ndata: {json.dumps(jsonable_encoder(data), default=str)}\n\n"
+
+
+def _task_name(task) -> str:
+    return getattr(task, "name", None) or task.description[:60]
+
+
+class CrewEventStream:
+    """Collects crew events on worker threads and relays them to an SSE response."""
+
+    def __init__(self, loop: asyncio.AbstractEventLoop):
+        self.loop = loop
+        self.queue: "asyncio.Queue[Optional[str]]" = asyncio.Queue()
+        self._step_callbacks: Dict[int, Any] = {}
+
+    def emit(self, event: str, data: Dict[str, Any]):
+        """Queue an event; safe to call from any thread."""
+        self.loop.call_soon_threadsafe(self.queue.put_nowait, format_sse(event, data))
+
+    # InstrumentedTask listener interface
+
+    def task_started(self, task):
+        self.emit("task_started", {"task": _task_name(task), "agent": getattr(task.agent, "role", None)})
+
+    def task_completed(self, task, output):
+        self.emit("task_completed", {"task": _task_name(task), "output": getattr(output, "raw", str(output))})
+
+    def task_failed(self, task, error: Exception):
+        self.emit("task_failed", {"task": _task_name(task), "error": str(error)})
+
+    def _step_callback(self, agent_role: str):
+        def callback(step):
+            if hasattr(step, "tool"):
+                self.emit("tool_call", {"agent": agent_role, "tool": step.tool, "input": step.tool_input})
+            elif hasattr(step, "result"):
+                self.emit("tool_result", {"agent": agent_role, "result": str(step.result)[:2000]})
+            else:
+                self.emit("agent_step", {"agent": agent_role, "output": str(getattr(step, "output", step))[:2000]})
+
+        return callback
+
+    def _token_listener(self, token: str):
+        # Agents of a tier share an LLM, so the token belongs to the agent whose task is running
+        self.emit("token", {"agent": current_agent.get(), "token": token})
+
+    def _path_listener(self, agent_role: str):
+        def listener(index: int, path: Dict[str, Any]):
+            self.emit("echo_path", {"agent": agent_role, "index": index, "path": path})
+
+        return listener
+
+    def attach(self, crew):
+        """Hook into a checked-out crew's tasks, agents and LLMs for the duration of one run."""
+        for task in crew.tasks:
+            if hasattr(task, "add_listener"):
+                task.add_listener(self)
+        for agent in crew.agents:
+            callback = self._step_callback(agent.role)
+            self._step_callbacks[id(agent)] = callback
+            agent.step_callback = callback
+            if hasattr(agent.llm, "token_listener"):
+                agent.llm.token_listener = self._token_listener
+            for tool in agent.tools or []:
+                tool = unwrap_tool(tool)
+                if hasattr(tool, "path_listener"):
+                    tool.path_listener = self._path_listener(agent.role)
+
+    def detach(self, crew):
+        """Remove every hook installed by attach() so a pooled crew is clean for its next run."""
+        for task in crew.tasks:
+            if hasattr(task, "remove_listener"):
+                task.remove_listener(self)
+        for agent in crew.agents:
+            if agent.step_callback is self._step_callbacks.get(id(agent)):
+                agent.step_callback = None
+            if hasattr(agent.llm, "token_listener"):
+                agent.llm.token_listener = None
+            for tool in agent.tools or []:
+                tool = unwrap_tool(tool)
+                if hasattr(tool, "path_listener"):
+                    tool.path_listener = None
+        self._step_callbacks.clear()
+
+    async def relay(self, future: Future, result_key: str) -> AsyncIterator[str]:
+        """Yield queued events until the job's future resolves, then its result or error."""
+        done = asyncio.shield(asyncio.wrap_future(future))
+        while True:
+            getter = asyncio.ensure_future(self.queue.get())
+            finished, _ = await asyncio.wait({getter, done}, return_when=asyncio.FIRST_COMPLETED)
+            if getter in finished:
+                yield getter.result()
+                continue
+            getter.cancel()
+            break
+
+        while not self.queue.empty():
+            yield self.queue.get_nowait()
+
+        error = done.exception()
+        if isinstance(error, JobHandedOff):
+            # The worker is shutting down; the client can collect the result from any worker.
+            yield format_sse("handed_off", {"jobId": error.job_id, "statusUrl": f"/api/jobs/{error.job_id}"})
+        elif error is not None:
+            yield format_sse("error", {"success": False, "error": str(error)})
+        else:
+            yield format_sse("result", {"success": True, result_key: done.result()})
+        yield format_sse("done", {})
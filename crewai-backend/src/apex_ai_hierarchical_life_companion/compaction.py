@@ -0,0 +1,312 @@
+"""
+Token-budgeted compaction of what tasks hand to the LLM.
+
+A task receives the raw outputs of its upstream tasks as context, and every
+tool result goes into the agent's prompt as returned. ScrapeWebsiteTool page
+dumps make both grow to tens of thousands of tokens. Two stages shrink them
+before they reach the LLM:
+
+- tool results (compact_tool_output): scraped pages are reduced to their main
+  content, with markup, scripts, navigation, boilerplate lines such as menus
+  and cookie banners, and repeated passages dropped. Any tool result is then cut to
+  ``APEX_TOOL_OUTPUT_TOKENS``;
+- upstream context (compact_context): each output is cleaned the same way, and
+  passages repeated within or across outputs are kept once. The result is fit
+  to the task's budget: ``context_tokens`` in tasks.yaml, else
+  ``APEX_CONTEXT_TOKENS``. Short outputs are kept whole and the rest share what
+  is left. An output over its share is truncated, keeping its beginning and end,
+  or, with ``APEX_CONTEXT_SUMMARIZE=1``, summarized by the fast-tier LLM.
+
+Tokens are counted with tiktoken when it is installed and estimated at four
+characters per token otherwise. Tokens saved are counted in
+``apex_context_tokens_saved_total`` and on the task's trace span, and summed
+per run by a CompactionReport opened with report_scope().
+"""
+import logging
+import os
+import re
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from html.parser import HTMLParser
+from typing import Any, Dict, Iterator, List, Optional
+
+from . import metrics, tracing
+
+logger = logging.getLogger(__name__)
+
+ENABLED = os.getenv("APEX_CONTEXT_COMPACTION", "1").lower() not in ("0", "false", "no")
+CONTEXT_TOKENS = int(os.getenv("APEX_CONTEXT_TOKENS", 8000))
+TOOL_OUTPUT_TOKENS = int(os.getenv("APEX_TOOL_OUTPUT_TOKENS", 3000))
+SUMMARIZE = os.getenv("APEX_CONTEXT_SUMMARIZE", "0").lower() in ("1", "true", "yes")
+
+# CrewAI joins the raw outputs of a task's upstream tasks with this divider
+CONTEXT_DIVIDER = "\n\n----------\n\n"
+
+# Tools that return the text of a web page
+PAGE_TOOLS = {"ScrapeWebsiteTool"}
+
+# Passages shorter than this are headings or labels; repeating them is harmless
+MIN_DEDUP_CHARS = 40
+
+# Summarizing an output takes an LLM call; below this many seconds left it is truncated instead
+MIN_SUMMARY_SECONDS = 20.0
+
+TOKENS_SAVED = metrics.registry.counter(
+    "apex_context_tokens_saved_total", "Prompt tokens removed by context compaction", ("task", "stage")
+)
+
+_SKIPPED_TAGS = {"script", "style", "noscript", "template", "svg", "nav", "header", "footer", "aside", "form", "iframe"}
+_BLOCK_TAGS = {"p", "div", "section", "article", "main", "br", "li", "tr", "h1", "h2", "h3", "h4", "h5", "h6", "pre", "blockquote"}
+_HTML = re.compile(r"<(html|body|div|p|span|script|a)\b", re.I)
+_BOILERPLATE = re.compile(
+    r"^(home|menu|search|sign in|log in|login|sign up|subscribe|share|skip to (main )?content|"
+    r"(accept|reject|manage) (all )?cookies|cookie (settings|policy)|privacy policy|terms of (use|service)|"
+    r"all rights reserved|advertisement|related articles|read more|back to top)\b",
+    re.I,
+)
+_SPACES = re.compile(r"[ \t\f\v]+")
+
+
+class _MainContent(HTMLParser):
+    """Text of an HTML page outside scripts, styles, navigation, headers, footers and forms."""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.parts: List[str] = []
+        self._skipping = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in _SKIPPED_TAGS:
+            self._skipping += 1
+        elif tag in _BLOCK_TAGS:
+            self.parts.append("\n")
+
+    def handle_endtag(self, tag):
+        if tag in _SKIPPED_TAGS and self._skipping:
+            self._skipping -= 1
+        elif tag in _BLOCK_TAGS:
+            self.parts.append("\n")
+
+    def handle_data(self, data):
+        if not self._skipping:
+            self.parts.append(data)
+
+
+_encoding = None
+_encoding_lock = threading.Lock()
+
+
+def count_tokens(text: str) -> int:
+    """Tokens in ``text`` by tiktoken's o200k encoding, or about four characters per token without it."""
+    global _encoding
+    if _encoding is None:
+        with _encoding_lock:
+            if _encoding is None:
+                try:
+                    import tiktoken
+
+                    _encoding = tiktoken.get_encoding("o200k_base")
+                except Exception:
+                    _encoding = False
+    if _encoding:
+        return len(_encoding.encode(text, disallowed_special=()))
+    return (len(text) + 3) // 4
+
+
+def main_content(text: str) -> str:
+    """
+    The readable content of a scraped page: markup removed if ``text`` is HTML,
+    then whitespace collapsed and boilerplate lines dropped.
+    """
+    if _HTML.search(text):
+        parser = _MainContent()
+        try:
+            parser.feed(text)
+            parser.close()
+            text = "".join(parser.parts)
+        except Exception:
+            pass
+    lines = []
+    for line in text.splitlines():
+        line = _SPACES.sub(" ", line).strip()
+        # Menu entries and banners are short lines of stock phrases
+        if not line or (len(line) < 60 and _BOILERPLATE.match(line)):
+            continue
+        lines.append(line)
+    return "\n".join(lines)
+
+
+def _passages(text: str) -> List[str]:
+    passages = [p.strip() for p in re.split(r"\n\s*\n", text)]
+    if len(passages) == 1:
+        # Scraped text has no blank lines; treat each line as a passage
+        passages = [line.strip() for line in text.splitlines()]
+    return [p for p in passages if p]
+
+
+def deduplicate(outputs: List[str]) -> List[str]:
+    """Drop passages already seen earlier in the same or a previous output."""
+    seen = set()
+    result = []
+    for output in outputs:
+        kept = []
+        for passage in _passages(output):
+            key = _SPACES.sub(" ", passage.lower())
+            if len(key) >= MIN_DEDUP_CHARS:
+                if key in seen:
+                    continue
+                seen.add(key)
+            kept.append(passage)
+        result.append("\n\n".join(kept))
+    return result
+
+
+def truncate(text: str, budget: int) -> str:
+    """Cut ``text`` to about ``budget`` tokens, keeping the first two thirds and the last third of them."""
+    tokens = count_tokens(text)
+    if tokens <= budget:
+        return text
+    # Character positions scaled from the token ratio; close enough for a budget
+    chars = int(len(text) * budget / tokens)
+    head, tail = chars * 2 // 3, chars // 3
+    omitted = tokens - budget
+    return f"{text[:head].rstrip()}\n[... about {omitted} tokens omitted ...]\n{text[len(text) - tail:].lstrip()}"
+
+
+def _summarize(text: str, budget: int) -> Optional[str]:
+    """A summary of ``text`` in at most ``budget`` tokens by the fast-tier LLM, or None if it fails."""
+    from .deadlines import current_deadline
+    from .llm import build_llm, tier_model
+
+    deadline = current_deadline()
+    if deadline is not None and deadline.remaining() < MIN_SUMMARY_SECONDS:
+        return None
+    try:
+        llm = build_llm(model=tier_model("fast"), temperature=0.0)
+        summary = llm.call([
+            {
+                "role": "system",
+                "content": (
+                    "Condense the report you are given for another analyst. Keep every figure, "
+                    "date, name, recommendation and risk. Drop repetition and filler. "
+                    f"Answer in at most {budget * 3 // 4} words."
+                ),
+            },
+            {"role": "user", "content": text},
+        ])
+    except Exception as e:
+        logger.warning(f"Context summary failed, truncating instead: {e}")
+        return None
+    return truncate(summary, budget) if summary else None
+
+
+def _shares(sizes: List[int], budget: int) -> List[int]:
+    """Split ``budget`` so outputs under an equal share keep their size and the rest split what remains."""
+    shares = [0] * len(sizes)
+    remaining, left = budget, len(sizes)
+    for index in sorted(range(len(sizes)), key=sizes.__getitem__):
+        shares[index] = min(sizes[index], remaining // left)
+        remaining -= shares[index]
+        left -= 1
+    return shares
+
+
+class CompactionReport:
+    """Tokens before and after compaction during one run, per task and stage."""
+
+    def __init__(self):
+        self.before = 0
+        self.after = 0
+        self.by_task: Dict[str, Dict[str, int]] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def saved(self) -> int:
+        return self.before - self.after
+
+    def add(self, task: str, stage: str, before: int, after: int):
+        with self._lock:
+            self.before += before
+            self.after += after
+            entry = self.by_task.setdefault(task, {"context": 0, "tool": 0})
+            entry[stage] += before - after
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"tokensBefore": self.before, "tokensAfter": self.after, "tokensSaved": self.saved, "byTask": self.by_task}
+
+
+_report: ContextVar[Optional[CompactionReport]] = ContextVar("apex_compaction_report", default=None)
+# Task whose agent is running, so tool results are attributed to it
+_task: ContextVar[str] = ContextVar("apex_compaction_task", default="unnamed")
+
+
+@contextmanager
+def report_scope() -> Iterator[CompactionReport]:
+    """Collect the tokens saved by compaction in the block, including on CrewAI's async task threads."""
+    report = CompactionReport()
+    token = _report.set(report)
+    try:
+        yield report
+    finally:
+        _report.reset(token)
+
+
+@contextmanager
+def task_scope(task: str) -> Iterator[None]:
+    """Attribute tool results compacted in the block to ``task``."""
+    token = _task.set(task)
+    try:
+        yield
+    finally:
+        _task.reset(token)
+
+
+def _record(task: str, stage: str, before: int, after: int):
+    if before <= after:
+        return
+    TOKENS_SAVED.inc(task, stage, amount=before - after)
+    report = _report.get()
+    if report is not None:
+        report.add(task, stage, before, after)
+
+
+def compact_context(task: str, context: Optional[str], budget: Optional[int] = None) -> Optional[str]:
+    """The upstream ``context`` of ``task``, cleaned, deduplicated and fit to ``budget`` tokens."""
+    if not ENABLED or not context:
+        return context
+    budget = budget or CONTEXT_TOKENS
+    before = count_tokens(context)
+    outputs = deduplicate([main_content(output) for output in context.split(CONTEXT_DIVIDER)])
+    sizes = [count_tokens(output) for output in outputs]
+    if sum(sizes) > budget:
+        shares = _shares(sizes, budget)
+        for index, (size, share) in enumerate(zip(sizes, shares)):
+            if size <= share:
+                continue
+            summary = _summarize(outputs[index], share) if SUMMARIZE else None
+            outputs[index] = summary or truncate(outputs[index], share)
+    compacted = CONTEXT_DIVIDER.join(outputs)
+    after = count_tokens(compacted)
+    if after >= before:
+        return context
+    _record(task, "context", before, after)
+    span = tracing.current_span()
+    if span is not None:
+        span.set("context_tokens_saved", before - after)
+    return compacted
+
+
+def compact_tool_output(tool: str, result: Any) -> Any:
+    """A tool result cut to ``APEX_TOOL_OUTPUT_TOKENS``, reduced to its main content first for page tools."""
+    if not ENABLED or not isinstance(result, str) or not result:
+        return result
+    cleaned = deduplicate([main_content(result)])[0] if tool in PAGE_TOOLS else result
+    # Short results are left alone without counting them exactly
+    if len(cleaned) <= TOOL_OUTPUT_TOKENS * 2 and cleaned is result:
+        return result
+    compacted = truncate(cleaned, TOOL_OUTPUT_TOKENS)
+    if compacted == result:
+        return result
+    _record(_task.get(), "tool", count_tokens(result), count_tokens(compacted))
+    return compacted
@@ -1,7 +1,8 @@
-from crewai import Agent, Crew, Process, Task
+from crewai import Agent, Crew, Process
 from crewai.project import CrewBase, agent, crew, task
 from crewai_tools import SerperDevTool, ScrapeWebsiteTool
-from langchain_openai import ChatOpenAI
+from .execution import InstrumentedTask as Task, plan_parallel_execution, with_deadline
+from .llm import TieredLLMs, split_tier
 
 @CrewBase
 class ApexAiHierarchicalLifeCompanion:
@@ -11,9 +12,9 @@ class ApexAiHierarchicalLifeCompanion:
     tasks_config = 'config/tasks.yaml'
 
     def __init__(self):
-        self.llm = ChatOpenAI(model="gpt-4o", temperature=0.7)
-        self.search_tool = SerperDevTool()
-        self.scrape_tool = ScrapeWebsiteTool()
+        self.llms = TieredLLMs(temperature=0.7)
+        self.search_tool = with_deadline(SerperDevTool(), third_party=True)
+        self.scrape_tool = with_deadline(ScrapeWebsiteTool(), third_party=True)
 
     @agent
     def jarvis_financial_intelligence_specialist(self) -> Agent:
@@ -21,10 +22,11 @@ class ApexAiHierarchicalLifeCompanion:
         Financial Intelligence Specialist Agent
         Expert in market analysis, fundamental research, and investment recommendations
         """
+        config, tier = split_tier(self.agents_config['jarvis_financial_intelligence_specialist'])
         return Agent(
-            config=self.agents_config['jarvis_financial_intelligence_specialist'],
+            config=config,
             tools=[self.search_tool, self.scrape_tool],
-            llm=self.llm,
+            llm=self.llms.get(tier),
             verbose=True,
             allow_delegation=False
         )
@@ -35,10 +37,11 @@ class ApexAiHierarchicalLifeCompanion:
         Market Data Analyst Agent
         Specializes in technical analysis and market trends
         """
+        config, tier = split_tier(self.agents_config['market_data_analyst'])
         return Agent(
-            config=self.agents_config['market_data_analyst'],
+            config=config,
             tools=[self.search_tool, self.scrape_tool],
-            llm=self.llm,
+            llm=self.llms.get(tier),
             verbose=True,
             allow_delegation=False
         )
@@ -49,10 +52,11 @@ class ApexAiHierarchicalLifeCompanion:
         News & Sentiment Analyst Agent
         Analyzes news, social media, and market sentiment
         """
+        config, tier = split_tier(self.agents_config['news_sentiment_analyst'])
         return Agent(
-            config=self.agents_config['news_sentiment_analyst'],
+            config=config,
             tools=[self.search_tool, self.scrape_tool],
-            llm=self.llm,
+            llm=self.llms.get(tier),
             verbose=True,
             allow_delegation=False
         )
@@ -61,33 +65,41 @@ class ApexAiHierarchicalLifeCompanion:
     def gather_market_data_task(self) -> Task:
         """Task to gather comprehensive market data for a ticker"""
         return Task(
-            config=self.tasks_config['gather_market_data'],
-            agent=self.market_data_analyst()
+            name='gather_market_data',
+            config=split_tier(self.tasks_config['gather_market_data'])[0],
+            agent=self.market_data_analyst(),
+            context=[]  # Independent of the other tasks, so it can run concurrently
         )
 
     @task
     def analyze_news_sentiment_task(self) -> Task:
         """Task to analyze news and sentiment for a ticker"""
         return Task(
-            config=self.tasks_config['analyze_news_sentiment'],
-            agent=self.news_sentiment_analyst()
+            name='analyze_news_sentiment',
+            config=split_tier(self.tasks_config['analyze_news_sentiment'])[0],
+            agent=self.news_sentiment_analyst(),
+            context=[]  # Independent of the other tasks, so it can run concurrently
         )
 
     @task
     def generate_alpha_brief_task(self) -> Task:
         """Task to generate comprehensive Alpha Brief"""
         return Task(
-            config=self.tasks_config['generate_alpha_brief'],
+            name='generate_alpha_brief',
+            config=split_tier(self.tasks_config['generate_alpha_brief'])[0],
             agent=self.jarvis_financial_intelligence_specialist(),
             context=[self.gather_market_data_task(), self.analyze_news_sentiment_task()]
         )
 
     @crew
     def crew(self) -> Crew:
-        """Creates the Apex AI Financial Intelligence crew"""
+        """
+        Creates the Apex AI Financial Intelligence crew.
+        Market data and news sentiment run in parallel; the Alpha Brief starts once both finish.
+        """
         return Crew(
             agents=self.agents,
-            tasks=self.tasks,
+            tasks=plan_parallel_execution(self.tasks),
             process=Process.sequential,
             verbose=True
         )
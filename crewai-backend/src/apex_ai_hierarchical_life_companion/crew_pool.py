@@ -0,0 +1,124 @@
+"""
+Crew Pool - warm, reusable crew instances per endpoint
+
+Building a crew re-runs the CrewBase machinery, reads the YAML config and
+constructs new Agent, Task, LLM and tool objects. The pool builds crews ahead
+of time and hands them out one request at a time, resetting per-run state when
+a crew is returned so the next request starts clean.
+"""
+import logging
+import os
+import queue
+import threading
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterable, Optional
+
+from . import crew_registry
+
+logger = logging.getLogger(__name__)
+
+
+def reset_crew(crew) -> None:
+    """Clear the per-run state a kickoff leaves on a crew, its tasks and agents."""
+    for task in crew.tasks:
+        task.output = None
+        for attr, value in (("used_tools", 0), ("tools_errors", 0), ("delegations", 0), ("retry_count", 0)):
+            if hasattr(task, attr):
+                setattr(task, attr, value)
+        if hasattr(task, "processed_by_agents"):
+            task.processed_by_agents = set()
+        if hasattr(task, "clear_listeners"):
+            task.clear_listeners()
+
+    for agent in crew.agents:
+        if hasattr(agent, "tools_results"):
+            agent.tools_results = []
+        if getattr(agent.llm, "token_listener", None) is not None:
+            agent.llm.token_listener = None
+
+    # Tool results are cached per crew; never let them leak into another user's request.
+    if getattr(crew, "cache", False):
+        from crewai.agents.cache import CacheHandler
+
+        handler = CacheHandler()
+        crew._cache_handler = handler
+        for agent in crew.agents:
+            agent.set_cache_handler(handler)
+
+    if hasattr(crew, "usage_metrics"):
+        crew.usage_metrics = None
+
+
+class CrewPool:
+    """
+    Pool of pre-built crews keyed by endpoint.
+
+    Args:
+        builder: Callable building a crew for an endpoint (defaults to the crew registry)
+        size: Idle crews kept per endpoint
+    """
+
+    def __init__(self, builder: Optional[Callable[[str], Any]] = None, size: Optional[int] = None):
+        self.builder = builder or crew_registry.build_crew
+        self.size = size if size is not None else int(os.getenv("APEX_CREW_POOL_SIZE", 2))
+        self._idle: Dict[str, "queue.LifoQueue"] = {}
+        self._lock = threading.Lock()
+        self.built = 0
+        self.reused = 0
+
+    def _queue(self, endpoint: str) -> "queue.LifoQueue":
+        with self._lock:
+            if endpoint not in self._idle:
+                self._idle[endpoint] = queue.LifoQueue(maxsize=max(self.size, 1))
+            return self._idle[endpoint]
+
+    def _build(self, endpoint: str):
+        crew = self.builder(endpoint)
+        with self._lock:
+            self.built += 1
+        return crew
+
+    def warm(self, endpoints: Optional[Iterable[str]] = None) -> None:
+        """Pre-build ``size`` crews for each endpoint. Endpoints that fail to build are skipped."""
+        for endpoint in endpoints or crew_registry.CREW_SPECS:
+            idle = self._queue(endpoint)
+            for _ in range(self.size - idle.qsize()):
+                try:
+                    idle.put_nowait(self._build(endpoint))
+                except queue.Full:
+                    break
+                except Exception as e:
+                    logger.warning(f"Could not pre-build crew for {endpoint}: {e}")
+                    break
+
+    @contextmanager
+    def checkout(self, endpoint: str):
+        """Borrow a crew for one run; a new one is built if none is idle."""
+        idle = self._queue(endpoint)
+        try:
+            crew = idle.get_nowait()
+            with self._lock:
+                self.reused += 1
+        except queue.Empty:
+            crew = self._build(endpoint)
+
+        try:
+            yield crew
+        finally:
+            if self.size:
+                try:
+                    reset_crew(crew)
+                    idle.put_nowait(crew)
+                except queue.Full:
+                    pass
+                except Exception as e:
+                    logger.warning(f"Discarding crew for {endpoint} after failed reset: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "size": self.size,
+                "built": self.built,
+                "reused": self.reused,
+                "idle": {endpoint: idle.qsize() for endpoint, idle in self._idle.items()},
+            }
@@ -0,0 +1,306 @@
+"""
+Crew Registry - purpose-specific crews per API endpoint
+
+Every endpoint used to run the Alpha Brief crew, paying for three financial
+research tasks regardless of the request. The registry maps each endpoint to
+the tasks.yaml entries it actually needs and builds a small crew containing
+only those tasks, the agents they reference and the tools those agents list in
+agents.yaml.
+
+CrewAI, LiteLLM and the tool clients take seconds to import, so nothing here
+imports them at module load: they are imported when the first crew is built,
+or up front by preload_modules() (see gunicorn.conf.py).
+"""
+import importlib
+import logging
+import os
+import re
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, Optional
+
+import yaml
+
+logger = logging.getLogger(__name__)
+
+CONFIG_DIR = os.path.join(os.path.dirname(__file__), "config")
+
+# Tool names used in agents.yaml -> (module, class). Imported lazily so a crew
+# only pays for the clients its agents use.
+TOOL_FACTORIES: Dict[str, tuple] = {
+    "MemoryTool": (".tools.memory_tool", "MemoryTool"),
+    "MapsTool": (".tools.maps_tool", "MapsTool"),
+    "RideShareTool": (".tools.ride_share_tool", "RideShareTool"),
+    "SkyscannerTool": (".tools.skyscanner_tool", "SkyscannerTool"),
+    "BookingTool": (".tools.booking_tool", "BookingTool"),
+    "ViatorTool": (".tools.viator_tool", "ViatorTool"),
+    "EmailTool": (".tools.email_tool", "EmailTool"),
+    "CalendarTool": (".tools.calendar_tool", "CalendarTool"),
+    "NotionTool": (".tools.notion_tool", "NotionTool"),
+    "LinkedInTool": (".tools.linkedin_tool", "LinkedInTool"),
+    "ProjectManagementTool": (".tools.project_management_tool", "ProjectManagementTool"),
+    "SimulationTool": (".tools.simulation_tool", "SimulationTool"),
+    "SerplyWebSearchTool": ("crewai_tools", "SerplyWebSearchTool"),
+    "SerperDevTool": ("crewai_tools", "SerperDevTool"),
+    "ScrapeWebsiteTool": ("crewai_tools", "ScrapeWebsiteTool"),
+}
+
+_PLACEHOLDER = re.compile(r"\{([A-Za-z_][A-Za-z0-9_]*)\}")
+
+
+class CrewSpec:
+    """
+    Definition of the crew that serves one endpoint.
+
+    Args:
+        tasks: tasks.yaml keys to run, in order
+        delegates: Extra agents the lead agent may delegate to (as named in the task descriptions)
+        prepare_inputs: Optional hook mapping request inputs onto the task template variables
+        factory: Optional callable returning a ready-made Crew, for crews defined in code
+            (``tasks`` then only documents which tasks.yaml entries it runs)
+    """
+
+    def __init__(
+        self,
+        tasks: Optional[List[str]] = None,
+        delegates: Optional[List[str]] = None,
+        prepare_inputs: Optional[Callable[[Dict[str, Any]], Dict[str, Any]]] = None,
+        factory: Optional[Callable[[], Any]] = None,
+    ):
+        self.tasks = tasks or []
+        self.delegates = delegates or []
+        self.prepare_inputs = prepare_inputs
+        self.factory = factory
+
+
+def _alpha_brief_crew():
+    from .crew import ApexAiHierarchicalLifeCompanion
+    return ApexAiHierarchicalLifeCompanion().crew()
+
+
+def _travel_inputs(inputs: Dict[str, Any]) -> Dict[str, Any]:
+    dates = inputs.get("dates") or {}
+    return {
+        "travel_request": f"A trip to {inputs.get('destination', 'an undecided destination')}",
+        "start_date": dates.get("start") or dates.get("startDate", "flexible"),
+        "end_date": dates.get("end") or dates.get("endDate", "flexible"),
+        "interests": inputs.get("preferences", []),
+    }
+
+
+def _mentorship_inputs(inputs: Dict[str, Any]) -> Dict[str, Any]:
+    return {"stalled_quest": inputs.get("quest_id", "not provided")}
+
+
+def _logistics_inputs(inputs: Dict[str, Any]) -> Dict[str, Any]:
+    return {"event_details": f"calendar event {inputs.get('event_id', 'unknown')}"}
+
+
+def _voice_inputs(inputs: Dict[str, Any]) -> Dict[str, Any]:
+    return {"parameters": inputs.get("entities", {})}
+
+
+CREW_SPECS: Dict[str, CrewSpec] = {
+    "generate-brief": CrewSpec(
+        tasks=["gather_market_data", "analyze_news_sentiment", "generate_alpha_brief"],
+        factory=_alpha_brief_crew,
+    ),
+    "daily-path": CrewSpec(
+        tasks=["generate_daily_optimal_path"],
+        delegates=[
+            "jarvis_financial_intelligence_specialist",
+            "health_wellness_coach",
+            "immersive_experience_architect",
+        ],
+    ),
+    "mentorship": CrewSpec(
+        tasks=["facilitate_mentorship_connection"],
+        delegates=["emotional_intelligence_engine"],
+        prepare_inputs=_mentorship_inputs,
+    ),
+    "travel/plan": CrewSpec(
+        tasks=["plan_personalized_getaway"],
+        delegates=[
+            "jarvis_daily_intelligence_coordinator",
+            "jarvis_financial_intelligence_specialist",
+            "immersive_experience_architect",
+        ],
+        prepare_inputs=_travel_inputs,
+    ),
+    "career/review": CrewSpec(
+        tasks=["conduct_quarterly_career_review"],
+        delegates=["jarvis_career_strategist"],
+    ),
+    "weekly-sync": CrewSpec(
+        tasks=["conduct_weekly_sync_session"],
+        delegates=[
+            "apex_predictive_intelligence_core",
+            "jarvis_financial_intelligence_specialist",
+            "health_wellness_coach",
+            "jarvis_career_strategist",
+            "hyper_responsive_action_executor",
+        ],
+    ),
+    "voice-command": CrewSpec(
+        tasks=["execute_voice_command"],
+        delegates=["hyper_responsive_action_executor"],
+        prepare_inputs=_voice_inputs,
+    ),
+    "logistics/check": CrewSpec(
+        tasks=["proactive_travel_management"],
+        delegates=[
+            "real_time_intelligence_nerve_center",
+            "jarvis_financial_intelligence_specialist",
+            "emotional_intelligence_engine",
+            "hyper_responsive_action_executor",
+        ],
+        prepare_inputs=_logistics_inputs,
+    ),
+    "memory/process": CrewSpec(tasks=["process_interaction_memory"]),
+}
+
+
+@lru_cache(maxsize=None)
+def load_config(name: str) -> Dict[str, Any]:
+    """Load and cache config/agents.yaml or config/tasks.yaml."""
+    with open(os.path.join(CONFIG_DIR, f"{name}.yaml"), "r") as f:
+        return yaml.safe_load(f)
+
+
+def get_spec(endpoint: str) -> CrewSpec:
+    if endpoint not in CREW_SPECS:
+        raise KeyError(f"No crew registered for endpoint '{endpoint}'")
+    return CREW_SPECS[endpoint]
+
+
+def template_variables(task_names: List[str]) -> List[str]:
+    """Return the {placeholders} used by the given tasks, in first-seen order."""
+    tasks_config = load_config("tasks")
+    seen: Dict[str, None] = {}
+    for name in task_names:
+        config = tasks_config[name]
+        for field in ("description", "expected_output"):
+            for var in _PLACEHOLDER.findall(config.get(field) or ""):
+                seen.setdefault(var, None)
+    return list(seen)
+
+
+def prepare_inputs(endpoint: str, inputs: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Map request inputs onto the template variables of the endpoint's tasks.
+
+    Variables the request does not provide are filled with a neutral value so
+    task interpolation never fails on a missing key.
+    """
+    spec = get_spec(endpoint)
+    prepared = dict(inputs)
+    if spec.prepare_inputs:
+        for key, value in spec.prepare_inputs(inputs).items():
+            prepared.setdefault(key, value)
+    if "user_id" in prepared:
+        prepared.setdefault("user_name", prepared["user_id"])
+    for var in template_variables(spec.tasks):
+        prepared.setdefault(var, "not provided")
+    return prepared
+
+
+def _build_tool(name: str, cache: Dict[str, Any]):
+    if name in cache:
+        return cache[name]
+    if name not in TOOL_FACTORIES:
+        logger.warning(f"Tool '{name}' listed in agents.yaml has no implementation; skipping")
+        cache[name] = None
+        return None
+    from .execution import with_deadline
+
+    module_name, class_name = TOOL_FACTORIES[name]
+    module = importlib.import_module(module_name, package=__package__)
+    # Apex tools size their own timeouts from the deadline; third-party ones get one enforced.
+    cache[name] = with_deadline(getattr(module, class_name)(), third_party=not module_name.startswith("."))
+    return cache[name]
+
+
+def _build_agent(name: str, llm, tool_cache: Dict[str, Any], allow_delegation: bool = False):
+    from crewai import Agent
+
+    from .llm import split_tier
+
+    config, _ = split_tier(load_config("agents")[name])
+    tool_names = config.pop("tools", None) or []
+    tools = [tool for tool in (_build_tool(t, tool_cache) for t in tool_names) if tool is not None]
+    return Agent(
+        config=config,
+        tools=tools,
+        llm=llm,
+        verbose=True,
+        allow_delegation=allow_delegation,
+    )
+
+
+def build_crew(endpoint: str):
+    """Build the crew registered for an endpoint with only the agents and tools it needs."""
+    from crewai import Crew, Process
+
+    from .execution import InstrumentedTask, plan_parallel_execution
+    from .llm import TIER_KEY, TieredLLMs, resolve_tier
+
+    spec = get_spec(endpoint)
+    if spec.factory:
+        return spec.factory()
+
+    tasks_config = load_config("tasks")
+    llms = TieredLLMs()
+    tool_cache: Dict[str, Any] = {}
+    # Keyed by (agent, tier): a task on another tier than its agent gets its own copy of the agent
+    agents: Dict[tuple, Any] = {}
+
+    def agent_for(name: str, lead: bool = False, task_tier: Optional[str] = None):
+        tier = resolve_tier(task_tier, load_config("agents")[name].get(TIER_KEY))
+        if (name, tier) not in agents:
+            agents[(name, tier)] = _build_agent(
+                name, llms.get(tier), tool_cache, allow_delegation=lead and bool(spec.delegates)
+            )
+        return agents[(name, tier)]
+
+    tasks: Dict[str, Any] = {}
+    for task_name in spec.tasks:
+        config = dict(tasks_config[task_name])
+        task_tier = config.pop(TIER_KEY, None)
+        agent = agent_for(config.pop("agent"), lead=True, task_tier=task_tier)
+        context = [tasks[name] for name in config.pop("context", None) or []]
+        tasks[task_name] = InstrumentedTask(
+            name=task_name, config=config, agent=agent, context=context or None
+        )
+
+    for name in spec.delegates:
+        if not any(built == name for built, _ in agents):
+            agent_for(name)
+
+    return Crew(
+        agents=list(agents.values()),
+        tasks=plan_parallel_execution(list(tasks.values())),
+        process=Process.sequential,
+        verbose=True,
+    )
+
+
+def preload_modules() -> None:
+    """
+    Import CrewAI and every tool module now instead of on first use.
+
+    Called in the gunicorn master before it forks workers, so each worker starts
+    with these modules already loaded and shares their memory copy-on-write.
+    """
+    import crewai
+
+    from . import crew, execution, llm
+
+    for module_name, _ in TOOL_FACTORIES.values():
+        try:
+            importlib.import_module(module_name, package=__package__)
+        except ImportError as e:
+            logger.warning(f"Could not preload {module_name}: {e}")
+
+
+def kickoff(endpoint: str, inputs: Dict[str, Any]):
+    """Build the endpoint's crew and run it with the request inputs."""
+    return build_crew(endpoint).kickoff(inputs=prepare_inputs(endpoint, inputs))
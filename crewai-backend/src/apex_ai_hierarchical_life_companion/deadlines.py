@@ -0,0 +1,135 @@
+"""
+Time budgets for crew runs.
+
+A request may carry a deadline. The crew run executes inside a deadline scope,
+and everything below it reads the deadline from there:
+- tools size their HTTP timeouts with tool_timeout() so no single call can
+  outlive the budget;
+- LLM calls get the remaining budget as their timeout;
+- optional steps (extra scraping) are skipped once the budget runs low;
+- tasks that would start (or are still running) after the deadline are
+  skipped, and the run returns the work finished so far, marked degraded.
+
+Deadlines are absolute Unix timestamps so they stay meaningful when a job is
+handed to another worker process. The scope is a context variable; code that
+moves work to another thread must carry the deadline over (see
+InstrumentedTask and DeadlineTool).
+"""
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, List, Optional
+
+# Seconds kept back from the deadline to assemble and send the response
+DEADLINE_RESERVE = float(os.getenv("APEX_DEADLINE_RESERVE", 2))
+
+# Optional steps are skipped when less than this many seconds remain
+OPTIONAL_STEP_MIN = float(os.getenv("APEX_OPTIONAL_STEP_MIN", 30))
+
+# No network call is given less than this, so a nearly spent budget fails fast instead of hanging
+MIN_TIMEOUT = 1.0
+
+# Raw output recorded for a task that was skipped for lack of time
+SKIPPED_OUTPUT = "[Skipped: the request's time budget ran out before this step could finish]"
+
+_current: ContextVar[Optional["Deadline"]] = ContextVar("apex_deadline", default=None)
+
+
+class DeadlineExceeded(Exception):
+    """Raised when work is attempted after the deadline has passed."""
+
+
+class Deadline:
+    """
+    Time budget of one crew run.
+
+    Args:
+        at: Unix timestamp by which the run must have returned
+        reserve: Seconds before ``at`` at which work is considered out of time
+    """
+
+    def __init__(self, at: float, reserve: float = DEADLINE_RESERVE):
+        self.at = at
+        self.reserve = reserve
+        self.skipped: List[str] = []
+        self._lock = threading.Lock()
+
+    @classmethod
+    def after(cls, seconds: float, reserve: float = DEADLINE_RESERVE) -> "Deadline":
+        return cls(time.time() + seconds, reserve)
+
+    def remaining(self) -> float:
+        """Seconds of work left before the deadline (less the reserve)."""
+        return self.at - self.reserve - time.time()
+
+    @property
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+    @property
+    def degraded(self) -> bool:
+        return bool(self.skipped)
+
+    def check(self, what: str = "work"):
+        if self.expired:
+            raise DeadlineExceeded(f"Deadline passed before {what}")
+
+    def timeout(self, default: float) -> float:
+        """Timeout for a call that would normally get ``default`` seconds."""
+        self.check("the call started")
+        return max(MIN_TIMEOUT, min(default, self.remaining()))
+
+    def skip(self, step: str):
+        """Record a step that was skipped or cut short; the run is then degraded."""
+        with self._lock:
+            self.skipped.append(step)
+
+
+def current_deadline() -> Optional[Deadline]:
+    return _current.get()
+
+
+@contextmanager
+def deadline_scope(deadline: Optional[Deadline]) -> Iterator[Optional[Deadline]]:
+    """Make ``deadline`` the current deadline for this thread's context. None is a no-op."""
+    if deadline is None:
+        yield None
+        return
+    token = _current.set(deadline)
+    try:
+        yield deadline
+    finally:
+        _current.reset(token)
+
+
+def tool_timeout(default: float) -> float:
+    """HTTP timeout for a tool call: ``default``, shortened to fit the current deadline."""
+    deadline = _current.get()
+    return default if deadline is None else deadline.timeout(default)
+
+
+def is_degraded(result: Any) -> bool:
+    """Whether a crew result is a partial one returned because time ran out."""
+    return isinstance(result, dict) and bool(result.get("degraded"))
+
+
+def degraded_result(result: Any, deadline: Optional[Deadline]) -> Any:
+    """
+    Return ``result`` unchanged for a complete run. For a degraded run, return the
+    finished work with the skipped steps listed.
+    """
+    if deadline is None or not deadline.degraded:
+        return result
+    tasks: List[Dict[str, Any]] = [
+        {"name": output.name, "agent": output.agent, "raw": output.raw}
+        for output in getattr(result, "tasks_output", None) or []
+    ]
+    finished = [task for task in tasks if task["raw"] != SKIPPED_OUTPUT]
+    return {
+        "raw": finished[-1]["raw"] if finished else "",
+        "degraded": True,
+        "skipped": list(deadline.skipped),
+        "tasks_output": tasks,
+    }
@@ -0,0 +1,348 @@
+"""
+DAG-aware task execution for crews.
+
+CrewAI's sequential process runs tasks one after another even when they do not
+depend on each other. It does, however, run consecutive ``async_execution``
+tasks concurrently and waits for all of them before the next synchronous task.
+This module turns the ``context`` links between tasks into that shape: tasks
+are grouped into dependency levels, every level with more than one task runs
+asynchronously, and the task that consumes them starts once they all finish.
+After a level of async tasks, the first task of the next level runs
+synchronously as that barrier, and the rest of its level start once it is done.
+So with two levels of several tasks each, the first level runs fully in
+parallel and the second overlaps only after its first task.
+
+A task with an explicit ``context`` (even an empty list) depends only on those
+tasks. A task without one implicitly depends on everything before it, as it
+does in a plain sequential crew.
+
+``InstrumentedTask`` is the Task class used by all Apex crews. It reports task
+start, completion and failure to listeners attached for a single run, whether
+the task executes synchronously or on CrewAI's async worker thread. It also
+carries the run's context (deadline, trace span and the agent at work, see
+llm.current_agent) onto that thread and skips
+the task, rather than failing the run, once the deadline has passed.
+
+Before a task runs, the outputs of its upstream tasks are compacted to the
+task's token budget (``context_tokens``, see compaction), and tool results are
+compacted before they return to the agent.
+
+Task prompts are rendered with the request's values after the static
+instructions (see prompts), so providers can cache the instructions as a prefix.
+
+``TaskCheckpoint`` records finished task outputs during a run, so a job handed
+to another worker on shutdown resumes without repeating them.
+
+``DeadlineTool`` wraps the tools given to agents so every call honours the
+current deadline.
+
+Both record task and tool latency metrics and trace spans.
+"""
+import contextvars
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import Any, Dict, List, Optional
+
+from crewai import Task
+from crewai.tools import BaseTool
+from pydantic import Field, PrivateAttr
+
+from . import compaction, prompts, tracing
+from .llm import current_agent
+from .deadlines import (
+    OPTIONAL_STEP_MIN,
+    SKIPPED_OUTPUT,
+    Deadline,
+    DeadlineExceeded,
+    current_deadline,
+)
+from .metrics import TASK_SECONDS, TOOL_ERRORS, TOOL_SECONDS, TOOL_SKIPPED
+
+
+def parallel_execution_enabled() -> bool:
+    return os.getenv("APEX_PARALLEL_TASKS", "1").lower() not in ("0", "false", "no")
+
+
+def dependency_levels(tasks: List) -> List[int]:
+    """Return the dependency level of each task (0 = no upstream tasks)."""
+    levels: Dict[int, int] = {}
+    result = []
+    for index, task in enumerate(tasks):
+        context = task.context if isinstance(task.context, list) else None
+        upstream = context if context is not None else tasks[:index]
+        level = 1 + max((levels[id(dep)] for dep in upstream if id(dep) in levels), default=-1)
+        levels[id(task)] = level
+        result.append(level)
+    return result
+
+
+def plan_parallel_execution(tasks: List, enabled: Optional[bool] = None) -> List:
+    """
+    Order tasks by dependency level and mark independent ones for concurrent execution.
+
+    Args:
+        tasks: The crew's tasks in their declared order
+        enabled: Override for the APEX_PARALLEL_TASKS switch
+
+    Returns:
+        The tasks in execution order, with async_execution set on tasks that share a level,
+        except the first task after a level of async tasks, which is the barrier for it
+    """
+    if enabled is None:
+        enabled = parallel_execution_enabled()
+    if not enabled or len(tasks) < 2:
+        return list(tasks)
+
+    levels = dependency_levels(tasks)
+    ordered = [task for _, _, task in sorted(zip(levels, range(len(tasks)), tasks), key=lambda x: x[:2])]
+    ordered_levels = sorted(levels)
+
+    pending = False
+    for position, task in enumerate(ordered):
+        level = ordered_levels[position]
+        starts_level = position == 0 or ordered_levels[position - 1] != level
+        # CrewAI only waits for async tasks when it reaches a synchronous one, so the
+        # first task after a level of async tasks runs synchronously.
+        barrier = starts_level and pending
+        task.async_execution = ordered_levels.count(level) > 1 and not barrier
+        if not task.async_execution:
+            pending = False
+        pending = pending or task.async_execution
+    # A crew may end on at most one async task.
+    if len(ordered) > 1 and ordered[-1].async_execution and ordered[-2].async_execution:
+        ordered[-1].async_execution = False
+    return ordered
+
+
+class InstrumentedTask(Task):
+    """
+    Task that notifies run listeners when it starts, completes or fails.
+
+    A listener is any object with ``task_started(task)``,
+    ``task_completed(task, output)`` and ``task_failed(task, error)`` methods.
+    """
+
+    context_tokens: Optional[int] = Field(
+        default=None, description="Token budget for the upstream outputs given to this task as context"
+    )
+    _listeners: List[Any] = PrivateAttr(default_factory=list)
+    _context: Optional[contextvars.Context] = PrivateAttr(default=None)
+    _checkpoint: Optional["TaskCheckpoint"] = PrivateAttr(default=None)
+
+    def add_listener(self, listener: Any):
+        self._listeners.append(listener)
+
+    def remove_listener(self, listener: Any):
+        if listener in self._listeners:
+            self._listeners.remove(listener)
+
+    def clear_listeners(self):
+        self._listeners.clear()
+        self._context = None
+        self._checkpoint = None
+
+    def interpolate_inputs(self, inputs: Dict[str, Any]) -> None:
+        super().interpolate_inputs(inputs)
+        if inputs and prompts.ENABLED and self._original_description is not None:
+            self.description, self.expected_output = prompts.render_task(
+                self._original_description, self._original_expected_output, inputs
+            )
+
+    def execute_async(self, *args, **kwargs):
+        # CrewAI runs async tasks on a new thread, which does not inherit context variables.
+        self._context = contextvars.copy_context()
+        return super().execute_async(*args, **kwargs)
+
+    def _execute_core(self, agent, context, tools):
+        captured, self._context = self._context, None
+        if captured is not None:
+            return captured.run(self._execute_observed, agent, context, tools)
+        return self._execute_observed(agent, context, tools)
+
+    def _execute_observed(self, agent, context, tools):
+        deadline = current_deadline()
+        role = current_agent.set(getattr(agent, "role", None))
+        try:
+            with tracing.span(f"task {self.name}", agent=getattr(agent, "role", "")) as span:
+                output, status = self._execute_listened(agent, context, tools, deadline)
+                if span is not None:
+                    span.set("status", status)
+        finally:
+            current_agent.reset(role)
+        return output
+
+    def _execute_listened(self, agent, context, tools, deadline: Optional[Deadline]):
+        listeners = list(self._listeners)
+        for listener in listeners:
+            listener.task_started(self)
+        started = time.perf_counter()
+        status = "ok"
+        restored = self._checkpoint.restore(self.name) if self._checkpoint is not None else None
+        try:
+            if restored is not None:
+                status = "restored"
+                output = self._stand_in_output(agent, restored)
+            else:
+                if deadline is not None:
+                    deadline.check(f"task '{self.name}' started")
+                name = self.name or "unnamed"
+                context = compaction.compact_context(name, context, self.context_tokens)
+                with compaction.task_scope(name):
+                    output = super()._execute_core(agent, context, tools)
+        except Exception as e:
+            if deadline is None or not (deadline.expired or isinstance(e, DeadlineExceeded)):
+                TASK_SECONDS.observe(time.perf_counter() - started, self.name or "unnamed", "failed")
+                for listener in listeners:
+                    listener.task_failed(self, e)
+                raise
+            deadline.skip(f"task:{self.name}")
+            status = "skipped"
+            output = self._stand_in_output(agent, SKIPPED_OUTPUT)
+        TASK_SECONDS.observe(time.perf_counter() - started, self.name or "unnamed", status)
+        for listener in listeners:
+            listener.task_completed(self, output)
+        return output, status
+
+    def _stand_in_output(self, agent, raw: str):
+        """
+        Output for a task that did not run: cut off by the deadline, or finished
+        by an earlier run of the same job. Downstream tasks and the crew use it as usual.
+        """
+        from crewai.tasks.task_output import TaskOutput
+
+        self.output = TaskOutput(
+            name=self.name,
+            description=self.description,
+            expected_output=self.expected_output,
+            raw=raw,
+            agent=getattr(agent, "role", ""),
+        )
+        return self.output
+
+
+class TaskCheckpoint:
+    """
+    Run listener that records the raw output of each finished task, by task name,
+    into ``completed``. A run given the outputs of an earlier, interrupted run of
+    the same job reuses them instead of running those tasks again.
+    """
+
+    def __init__(self, completed: Dict[str, str]):
+        self.completed = completed
+
+    def restore(self, task_name: str) -> Optional[str]:
+        return self.completed.get(task_name)
+
+    def task_started(self, task):
+        pass
+
+    def task_completed(self, task, output):
+        if task.name and output.raw != SKIPPED_OUTPUT:
+            self.completed[task.name] = output.raw
+
+    def task_failed(self, task, error: Exception):
+        pass
+
+    def attach(self, crew):
+        for task in crew.tasks:
+            if isinstance(task, InstrumentedTask):
+                task.add_listener(self)
+                task._checkpoint = self
+
+    def detach(self, crew):
+        for task in crew.tasks:
+            if isinstance(task, InstrumentedTask):
+                task.remove_listener(self)
+                task._checkpoint = None
+
+
+# Tools whose results only add detail; skipped once the budget runs low
+OPTIONAL_TOOLS = {"ScrapeWebsiteTool"}
+
+# Third-party tools that take no timeout themselves; they run on this pool so a call can be abandoned
+_bounded_calls = ThreadPoolExecutor(
+    max_workers=int(os.getenv("APEX_TOOL_THREADS", 16)),
+    thread_name_prefix="tool-call",
+)
+
+
+class DeadlineTool(BaseTool):
+    """
+    Wrapper that runs a tool within the current deadline and records its latency and errors.
+
+    Calls after the deadline, and optional calls with little time left, are
+    skipped with a note the agent can act on. Tools that cannot be given a
+    timeout (``enforce_timeout``) are run on a helper thread and abandoned when
+    their share of the budget is used up. Apex's own tools size their HTTP
+    timeouts with ``tool_timeout()`` and run in place.
+    """
+
+    inner: Any = None
+    optional: bool = False
+    enforce_timeout: bool = False
+    default_timeout: float = 30.0
+
+    @classmethod
+    def wrap(cls, tool: Any, optional: bool = False, enforce_timeout: bool = False) -> "DeadlineTool":
+        fields = {
+            "name": tool.name,
+            "description": tool.description,
+            "inner": tool,
+            "optional": optional,
+            "enforce_timeout": enforce_timeout,
+        }
+        if getattr(tool, "args_schema", None) is not None:
+            fields["args_schema"] = tool.args_schema
+        return cls(**fields)
+
+    def _run(self, *args: Any, **kwargs: Any) -> Any:
+        tool = type(self.inner).__name__
+        with tracing.span(f"tool {tool}", tool=self.name):
+            return self._run_within_deadline(tool, *args, **kwargs)
+
+    def _run_within_deadline(self, tool: str, *args: Any, **kwargs: Any) -> Any:
+        deadline = current_deadline()
+        if deadline is not None and (
+            deadline.expired or (self.optional and deadline.remaining() < OPTIONAL_STEP_MIN)
+        ):
+            deadline.skip(f"tool:{self.name}")
+            TOOL_SKIPPED.inc(tool)
+            return f"Skipped '{self.name}': not enough time left. Continue with the information you already have."
+
+        started = time.perf_counter()
+        try:
+            result = self._call(deadline, *args, **kwargs)
+        except FutureTimeoutError:
+            deadline.skip(f"tool:{self.name}")
+            TOOL_SKIPPED.inc(tool)
+            return f"'{self.name}' timed out. Continue with the information you already have."
+        except Exception:
+            TOOL_ERRORS.inc(tool)
+            raise
+        finally:
+            TOOL_SECONDS.observe(time.perf_counter() - started, tool)
+        # Apex tools report failures as "Error ..." strings rather than raising.
+        if isinstance(result, str) and result.startswith("Error"):
+            TOOL_ERRORS.inc(tool)
+        return compaction.compact_tool_output(tool, result)
+
+    def _call(self, deadline: Optional[Deadline], *args: Any, **kwargs: Any) -> Any:
+        if deadline is None or not self.enforce_timeout:
+            return self.inner._run(*args, **kwargs)
+        call = _bounded_calls.submit(contextvars.copy_context().run, self.inner._run, *args, **kwargs)
+        return call.result(timeout=deadline.timeout(self.default_timeout))
+
+
+def with_deadline(tool: Any, third_party: bool = False) -> DeadlineTool:
+    """Wrap ``tool`` for deadline-aware use; ``third_party`` tools get an enforced timeout."""
+    return DeadlineTool.wrap(
+        tool,
+        optional=type(tool).__name__ in OPTIONAL_TOOLS,
+        enforce_timeout=third_party,
+    )
+
+
+def unwrap_tool(tool: Any) -> Any:
+    """The tool a DeadlineTool wraps, or ``tool`` itself."""
+    return tool.inner if isinstance(tool, DeadlineTool) else tool
@@ -0,0 +1,220 @@
+"""
+LLM construction for Apex crews.
+
+CrewAI converts any LangChain chat model it is given into its own LiteLLM-backed
+``LLM`` object, so crews are built with that class directly. ``ApexLLM`` adds an
+optional token listener: while one is attached, completions are requested in
+streaming mode and every token is forwarded as it arrives, which lets the API
+stream LLM output to clients. Agents of a tier share one LLM, so the agent a
+token belongs to is read from ``current_agent``, which InstrumentedTask sets
+while an agent works on a task. A streamed completion's usage is reported to
+CrewAI's token callbacks like a regular one. Without a listener it behaves
+exactly like the stock class.
+
+Within a deadline scope every call's timeout is cut to the time left, and calls
+after the deadline fail immediately. Each call is traced as one agent step.
+
+Completions are served from and stored in the shared on-disk LLM cache (see
+llm_cache) unless the LLM was built with ``cache=False``. A cache hit is
+forwarded to a token listener as a single token. Calls that reach the API go
+through the LLM gateway (see llm_gateway), which queues them within the shared
+rate limits and retries transient failures.
+
+Agents and tasks pick a model tier (fast, standard or premium) with
+``model_tier`` in agents.yaml/tasks.yaml. In crews built by crew_registry a
+task's tier overrides its agent's; the Alpha Brief crew uses agent tiers.
+Each crew builds one LLM per tier in use (TieredLLMs) and shares it among its
+agents. ``APEX_MODEL_<TIER>`` changes a tier's model, and ``APEX_MODEL_TIER``
+puts every agent on one tier, e.g. to compare tiers.
+"""
+import contextvars
+import os
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from crewai import LLM
+
+from . import llm_cache, llm_gateway, tracing
+from .compaction import count_tokens
+from .deadlines import current_deadline
+
+DEFAULT_MODEL = "gpt-4o"
+DEFAULT_TEMPERATURE = 0.7
+
+# Default model per tier
+TIER_MODELS = {
+    "fast": "gpt-4o-mini",
+    "standard": DEFAULT_MODEL,
+    "premium": "gpt-4.1",
+}
+DEFAULT_TIER = "standard"
+
+# agents.yaml / tasks.yaml key naming the tier
+TIER_KEY = "model_tier"
+
+# Per-call timeout used under a deadline when the LLM has none of its own
+DEFAULT_LLM_TIMEOUT = 120.0
+
+# Role of the agent whose task is running in this context
+current_agent: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("apex_current_agent", default=None)
+
+# LLM attributes forwarded to litellm.completion when they are set
+_COMPLETION_PARAMS = (
+    "timeout",
+    "temperature",
+    "top_p",
+    "n",
+    "stop",
+    "presence_penalty",
+    "frequency_penalty",
+    "logit_bias",
+    "response_format",
+    "seed",
+    "logprobs",
+    "top_logprobs",
+    "api_version",
+    "api_key",
+)
+
+
+class ApexLLM(LLM):
+    """CrewAI LLM that can stream completion tokens to a listener."""
+
+    def __init__(self, *args, cache: bool = True, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.cache = cache
+        self.token_listener: Optional[Callable[[str], None]] = None
+        self.request_timeout = self.timeout
+
+    def completion_params(self, messages: List[Dict[str, str]]) -> Dict[str, Any]:
+        """The keyword arguments CrewAI would pass to litellm.completion for ``messages``."""
+        params: Dict[str, Any] = {"model": self.model, "messages": messages}
+        for attr in _COMPLETION_PARAMS:
+            value = getattr(self, attr, None)
+            if value is not None:
+                params[attr] = value
+        max_tokens = getattr(self, "max_tokens", None) or getattr(self, "max_completion_tokens", None)
+        if max_tokens is not None:
+            params["max_tokens"] = max_tokens
+        if getattr(self, "base_url", None):
+            params["api_base"] = self.base_url
+        params.update(getattr(self, "additional_params", None) or {})
+        return params
+
+    def call(self, messages: List[Dict[str, str]], callbacks: List[Any] = []) -> str:
+        streaming = self.token_listener is not None
+        with tracing.span(f"llm {self.model}", messages=len(messages), streaming=streaming) as span:
+            cache = llm_cache.get_cache() if self.cache else None
+            if cache is None:
+                return self._complete(messages, callbacks)
+            params = self.completion_params(messages)
+            completion = cache.get(params)
+            if completion is not None:
+                if span is not None:
+                    span.set("cached", True)
+                listener = self.token_listener
+                if listener is not None:
+                    listener(completion)
+                return completion
+            completion = self._complete(messages, callbacks)
+            cache.put(params, completion)
+            return completion
+
+    def _complete(self, messages: List[Dict[str, str]], callbacks: List[Any]) -> str:
+        deadline = current_deadline()
+        if deadline is None:
+            self.timeout = self.request_timeout
+        else:
+            self.timeout = deadline.timeout(self.request_timeout or DEFAULT_LLM_TIMEOUT)
+
+        llm_gateway.http_client()
+        listener = self.token_listener
+        if listener is None:
+            call = lambda: super(ApexLLM, self).call(messages, callbacks)
+        else:
+            call = lambda: self._stream(messages, listener, callbacks)
+        max_tokens = getattr(self, "max_tokens", None) or getattr(self, "max_completion_tokens", None)
+        return llm_gateway.get_gateway().run(
+            self.model,
+            call,
+            prompt_tokens=sum(count_tokens(str(message.get("content") or "")) for message in messages),
+            max_tokens=max_tokens,
+            completion_tokens=lambda completion: count_tokens(completion or ""),
+        )
+
+    def _stream(self, messages: List[Dict[str, str]], listener: Callable[[str], None], callbacks: List[Any]) -> str:
+        import litellm
+
+        params = self.completion_params(messages)
+        # The last chunk then carries the usage CrewAI's token counting needs
+        params.setdefault("stream_options", {"include_usage": True})
+        started = time.time()
+        parts = []
+        usage = None
+        try:
+            for chunk in litellm.completion(stream=True, **params):
+                usage = getattr(chunk, "usage", None) or usage
+                if not chunk.choices:
+                    continue
+                token = chunk.choices[0].delta.content or ""
+                if token:
+                    parts.append(token)
+                    listener(token)
+        except Exception as e:
+            if not parts:
+                raise
+            # The listener has the first tokens already, so a retry would send them twice
+            raise RuntimeError(f"LLM stream failed after {len(parts)} tokens: {e}") from e
+        if usage is not None:
+            for callback in callbacks:
+                if hasattr(callback, "log_success_event"):
+                    callback.log_success_event(params, {"usage": usage}, started, time.time())
+        return "".join(parts)
+
+
+def tier_model(tier: str) -> str:
+    """The model serving ``tier``."""
+    if tier not in TIER_MODELS:
+        raise ValueError(f"Unknown model tier '{tier}'; expected one of {', '.join(TIER_MODELS)}")
+    return os.getenv(f"APEX_MODEL_{tier.upper()}", TIER_MODELS[tier])
+
+
+def resolve_tier(*tiers: Optional[str]) -> str:
+    """The tier that applies: ``APEX_MODEL_TIER`` if set, else the first tier given, else the default."""
+    for tier in (os.getenv("APEX_MODEL_TIER"), *tiers):
+        if tier:
+            tier_model(tier)
+            return tier
+    return DEFAULT_TIER
+
+
+def split_tier(config: Dict[str, Any]) -> Tuple[Dict[str, Any], Optional[str]]:
+    """A copy of an agents.yaml/tasks.yaml entry without ``model_tier``, and that tier."""
+    config = dict(config)
+    return config, config.pop(TIER_KEY, None)
+
+
+class TieredLLMs:
+    """
+    The LLMs of one crew, one per tier, built on first use.
+
+    Agents on the same tier share an LLM. Crews do not share them, since a
+    token listener is attached to an LLM for the length of one run.
+    """
+
+    def __init__(self, temperature: float = DEFAULT_TEMPERATURE):
+        self.temperature = temperature
+        self._llms: Dict[str, ApexLLM] = {}
+
+    def get(self, *tiers: Optional[str]) -> ApexLLM:
+        """The LLM for the first tier given (see resolve_tier())."""
+        tier = resolve_tier(*tiers)
+        if tier not in self._llms:
+            self._llms[tier] = build_llm(model=tier_model(tier), temperature=self.temperature)
+        return self._llms[tier]
+
+
+def build_llm(model: str = DEFAULT_MODEL, temperature: float = DEFAULT_TEMPERATURE, cache: bool = True) -> ApexLLM:
+    """Create the LLM used by crew agents. ``cache=False`` keeps its calls out of the LLM cache."""
+    # The gateway retries with backoff and within the rate limits, so LiteLLM does not retry on its own
+    return ApexLLM(model=model, temperature=temperature, cache=cache, max_retries=0)
@@ -0,0 +1,312 @@
+"""
+Disk-backed cache of LLM completions, shared by every process on a host.
+
+Re-runs from ``main.py test``/``replay``, repeated scheduler jobs and repeated
+requests send byte-identical prompts, and each one used to cost a full
+completion. An LLMCache keeps completions in one SQLite file in WAL mode, so
+all gunicorn workers, the scheduler and the CLI read and fill the same cache.
+Entries are keyed on the model, the messages and the sampling parameters
+(credentials and timeouts excluded), and the least recently used are evicted
+once the stored completions exceed ``APEX_LLM_CACHE_MB``.
+
+Modes, set with ``APEX_LLM_CACHE``:
+- ``exact`` (default): only identical requests hit;
+- ``similar``: a request that misses may also be answered by an entry for the
+  same model and parameters whose messages are a near duplicate: their SimHash
+  fingerprints differ in at most ``APEX_LLM_CACHE_DISTANCE`` of 64 bits
+  (0-3, default 3). Prompts that differ only in a number or a name are near
+  duplicates, so enable this only where such answers are interchangeable;
+- ``off``: nothing is cached.
+
+A block of code opts out with ``with llm_cache.bypass():``, which also skips the
+simulation cache; a single LLM opts out with ``build_llm(cache=False)``. Failed calls are never stored, and a cache
+that cannot be read or written is skipped rather than failing the call.
+"""
+import hashlib
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+MODES = ("off", "exact", "similar")
+
+# Completion parameters that do not change the completion
+_UNKEYED = ("api_key", "timeout", "stream", "stream_options", "max_retries")
+
+# Near-duplicate search splits the 64-bit fingerprint into this many bands; two
+# fingerprints within len(_BANDS) - 1 bits share at least one band exactly.
+_BANDS = 4
+MAX_DISTANCE = _BANDS - 1
+
+_WORD = re.compile(r"\w+")
+
+_bypassed: ContextVar[bool] = ContextVar("apex_llm_cache_bypassed", default=False)
+
+LOOKUPS = metrics.registry.counter(
+    "apex_llm_cache_lookups_total", "LLM cache lookups by result (hit, similar, miss)", ("result",)
+)
+
+
+@contextmanager
+def bypass() -> Iterator[None]:
+    """Neither read nor fill the cache for LLM calls made in the block."""
+    token = _bypassed.set(True)
+    try:
+        yield
+    finally:
+        _bypassed.reset(token)
+
+
+def bypassed() -> bool:
+    """Whether the current call is inside a bypass() block."""
+    return _bypassed.get()
+
+
+def _signed(value: int) -> int:
+    """Map an unsigned 64-bit value onto SQLite's signed INTEGER."""
+    return value - (1 << 64) if value >= 1 << 63 else value
+
+
+def simhash(text: str) -> int:
+    """64-bit SimHash of the word trigrams of ``text``; near-identical texts differ in few bits."""
+    words = _WORD.findall(text.lower())
+    shingles = [" ".join(words[i:i + 3]) for i in range(max(len(words) - 2, 1))]
+    weights = [0] * 64
+    for shingle in shingles:
+        value = int.from_bytes(hashlib.blake2b(shingle.encode(), digest_size=8).digest(), "big")
+        for bit in range(64):
+            weights[bit] += 1 if value >> bit & 1 else -1
+    return sum(1 << bit for bit in range(64) if weights[bit] > 0)
+
+
+def _bands(fingerprint: int) -> List[int]:
+    width = 64 // _BANDS
+    return [fingerprint >> (i * width) & ((1 << width) - 1) for i in range(_BANDS)]
+
+
+class LLMCache:
+    """
+    Completions on disk, keyed on the request.
+
+    Args:
+        path: SQLite file holding the cache
+        max_bytes: Stored completion bytes kept before the least recently used are evicted
+        mode: ``exact`` or ``similar`` (see the module docstring)
+        distance: Largest SimHash distance, in bits, served in ``similar`` mode
+    """
+
+    # Size is checked and entries evicted after this many writes
+    EVICT_EVERY = 50
+
+    def __init__(self, path: str, max_bytes: int = 256 * 1024 * 1024, mode: str = "exact", distance: int = 3):
+        if mode not in ("exact", "similar"):
+            raise ValueError(f"LLM cache mode must be 'exact' or 'similar', got {mode!r}")
+        self.path = path
+        self.max_bytes = max_bytes
+        self.mode = mode
+        self.distance = max(0, min(distance, MAX_DISTANCE))
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=10)
+        self._lock = threading.Lock()
+        self._writes = 0
+        self.hits = 0
+        self.similar_hits = 0
+        self.misses = 0
+        self.stored = 0
+        self.evicted = 0
+        band_columns = "".join(f", band{i} INTEGER NOT NULL" for i in range(_BANDS))
+        with self._lock:
+            # WAL lets every process read while one writes
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS llm_cache ("
+                " key TEXT PRIMARY KEY,"
+                " scope TEXT NOT NULL,"
+                " simhash INTEGER NOT NULL"
+                f"{band_columns},"
+                " completion TEXT NOT NULL,"
+                " size INTEGER NOT NULL,"
+                " created_at REAL NOT NULL,"
+                " last_used REAL NOT NULL,"
+                " hits INTEGER NOT NULL DEFAULT 0)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS llm_cache_used ON llm_cache (last_used)")
+            for i in range(_BANDS):
+                self._db.execute(f"CREATE INDEX IF NOT EXISTS llm_cache_band{i} ON llm_cache (scope, band{i})")
+
+    @classmethod
+    def from_env(cls) -> Optional["LLMCache"]:
+        """
+        Build a cache from ``APEX_LLM_CACHE``, ``APEX_LLM_CACHE_DB``, ``APEX_LLM_CACHE_MB``
+        and ``APEX_LLM_CACHE_DISTANCE``; None when caching is off.
+        """
+        mode = os.getenv("APEX_LLM_CACHE", "exact").lower()
+        if mode not in MODES:
+            logger.warning(f"Unknown APEX_LLM_CACHE mode {mode!r}; LLM cache disabled")
+            return None
+        if mode == "off":
+            return None
+        return cls(
+            path=os.getenv("APEX_LLM_CACHE_DB", ".apex/llm-cache.sqlite3"),
+            max_bytes=int(float(os.getenv("APEX_LLM_CACHE_MB", 256)) * 1024 * 1024),
+            mode=mode,
+            distance=int(os.getenv("APEX_LLM_CACHE_DISTANCE", 3)),
+        )
+
+    @staticmethod
+    def keys(params: Dict[str, Any]) -> Tuple[str, str, int]:
+        """
+        ``(key, scope, simhash)`` for completion ``params``: the exact-match key, a
+        key over everything but the messages, and the fingerprint of the messages.
+        """
+        keyed = {name: value for name, value in params.items() if name not in _UNKEYED}
+        messages = keyed.pop("messages", [])
+        # The endpoint is part of the scope, so a fake or local backend never answers for the real one
+        keyed.setdefault("api_base", os.getenv("OPENAI_BASE_URL") or os.getenv("OPENAI_API_BASE"))
+        scope = hashlib.sha256(json.dumps(keyed, sort_keys=True, default=str).encode()).hexdigest()
+        encoded = json.dumps(messages, sort_keys=True, default=str)
+        key = hashlib.sha256(f"{scope}\n{encoded}".encode()).hexdigest()
+        text = "\n".join(str(message.get("content") or "") for message in messages if isinstance(message, dict))
+        return key, scope, simhash(text)
+
+    def get(self, params: Dict[str, Any]) -> Optional[str]:
+        """The cached completion for ``params``, or None."""
+        try:
+            key, scope, fingerprint = self.keys(params)
+            with self._lock:
+                row = self._db.execute("SELECT key, completion FROM llm_cache WHERE key = ?", (key,)).fetchone()
+                result = "hit"
+                if row is None and self.mode == "similar":
+                    row = self._nearest(scope, fingerprint)
+                    result = "similar"
+                if row is not None:
+                    self._db.execute(
+                        "UPDATE llm_cache SET last_used = ?, hits = hits + 1 WHERE key = ?", (time.time(), row[0])
+                    )
+        except Exception as e:
+            logger.warning(f"LLM cache lookup failed: {e}")
+            return None
+        if row is None:
+            self.misses += 1
+            LOOKUPS.inc("miss")
+            return None
+        if result == "hit":
+            self.hits += 1
+        else:
+            self.similar_hits += 1
+        LOOKUPS.inc(result)
+        return row[1]
+
+    def _nearest(self, scope: str, fingerprint: int) -> Optional[Tuple[str, str]]:
+        """The closest entry within ``distance`` bits of ``fingerprint`` in ``scope``."""
+        clauses = " OR ".join(f"band{i} = ?" for i in range(_BANDS))
+        candidates = self._db.execute(
+            f"SELECT key, completion, simhash FROM llm_cache WHERE scope = ? AND ({clauses})",
+            (scope, *_bands(fingerprint)),
+        ).fetchall()
+        best = None
+        for key, completion, stored in candidates:
+            distance = bin((stored & ((1 << 64) - 1)) ^ fingerprint).count("1")
+            if distance <= self.distance and (best is None or distance < best[0]):
+                best = (distance, key, completion)
+        return None if best is None else (best[1], best[2])
+
+    def put(self, params: Dict[str, Any], completion: str):
+        """Store the completion returned for ``params``. Empty completions are not stored."""
+        if not completion:
+            return
+        try:
+            key, scope, fingerprint = self.keys(params)
+            now = time.time()
+            with self._lock:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO llm_cache"
+                    f" (key, scope, simhash, {', '.join(f'band{i}' for i in range(_BANDS))},"
+                    " completion, size, created_at, last_used)"
+                    f" VALUES (?, ?, ?, {', '.join('?' * _BANDS)}, ?, ?, ?, ?)",
+                    (
+                        key, scope, _signed(fingerprint), *_bands(fingerprint),
+                        completion, len(completion.encode()), now, now,
+                    ),
+                )
+                self.stored += 1
+                self._writes += 1
+                if self._writes % self.EVICT_EVERY == 1:
+                    self._evict()
+        except Exception as e:
+            logger.warning(f"LLM cache write failed: {e}")
+
+    def _evict(self):
+        """Drop the least recently used entries until the cache is back under 90% of max_bytes."""
+        total = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM llm_cache").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        cursor = self._db.execute(
+            "DELETE FROM llm_cache WHERE key IN ("
+            " SELECT key FROM ("
+            "  SELECT key, SUM(size) OVER (ORDER BY last_used DESC, key) AS kept FROM llm_cache"
+            " ) WHERE kept > ?)",
+            (int(self.max_bytes * 0.9),),
+        )
+        self.evicted += cursor.rowcount
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            entries, size = self._db.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM llm_cache").fetchone()
+        lookups = self.hits + self.similar_hits + self.misses
+        return {
+            "mode": self.mode,
+            "path": self.path,
+            "entries": entries,
+            "bytes": size,
+            "maxBytes": self.max_bytes,
+            "hits": self.hits,
+            "similarHits": self.similar_hits,
+            "misses": self.misses,
+            "hitRate": round((self.hits + self.similar_hits) / lookups, 4) if lookups else None,
+            "stored": self.stored,
+            "evicted": self.evicted,
+        }
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+_cache: Optional[LLMCache] = None
+_cache_pid: Optional[int] = None
+_cache_lock = threading.Lock()
+
+
+def get_cache() -> Optional[LLMCache]:
+    """
+    This process's cache, opened from the environment on first use; None when
+    caching is off or bypassed for the current call.
+    """
+    global _cache, _cache_pid
+    if bypassed():
+        return None
+    # A connection must not cross a fork, so a forked worker opens its own.
+    if _cache_pid != os.getpid():
+        with _cache_lock:
+            if _cache_pid != os.getpid():
+                try:
+                    _cache = LLMCache.from_env()
+                except Exception as e:
+                    logger.warning(f"LLM cache unavailable: {e}")
+                    _cache = None
+                _cache_pid = os.getpid()
+    return _cache
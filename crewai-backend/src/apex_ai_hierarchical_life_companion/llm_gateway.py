@@ -0,0 +1,394 @@
+"""
+One rate-limit-aware path to the LLM provider for the whole process.
+
+Crew agents (LiteLLM), SimulationTool and MemoryTool each opened their own
+OpenAI connections and knew nothing of the organisation's requests-per-minute
+and tokens-per-minute limits. A burst of crews then ran into a storm of 429s and
+retries. Every OpenAI call now goes through the LLMGateway:
+
+- connections: one keep-alive httpx pool per process, used by LiteLLM and by the
+  shared OpenAI client (openai_client()) the tools use;
+- limits: a request bucket and a token bucket per model, kept in a SQLite file
+  (WAL mode) so all gunicorn workers on a host draw from the same budget. A call
+  is charged its estimated prompt tokens plus ``max_tokens``, or the expected
+  completion size, and the estimate is corrected once the reply arrives;
+- queueing: a call that finds the buckets empty waits for them to refill, up to
+  the request deadline or ``APEX_LLM_QUEUE_TIMEOUT``, instead of being sent to
+  fail;
+- retries: 429s, 5xx and connection errors are retried up to
+  ``APEX_LLM_RETRIES`` times with full-jitter exponential backoff, honouring
+  Retry-After. A 429 also holds every worker's calls to that model for the
+  Retry-After period.
+
+Limits are set per model with ``APEX_LLM_RPM`` and ``APEX_LLM_TPM`` (defaults
+for every model) and ``APEX_LLM_LIMITS``, a JSON object such as
+``{"gpt-4o": [5000, 800000]}``. With several hosts, give each its share of the
+organisation's limits. A limit of 0 disables that bucket.
+"""
+import json
+import logging
+import os
+import random
+import sqlite3
+import threading
+import time
+from typing import Any, Callable, Dict, Optional, Tuple, TypeVar
+
+from . import metrics
+from .deadlines import DeadlineExceeded, current_deadline
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Buckets hold this many seconds' worth of their per-minute limit, so a burst cannot use a whole minute at once
+BURST_SECONDS = 10.0
+
+# Completion tokens charged up front when a call sets no max_tokens
+DEFAULT_COMPLETION_TOKENS = 1000
+
+_RETRY_STATUS = {408, 409, 429, 500, 502, 503, 504}
+_RETRY_ERRORS = ("APIConnectionError", "APITimeoutError", "Timeout", "ServiceUnavailableError", "InternalServerError")
+
+WAIT_SECONDS = metrics.registry.histogram(
+    "apex_llm_gateway_wait_seconds", "Time LLM calls queued for rate limit budget by model", ("model",)
+)
+RETRIES = metrics.registry.counter(
+    "apex_llm_gateway_retries_total", "LLM calls retried by model and reason", ("model", "reason")
+)
+QUEUE_TIMEOUTS = metrics.registry.counter(
+    "apex_llm_gateway_queue_timeouts_total", "LLM calls that gave up waiting for rate limit budget", ("model",)
+)
+
+
+class RateLimitQueueTimeout(DeadlineExceeded):
+    """Raised when a call cannot get rate limit budget before its deadline or the queue timeout."""
+
+
+class TokenBuckets:
+    """
+    Request and token buckets per model in a SQLite file shared by the processes of one host.
+
+    Args:
+        path: SQLite file holding bucket levels
+        limits: ``(requests per minute, tokens per minute)`` per model
+        default: Limits for models not in ``limits``
+    """
+
+    def __init__(self, path: str, limits: Dict[str, Tuple[float, float]], default: Tuple[float, float]):
+        self.path = path
+        self.limits = limits
+        self.default = default
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=10)
+        self._lock = threading.Lock()
+        with self._lock:
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            # ``level`` is the bucket's content, or for a hold the time it ends
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS buckets (name TEXT PRIMARY KEY, level REAL NOT NULL, updated REAL NOT NULL)"
+            )
+
+    @classmethod
+    def from_env(cls) -> "TokenBuckets":
+        """Build buckets from ``APEX_LLM_RPM``, ``APEX_LLM_TPM``, ``APEX_LLM_LIMITS`` and ``APEX_LLM_LIMITS_DB``."""
+        limits = {
+            model: (float(rpm), float(tpm)) for model, (rpm, tpm) in json.loads(os.getenv("APEX_LLM_LIMITS", "{}")).items()
+        }
+        return cls(
+            path=os.getenv("APEX_LLM_LIMITS_DB", ".apex/llm-limits.sqlite3"),
+            limits=limits,
+            default=(float(os.getenv("APEX_LLM_RPM", 500)), float(os.getenv("APEX_LLM_TPM", 200000))),
+        )
+
+    def _limits(self, model: str) -> Tuple[float, float]:
+        return self.limits.get(model, self.default)
+
+    def _level(self, name: str, per_minute: float, now: float) -> float:
+        """Bucket ``name`` refilled up to now; new buckets start full."""
+        capacity = per_minute * BURST_SECONDS / 60
+        row = self._db.execute("SELECT level, updated FROM buckets WHERE name = ?", (name,)).fetchone()
+        if row is None:
+            return capacity
+        return min(capacity, row[0] + (now - row[1]) * per_minute / 60)
+
+    def acquire(self, model: str, tokens: int) -> float:
+        """
+        Take one request and ``tokens`` tokens for ``model``. Returns 0 once taken,
+        or the seconds to wait before trying again, with nothing taken.
+        """
+        rpm, tpm = self._limits(model)
+        now = time.time()
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                held = self._db.execute("SELECT level FROM buckets WHERE name = ?", (f"{model}:hold",)).fetchone()
+                if held is not None and held[0] > now:
+                    self._db.execute("COMMIT")
+                    return held[0] - now
+                waits = []
+                levels = {}
+                for kind, per_minute, need in (("requests", rpm, 1.0), ("tokens", tpm, float(tokens))):
+                    if per_minute <= 0:
+                        continue
+                    level = self._level(f"{model}:{kind}", per_minute, now)
+                    # A call larger than the bucket waits for a full bucket, then overdraws it
+                    need = min(need, per_minute * BURST_SECONDS / 60)
+                    levels[kind] = (level, per_minute)
+                    if level < need:
+                        waits.append((need - level) * 60 / per_minute)
+                if not waits:
+                    for kind, (level, _) in levels.items():
+                        charge = 1.0 if kind == "requests" else float(tokens)
+                        self._db.execute(
+                            "INSERT OR REPLACE INTO buckets (name, level, updated) VALUES (?, ?, ?)",
+                            (f"{model}:{kind}", level - charge, now),
+                        )
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+        return max(waits) if waits else 0.0
+
+    def adjust(self, model: str, tokens: int):
+        """Charge ``tokens`` more (or refund, if negative) once a call's real size is known."""
+        rpm, tpm = self._limits(model)
+        if tpm <= 0 or not tokens:
+            return
+        now = time.time()
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                level = self._level(f"{model}:tokens", tpm, now)
+                self._db.execute(
+                    "INSERT OR REPLACE INTO buckets (name, level, updated) VALUES (?, ?, ?)",
+                    (f"{model}:tokens", min(level - tokens, tpm * BURST_SECONDS / 60), now),
+                )
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+
+    def hold(self, model: str, seconds: float):
+        """Stop handing out budget for ``model`` for ``seconds``, in every process."""
+        until = time.time() + seconds
+        with self._lock:
+            self._db.execute(
+                "INSERT INTO buckets (name, level, updated) VALUES (?, ?, ?)"
+                " ON CONFLICT(name) DO UPDATE SET level = MAX(level, excluded.level), updated = excluded.updated",
+                (f"{model}:hold", until, time.time()),
+            )
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+def _retry_after(error: BaseException) -> Optional[float]:
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    try:
+        value = headers.get("retry-after")
+        return float(value) if value is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+def _retry_reason(error: BaseException) -> Optional[str]:
+    """Why ``error`` is worth retrying ("429", "503", "connection", ...), or None if it is not."""
+    status = getattr(error, "status_code", None)
+    if status in _RETRY_STATUS:
+        return str(status)
+    if any(name in type(error).__name__ for name in _RETRY_ERRORS):
+        return "connection"
+    return None
+
+
+class LLMGateway:
+    """
+    Runs LLM calls within the shared rate limits, queueing and retrying them.
+
+    Args:
+        buckets: Rate limit buckets; None sends calls without limits
+        retries: Retries after the first attempt
+        queue_timeout: Longest wait for budget, in seconds, when there is no deadline
+        backoff: First retry delay in seconds; doubles with each retry, with full jitter
+        max_backoff: Cap on a retry delay in seconds
+    """
+
+    def __init__(
+        self,
+        buckets: Optional[TokenBuckets],
+        retries: int = 3,
+        queue_timeout: float = 60.0,
+        backoff: float = 0.5,
+        max_backoff: float = 20.0,
+    ):
+        self.buckets = buckets
+        self.retries = retries
+        self.queue_timeout = queue_timeout
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+
+    @classmethod
+    def from_env(cls) -> "LLMGateway":
+        limited = os.getenv("APEX_LLM_RATE_LIMITS", "1").lower() not in ("0", "false", "no")
+        return cls(
+            buckets=TokenBuckets.from_env() if limited else None,
+            retries=int(os.getenv("APEX_LLM_RETRIES", 3)),
+            queue_timeout=float(os.getenv("APEX_LLM_QUEUE_TIMEOUT", 60)),
+        )
+
+    def _wait_for_budget(self, model: str, tokens: int):
+        if self.buckets is None:
+            return
+        deadline = current_deadline()
+        give_up = time.time() + self.queue_timeout
+        started = time.perf_counter()
+        while True:
+            try:
+                wait = self.buckets.acquire(model, tokens)
+            except sqlite3.Error as e:
+                # The limits are a courtesy to the provider; a broken limits file must not stop calls
+                logger.warning(f"LLM rate limit check failed, sending anyway: {e}")
+                return
+            if wait <= 0:
+                break
+            left = deadline.remaining() if deadline is not None else give_up - time.time()
+            if wait > left:
+                QUEUE_TIMEOUTS.inc(model)
+                raise RateLimitQueueTimeout(f"No {model} rate limit budget within {max(left, 0):.1f}s")
+            # Jitter keeps waiting workers from retrying in lockstep
+            time.sleep(min(wait, 2.0) * random.uniform(1.0, 1.25))
+        WAIT_SECONDS.observe(time.perf_counter() - started, model)
+
+    def _sleep_before_retry(self, model: str, attempt: int, error: BaseException, reason: str):
+        delay = random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+        retry_after = _retry_after(error)
+        if retry_after is not None:
+            delay = max(delay, retry_after)
+        if reason == "429" and self.buckets is not None:
+            try:
+                self.buckets.hold(model, retry_after or delay)
+            except sqlite3.Error:
+                pass
+        deadline = current_deadline()
+        if deadline is not None and delay >= deadline.remaining():
+            raise error
+        RETRIES.inc(model, reason)
+        logger.info(f"Retrying {model} call in {delay:.1f}s after {reason}: {error}")
+        time.sleep(delay)
+
+    def run(
+        self,
+        model: str,
+        call: Callable[[], T],
+        prompt_tokens: int,
+        max_tokens: Optional[int] = None,
+        completion_tokens: Optional[Callable[[T], int]] = None,
+    ) -> T:
+        """
+        Run ``call`` once ``model`` has budget for it, retrying transient failures.
+
+        ``prompt_tokens`` and ``max_tokens`` size the charge against the token
+        bucket; ``completion_tokens`` measures the reply so the charge can be
+        corrected afterwards.
+        """
+        estimate = prompt_tokens + (DEFAULT_COMPLETION_TOKENS if max_tokens is None else max_tokens)
+        attempt = 0
+        while True:
+            self._wait_for_budget(model, estimate)
+            try:
+                result = call()
+            except Exception as e:
+                reason = _retry_reason(e)
+                if reason is None or attempt >= self.retries:
+                    raise
+                self._sleep_before_retry(model, attempt, e, reason)
+                attempt += 1
+                continue
+            if self.buckets is not None and completion_tokens is not None:
+                try:
+                    self.buckets.adjust(model, prompt_tokens + completion_tokens(result) - estimate)
+                except sqlite3.Error:
+                    pass
+            return result
+
+
+_gateway: Optional[LLMGateway] = None
+_http_client: Any = None
+_openai_client: Any = None
+_pid: Optional[int] = None
+_lock = threading.Lock()
+
+
+def _reset_after_fork():
+    # Connections and the limits file handle must not cross a fork
+    global _gateway, _http_client, _openai_client, _pid
+    if _pid != os.getpid():
+        _gateway = _http_client = _openai_client = None
+        _pid = os.getpid()
+
+
+def http_client():
+    """This process's keep-alive connection pool for LLM API calls."""
+    global _http_client
+    with _lock:
+        _reset_after_fork()
+        if _http_client is None:
+            import httpx
+
+            _http_client = httpx.Client(
+                limits=httpx.Limits(
+                    max_connections=int(os.getenv("APEX_LLM_MAX_CONNECTIONS", 100)),
+                    max_keepalive_connections=int(os.getenv("APEX_LLM_KEEPALIVE_CONNECTIONS", 20)),
+                    keepalive_expiry=60,
+                ),
+                timeout=httpx.Timeout(600, connect=10),
+            )
+            try:
+                import litellm
+
+                # LiteLLM builds its OpenAI clients on this session
+                litellm.client_session = _http_client
+            except ImportError:
+                pass
+        return _http_client
+
+
+def get_gateway() -> LLMGateway:
+    """This process's gateway, built from the environment on first use."""
+    global _gateway
+    with _lock:
+        _reset_after_fork()
+        if _gateway is None:
+            _gateway = LLMGateway.from_env()
+        return _gateway
+
+
+def openai_client():
+    """This process's OpenAI client on the shared pool. Retries are left to the gateway."""
+    global _openai_client
+    pool = http_client()
+    with _lock:
+        if _openai_client is None:
+            from openai import OpenAI
+
+            _openai_client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"), http_client=pool, max_retries=0)
+        return _openai_client
+
+
+def close():
+    """Close this process's connection pool and limits file, if they were opened."""
+    global _gateway, _http_client, _openai_client
+    with _lock:
+        if _pid != os.getpid():
+            return
+        if _gateway is not None and _gateway.buckets is not None:
+            _gateway.buckets.close()
+        if _http_client is not None:
+            _http_client.close()
+        _gateway = _http_client = _openai_client = None
@@ -25,7 +25,9 @@ def run():
     
     # Initialize and run the crew
     inputs = {
-        'ticker': ticker
+        'ticker': ticker,
+        # Filled with shared macro research only in batch runs
+        'market_context': 'not provided'
     }
     
     try:
@@ -61,7 +63,8 @@ def train():
     Train the crew for better performance.
     """
     inputs = {
-        'ticker': 'AAPL'
+        'ticker': 'AAPL',
+        'market_context': 'not provided'
     }
     try:
         ApexAiHierarchicalLifeCompanion().crew().train(
@@ -87,7 +90,8 @@ def test():
     Test the crew execution with a sample ticker.
     """
     inputs = {
-        'ticker': 'AAPL'
+        'ticker': 'AAPL',
+        'market_context': 'not provided'
     }
     try:
         ApexAiHierarchicalLifeCompanion().crew().test(
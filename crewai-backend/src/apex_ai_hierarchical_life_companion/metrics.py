@@ -0,0 +1,231 @@
+"""
+Prometheus metrics for the Apex backend.
+
+Metrics are recorded on hot paths (every route, task, tool call and LLM call),
+so recording never takes a lock: each thread writes to its own shard, a plain
+dict only that thread mutates. Scraping merges the shards. Shards of threads
+that have exited (CrewAI starts a thread per async task) are folded into a
+retired shard so their counts are kept and the shard list stays small.
+
+Only counters and histograms are recorded this way. Point-in-time values
+(active runs, queue depth) are read at scrape time from gauge callbacks.
+"""
+import bisect
+import threading
+import weakref
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+LabelValues = Tuple[str, ...]
+
+# Seconds; spans fast tool calls up to multi-minute crew runs
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+
+
+class _Shard:
+    """Values written by one thread: counter totals and histogram ``[bucket counts..., sum]`` per series."""
+
+    def __init__(self, thread: Optional[threading.Thread]):
+        self.thread = weakref.ref(thread) if thread is not None else None
+        self.counters: Dict[Tuple[str, LabelValues], float] = {}
+        self.histograms: Dict[Tuple[str, LabelValues], List[float]] = {}
+
+    @property
+    def alive(self) -> bool:
+        thread = self.thread() if self.thread is not None else None
+        return thread is not None and thread.is_alive()
+
+    def merge_into(self, counters: Dict, histograms: Dict):
+        # dict() copies are atomic under the GIL, so the owning thread may keep writing meanwhile.
+        for key, value in dict(self.counters).items():
+            counters[key] = counters.get(key, 0.0) + value
+        for key, values in dict(self.histograms).items():
+            values = list(values)
+            total = histograms.get(key)
+            if total is None:
+                histograms[key] = values
+            else:
+                for i, value in enumerate(values):
+                    total[i] += value
+
+
+class _Metric:
+    def __init__(self, registry: "MetricsRegistry", name: str, help: str, labels: Sequence[str]):
+        self.registry = registry
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, *labels: str, amount: float = 1.0):
+        counters = self.registry._shard().counters
+        key = (self.name, labels)
+        counters[key] = counters.get(key, 0.0) + amount
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, registry, name, help, labels, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(registry, name, help, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, *labels: str):
+        histograms = self.registry._shard().histograms
+        key = (self.name, labels)
+        series = histograms.get(key)
+        if series is None:
+            # One slot per bucket, one for +Inf, then the sum
+            series = histograms[key] = [0.0] * (len(self.buckets) + 2)
+        series[bisect.bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+
+class MetricsRegistry:
+    """Holds metric definitions and per-thread shards, and renders the Prometheus text format."""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._gauges: List[Tuple[str, str, Sequence[str], Callable[[], Dict[LabelValues, float]]]] = []
+        self._local = threading.local()
+        self._shards: List[_Shard] = []
+        self._retired = _Shard(None)
+        self._lock = threading.Lock()
+
+    def counter(self, name: str, help: str, labels: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(self, name, help, labels))
+
+    def histogram(
+        self, name: str, help: str, labels: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS
+    ) -> Histogram:
+        return self._register(Histogram(self, name, help, labels, buckets))
+
+    def gauge_callback(
+        self, name: str, help: str, labels: Sequence[str], read: Callable[[], Dict[LabelValues, float]]
+    ):
+        """Register a gauge whose values ``read()`` returns at scrape time, keyed by label values."""
+        self._gauges.append((name, help, tuple(labels), read))
+
+    def _register(self, metric):
+        self._metrics[metric.name] = metric
+        return metric
+
+    def _shard(self) -> _Shard:
+        shard = getattr(self._local, "shard", None)
+        if shard is None:
+            shard = self._local.shard = _Shard(threading.current_thread())
+            with self._lock:
+                self._shards.append(shard)
+        return shard
+
+    def collect(self) -> Tuple[Dict, Dict]:
+        """Merged counter and histogram values across all shards."""
+        counters: Dict = {}
+        histograms: Dict = {}
+        with self._lock:
+            live = []
+            for shard in self._shards:
+                if shard.alive:
+                    live.append(shard)
+                else:
+                    shard.merge_into(self._retired.counters, self._retired.histograms)
+            self._shards = live
+            for shard in [self._retired, *live]:
+                shard.merge_into(counters, histograms)
+        return counters, histograms
+
+    def render(self) -> str:
+        counters, histograms = self.collect()
+        lines: List[str] = []
+        for metric in self._metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            if isinstance(metric, Histogram):
+                for (name, labels), series in sorted(histograms.items()):
+                    if name == metric.name:
+                        lines.extend(_histogram_lines(metric, labels, series))
+            else:
+                for (name, labels), value in sorted(counters.items()):
+                    if name == metric.name:
+                        lines.append(f"{name}{_labels(metric.labels, labels)} {_number(value)}")
+        for name, help, label_names, read in self._gauges:
+            lines.append(f"# HELP {name} {help}")
+            lines.append(f"# TYPE {name} gauge")
+            for labels, value in read().items():
+                lines.append(f"{name}{_labels(label_names, labels)} {_number(value)}")
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Iterable[str], values: Iterable[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+def _histogram_lines(metric: Histogram, labels: LabelValues, series: List[float]) -> List[str]:
+    lines = []
+    cumulative = 0.0
+    for bound, count in zip([*metric.buckets, "+Inf"], series[:-1]):
+        cumulative += count
+        le = 'le="+Inf"' if bound == "+Inf" else f'le="{bound}"'
+        lines.append(f"{metric.name}_bucket{_labels(metric.labels, labels, le)} {_number(cumulative)}")
+    lines.append(f"{metric.name}_sum{_labels(metric.labels, labels)} {_number(series[-1])}")
+    lines.append(f"{metric.name}_count{_labels(metric.labels, labels)} {_number(cumulative)}")
+    return lines
+
+
+registry = MetricsRegistry()
+
+HTTP_REQUEST_SECONDS = registry.histogram(
+    "apex_http_request_duration_seconds", "HTTP request latency by route", ("route", "method", "status")
+)
+TASK_SECONDS = registry.histogram(
+    "apex_task_duration_seconds", "Crew task execution time by task name", ("task", "status")
+)
+TOOL_SECONDS = registry.histogram("apex_tool_duration_seconds", "Tool call latency by tool", ("tool",))
+TOOL_ERRORS = registry.counter("apex_tool_errors_total", "Tool calls that raised or reported an error", ("tool",))
+TOOL_SKIPPED = registry.counter("apex_tool_skipped_total", "Tool calls skipped or abandoned for lack of time", ("tool",))
+LLM_PROMPT_TOKENS = registry.counter("apex_llm_prompt_tokens_total", "LLM prompt tokens by agent", ("agent",))
+LLM_CACHED_PROMPT_TOKENS = registry.counter(
+    "apex_llm_cached_prompt_tokens_total", "LLM prompt tokens served from the provider's prefix cache by agent", ("agent",)
+)
+LLM_COMPLETION_TOKENS = registry.counter("apex_llm_completion_tokens_total", "LLM completion tokens by agent", ("agent",))
+LLM_REQUESTS = registry.counter("apex_llm_requests_total", "Successful LLM requests by agent", ("agent",))
+
+# TokenProcess counters CrewAI accumulates on each agent
+_TOKEN_FIELDS = ("total_tokens", "prompt_tokens", "cached_prompt_tokens", "completion_tokens", "successful_requests")
+
+
+def record_token_usage(agents: Iterable) -> None:
+    """
+    Count the tokens each agent used during a run, then zero the agent's tally
+    so a pooled crew reports only its new usage next time.
+    """
+    for agent in agents:
+        process = getattr(agent, "_token_process", None)
+        if process is None:
+            continue
+        summary = process.get_summary()
+        role = getattr(agent, "role", "unknown")
+        if summary.prompt_tokens:
+            LLM_PROMPT_TOKENS.inc(role, amount=summary.prompt_tokens)
+        if getattr(summary, "cached_prompt_tokens", 0):
+            LLM_CACHED_PROMPT_TOKENS.inc(role, amount=summary.cached_prompt_tokens)
+        if summary.completion_tokens:
+            LLM_COMPLETION_TOKENS.inc(role, amount=summary.completion_tokens)
+        if summary.successful_requests:
+            LLM_REQUESTS.inc(role, amount=summary.successful_requests)
+        for field in _TOKEN_FIELDS:
+            if hasattr(process, field):
+                setattr(process, field, 0)
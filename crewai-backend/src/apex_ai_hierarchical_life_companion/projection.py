@@ -0,0 +1,507 @@
+"""
+Monte Carlo projection of a user's finances, vectorized with NumPy.
+
+The life simulation used to rest on probabilities the LLM made up. A
+projection gives it numbers to stand on: it follows savings, income, expenses
+and investment returns month by month over thousands of scenarios at once, and
+reports the spread of outcomes, for the user as they are and with a decision
+applied.
+
+Each month of each path:
+- investments earn a lognormal return (``annual_return``, ``annual_volatility``);
+- income stops for ``income_shock_months`` when an income shock hits, which
+  happens with an annual probability of ``income_shock_probability``;
+- once a year, income changes by a lognormal raise (``income_growth``,
+  ``income_volatility``) and expenses by lognormal inflation (``inflation``,
+  ``expense_volatility``);
+- income less expenses goes to cash, which earns ``cash_rate``. Cash above
+  ``cash_buffer_months`` of expenses is invested, and a shortfall is covered by
+  selling investments. A path whose cash is still negative has run out of money.
+
+Paths are columns of NumPy arrays and months are a short Python loop, so memory
+stays at a few vectors per path whatever the horizon. The baseline and the
+decision are run with the same random draws (common random numbers), so their
+difference reflects the decision rather than sampling noise.
+
+FinancialProfile.from_rows() builds the inputs from rows of the ``financial_*``
+tables in scripts/financial-schema-v1.sql, and load_financial_profile() reads
+them from PostgreSQL when ``APEX_FINANCIAL_DB_URL`` (or ``DATABASE_URL``) is
+set and psycopg is installed.
+"""
+import logging
+import math
+import os
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+PATHS = int(os.getenv("APEX_PROJECTION_PATHS", 10000))
+MONTHS = int(os.getenv("APEX_PROJECTION_MONTHS", 120))
+
+PERCENTILES = (5, 25, 50, 75, 95)
+
+# Expected annual return and volatility by financial_risk_scores.risk_level
+RISK_LEVELS = {
+    "low": (0.04, 0.06),
+    "medium": (0.06, 0.12),
+    "high": (0.08, 0.18),
+    "very_high": (0.10, 0.28),
+}
+
+# Months of transactions averaged for income and expenses
+HISTORY_MONTHS = 12
+
+
+def _number(value: Any, default: float = 0.0) -> float:
+    try:
+        return default if value is None else float(value)
+    except (TypeError, ValueError):
+        return default
+
+
+class FinancialProfile:
+    """
+    A user's finances as the projection's starting point. Rates are annual fractions.
+
+    Args:
+        cash: Cash and other uninvested savings
+        invested: Market value of investments
+        monthly_income: Income per month after tax
+        monthly_expenses: Spending per month
+        annual_return: Expected investment return
+        annual_volatility: Standard deviation of the annual investment return
+        income_growth: Expected income growth
+        income_volatility: Standard deviation of annual income growth
+        inflation: Expected growth of expenses
+        expense_volatility: Standard deviation of annual expense growth
+        cash_rate: Interest on cash
+        cash_buffer_months: Months of expenses kept as cash; the rest is invested
+        income_shock_probability: Chance per year of losing all income for a while
+        income_shock_months: Months an income shock lasts
+        currency: Currency of the amounts
+    """
+
+    FIELDS = (
+        "cash", "invested", "monthly_income", "monthly_expenses", "annual_return", "annual_volatility",
+        "income_growth", "income_volatility", "inflation", "expense_volatility", "cash_rate",
+        "cash_buffer_months", "income_shock_probability", "income_shock_months", "currency",
+    )
+
+    def __init__(
+        self,
+        cash: float = 0.0,
+        invested: float = 0.0,
+        monthly_income: float = 0.0,
+        monthly_expenses: float = 0.0,
+        annual_return: float = 0.06,
+        annual_volatility: float = 0.15,
+        income_growth: float = 0.03,
+        income_volatility: float = 0.05,
+        inflation: float = 0.03,
+        expense_volatility: float = 0.03,
+        cash_rate: float = 0.02,
+        cash_buffer_months: float = 6.0,
+        income_shock_probability: float = 0.03,
+        income_shock_months: int = 4,
+        currency: str = "USD",
+    ):
+        self.cash = cash
+        self.invested = invested
+        self.monthly_income = monthly_income
+        self.monthly_expenses = monthly_expenses
+        self.annual_return = annual_return
+        self.annual_volatility = annual_volatility
+        self.income_growth = income_growth
+        self.income_volatility = income_volatility
+        self.inflation = inflation
+        self.expense_volatility = expense_volatility
+        self.cash_rate = cash_rate
+        self.cash_buffer_months = cash_buffer_months
+        self.income_shock_probability = income_shock_probability
+        self.income_shock_months = income_shock_months
+        self.currency = currency
+
+    @property
+    def net_worth(self) -> float:
+        return self.cash + self.invested
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {field: getattr(self, field) for field in self.FIELDS}
+
+    def updated(self, values: Optional[Dict[str, Any]]) -> "FinancialProfile":
+        """A copy with the known fields of ``values`` replaced; unknown keys are ignored."""
+        fields = self.to_dict()
+        for key, value in (values or {}).items():
+            if key in fields and value is not None:
+                fields[key] = value if key == "currency" else _number(value, fields[key])
+        fields["income_shock_months"] = int(fields["income_shock_months"])
+        return FinancialProfile(**fields)
+
+    @classmethod
+    def from_rows(
+        cls,
+        portfolios: Iterable[Dict[str, Any]],
+        positions: Iterable[Dict[str, Any]] = (),
+        transactions: Iterable[Dict[str, Any]] = (),
+        risk_scores: Iterable[Dict[str, Any]] = (),
+        now: Optional[datetime] = None,
+    ) -> "FinancialProfile":
+        """
+        A profile from rows of financial_portfolios, financial_positions,
+        financial_transactions and financial_risk_scores (as dicts).
+
+        Investments are the positions' market value, or the portfolios' total
+        value when there are no positions. Cash is what the transactions leave
+        uninvested. Income and expenses are the monthly average of deposits (and
+        dividends) and withdrawals over the last HISTORY_MONTHS. Return and
+        volatility come from each portfolio's latest risk score, weighted by
+        portfolio value.
+        """
+        portfolios = list(portfolios)
+        now = now or datetime.utcnow()
+        value_by_portfolio: Dict[Any, float] = defaultdict(float)
+        for position in positions:
+            value = position.get("market_value")
+            if value is None:
+                price = position.get("current_price") or position.get("avg_cost")
+                value = _number(position.get("quantity")) * _number(price)
+            value_by_portfolio[position.get("portfolio_id")] += _number(value)
+        if not value_by_portfolio:
+            for portfolio in portfolios:
+                value_by_portfolio[portfolio.get("id")] = _number(portfolio.get("total_value"))
+        invested = sum(value_by_portfolio.values())
+
+        cash = deposits = withdrawals = 0.0
+        since = now - timedelta(days=30.44 * HISTORY_MONTHS)
+        first_seen = now
+        for transaction in transactions:
+            kind = transaction.get("transaction_type")
+            amount = abs(_number(transaction.get("total_amount")))
+            fees = _number(transaction.get("fees"))
+            # Money into the account adds to cash, money out or into positions takes from it
+            cash += {"deposit": amount, "dividend": amount, "sell": amount}.get(kind, -amount) - fees
+            when = transaction.get("transaction_date")
+            if isinstance(when, str):
+                when = datetime.fromisoformat(when.replace("Z", "+00:00")).replace(tzinfo=None)
+            if when is None or when < since:
+                continue
+            first_seen = min(first_seen, when)
+            if kind in ("deposit", "dividend"):
+                deposits += amount
+            elif kind == "withdrawal":
+                withdrawals += amount
+        months = max(1.0, min(HISTORY_MONTHS, (now - first_seen).days / 30.44))
+
+        latest: Dict[Any, Dict[str, Any]] = {}
+        for score in risk_scores:
+            key = score.get("portfolio_id")
+            if key not in latest or str(score.get("computed_at") or "") > str(latest[key].get("computed_at") or ""):
+                latest[key] = score
+        weighted_return = weighted_volatility = weight = 0.0
+        for key, score in latest.items():
+            level_return, level_volatility = RISK_LEVELS.get(score.get("risk_level"), RISK_LEVELS["medium"])
+            volatility = _number(score.get("volatility"), level_volatility)
+            # Volatility may be stored as a percentage
+            volatility = volatility / 100 if volatility > 1 else volatility
+            share = value_by_portfolio.get(key, 0.0) or 1.0
+            weighted_return += level_return * share
+            weighted_volatility += volatility * share
+            weight += share
+
+        profile = cls(
+            cash=max(cash, 0.0),
+            invested=invested,
+            monthly_income=deposits / months,
+            monthly_expenses=withdrawals / months,
+            currency=next((p.get("currency") for p in portfolios if p.get("currency")), "USD"),
+        )
+        if weight:
+            profile.annual_return = weighted_return / weight
+            profile.annual_volatility = weighted_volatility / weight
+        return profile
+
+
+class Decision:
+    """
+    A change to the user's finances from ``start_month`` (0 is the first projected month).
+
+    Args:
+        start_month: Month the decision takes effect
+        income_change: Fractional change in income, e.g. -0.3 for a 30% pay cut, -1 for no income
+        income_gap_months: Months without any income from ``start_month``, e.g. a job search
+        expense_change: Change in monthly expenses
+        one_off_cost: Amount paid once in ``start_month`` (negative for a one-off gain)
+    """
+
+    FIELDS = ("start_month", "income_change", "income_gap_months", "expense_change", "one_off_cost")
+
+    def __init__(
+        self,
+        start_month: int = 0,
+        income_change: float = 0.0,
+        income_gap_months: int = 0,
+        expense_change: float = 0.0,
+        one_off_cost: float = 0.0,
+    ):
+        self.start_month = start_month
+        self.income_change = income_change
+        self.income_gap_months = income_gap_months
+        self.expense_change = expense_change
+        self.one_off_cost = one_off_cost
+
+    @classmethod
+    def from_dict(cls, values: Optional[Dict[str, Any]]) -> Optional["Decision"]:
+        """A decision from the known keys of ``values``; None if there are none."""
+        known = {key: _number(value) for key, value in (values or {}).items() if key in cls.FIELDS and value is not None}
+        if not known:
+            return None
+        for key in ("start_month", "income_gap_months"):
+            if key in known:
+                known[key] = int(known[key])
+        return cls(**known)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {field: getattr(self, field) for field in self.FIELDS}
+
+
+class Projection:
+    """Outcome distribution of one projection. Amounts are nominal, in the profile's currency."""
+
+    def __init__(
+        self,
+        paths: int,
+        months: int,
+        start: float,
+        yearly: Dict[int, Dict[int, float]],
+        final: np.ndarray,
+        ruin_month: np.ndarray,
+        elapsed: float,
+    ):
+        self.paths = paths
+        self.months = months
+        self.start = start
+        self.yearly = yearly
+        self.final_mean = float(final.mean())
+        self.final_percentiles = dict(zip(PERCENTILES, np.percentile(final, PERCENTILES).tolist()))
+        self.probability_growth = float((final > start).mean())
+        ruined = ruin_month >= 0
+        self.probability_ruin = float(ruined.mean())
+        self.median_ruin_month = int(np.median(ruin_month[ruined])) if ruined.any() else None
+        self.elapsed = elapsed
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "paths": self.paths,
+            "months": self.months,
+            "startNetWorth": round(self.start, 2),
+            "finalNetWorth": {
+                "mean": round(self.final_mean, 2),
+                **{f"p{p}": round(value, 2) for p, value in self.final_percentiles.items()},
+            },
+            "netWorthByYear": {
+                str(year): {f"p{p}": round(value, 2) for p, value in values.items()}
+                for year, values in self.yearly.items()
+            },
+            "probabilityNetWorthGrows": round(self.probability_growth, 4),
+            "probabilityRunningOutOfMoney": round(self.probability_ruin, 4),
+            "medianMonthRunningOutOfMoney": self.median_ruin_month,
+            "elapsedMs": round(self.elapsed * 1000, 1),
+        }
+
+
+def project(
+    profile: FinancialProfile,
+    decision: Optional[Decision] = None,
+    paths: int = PATHS,
+    months: int = MONTHS,
+    seed: int = 0,
+) -> Projection:
+    """
+    Project ``profile`` over ``months`` in ``paths`` scenarios, with ``decision`` applied if given.
+
+    The same ``seed`` gives the same draws, so projections with and without a
+    decision differ only by the decision.
+    """
+    started = time.perf_counter()
+    rng = np.random.default_rng(seed)
+    n = paths
+
+    return_sigma = profile.annual_volatility / math.sqrt(12)
+    return_mu = math.log1p(profile.annual_return) / 12 - return_sigma ** 2 / 2
+    income_mu = math.log1p(profile.income_growth) - profile.income_volatility ** 2 / 2
+    expense_mu = math.log1p(profile.inflation) - profile.expense_volatility ** 2 / 2
+    cash_growth = (1 + profile.cash_rate) ** (1 / 12)
+    shock_hazard = 1 - (1 - min(max(profile.income_shock_probability, 0.0), 1.0)) ** (1 / 12)
+
+    cash = np.full(n, float(profile.cash))
+    invested = np.full(n, float(profile.invested))
+    income = np.full(n, float(profile.monthly_income))
+    expenses = np.full(n, float(profile.monthly_expenses))
+    # Month each path's next income shock starts, drawn ahead instead of a uniform draw per path-month
+    if shock_hazard > 0:
+        next_shock = rng.geometric(shock_hazard, n).astype(np.int32) - 1
+    else:
+        next_shock = np.full(n, months, dtype=np.int32)
+    shock_left = np.zeros(n, dtype=np.int32)
+    ruin_month = np.full(n, -1, dtype=np.int32)
+    # Single precision halves the cost of the draws; amounts stay in double precision
+    returns = np.empty(n, dtype=np.float32)
+    earned = np.empty(n)
+    spent = np.empty(n)
+    moved = np.empty(n)
+
+    yearly: Dict[int, Dict[int, float]] = {}
+    for month in range(months):
+        rng.standard_normal(out=returns, dtype=np.float32)
+        returns *= return_sigma
+        returns += return_mu
+        np.exp(returns, out=returns)
+        invested *= returns
+        if month and month % 12 == 0:
+            # Raises and price changes come once a year
+            income *= np.exp(income_mu + profile.income_volatility * rng.standard_normal(n, dtype=np.float32))
+            expenses *= np.exp(expense_mu + profile.expense_volatility * rng.standard_normal(n, dtype=np.float32))
+        shocked = next_shock == month
+        if shocked.any():
+            shock_left[shocked] = profile.income_shock_months
+            next_shock[shocked] += profile.income_shock_months + rng.geometric(shock_hazard, int(shocked.sum()))
+
+        np.copyto(earned, income)
+        earned[shock_left > 0] = 0.0
+        np.maximum(shock_left - 1, 0, out=shock_left)
+        np.copyto(spent, expenses)
+        if decision is not None and month >= decision.start_month:
+            if month < decision.start_month + decision.income_gap_months:
+                earned[:] = 0.0
+            else:
+                earned *= 1 + decision.income_change
+            spent += decision.expense_change
+            if month == decision.start_month:
+                spent += decision.one_off_cost
+
+        cash *= cash_growth
+        cash += earned
+        cash -= spent
+        # Invest cash above the buffer; sell investments to cover a shortfall
+        np.multiply(spent, -profile.cash_buffer_months, out=moved)
+        moved += cash
+        np.maximum(moved, 0.0, out=moved)
+        np.negative(cash, out=spent)
+        np.maximum(spent, 0.0, out=spent)
+        np.minimum(spent, invested, out=spent)
+        moved -= spent
+        invested += moved
+        cash -= moved
+        ruin_month[(cash < 0) & (ruin_month < 0)] = month + 1
+
+        if (month + 1) % 12 == 0:
+            yearly[(month + 1) // 12] = dict(zip(PERCENTILES, np.percentile(cash + invested, PERCENTILES).tolist()))
+
+    return Projection(
+        paths=n,
+        months=months,
+        start=profile.net_worth,
+        yearly=yearly,
+        final=cash + invested,
+        ruin_month=ruin_month,
+        elapsed=time.perf_counter() - started,
+    )
+
+
+def compare(
+    profile: FinancialProfile,
+    decision: Optional[Decision],
+    paths: int = PATHS,
+    months: int = MONTHS,
+    seed: int = 0,
+) -> Dict[str, Any]:
+    """The baseline projection and, if there is a decision, the projection with it, as one report."""
+    report = {"profile": profile.to_dict(), "baseline": project(profile, None, paths, months, seed).to_dict()}
+    if decision is not None:
+        report["decision"] = decision.to_dict()
+        report["withDecision"] = project(profile, decision, paths, months, seed).to_dict()
+    return report
+
+
+def _money(value: float, currency: str) -> str:
+    return f"{value:,.0f} {currency}"
+
+
+def describe(report: Dict[str, Any]) -> str:
+    """The report of compare() as plain text for an LLM prompt."""
+    currency = report["profile"]["currency"]
+    baseline = report["baseline"]
+    lines = [
+        f"{baseline['paths']:,} Monte Carlo paths over {baseline['months']} months, "
+        f"starting from a net worth of {_money(baseline['startNetWorth'], currency)}.",
+    ]
+    for label, key in (("Without the decision", "baseline"), ("With the decision", "withDecision")):
+        if key not in report:
+            continue
+        result = report[key]
+        final = result["finalNetWorth"]
+        lines.append(
+            f"{label}: final net worth median {_money(final['p50'], currency)} "
+            f"(5th-95th percentile {_money(final['p5'], currency)} to {_money(final['p95'], currency)}); "
+            f"net worth grows in {result['probabilityNetWorthGrows']:.0%} of paths; "
+            f"money runs out in {result['probabilityRunningOutOfMoney']:.1%} of paths"
+            + (
+                f" (median month {result['medianMonthRunningOutOfMoney']})."
+                if result["medianMonthRunningOutOfMoney"] is not None else "."
+            )
+        )
+        yearly = ", ".join(
+            f"year {year}: {_money(values['p50'], currency)}" for year, values in result["netWorthByYear"].items()
+        )
+        if yearly:
+            lines.append(f"  Median net worth by year - {yearly}")
+    return "\n".join(lines)
+
+
+def load_financial_profile(user_id: str) -> Optional[FinancialProfile]:
+    """
+    The profile of ``user_id`` from the financial_* tables, or None when no
+    database is configured, the user has no portfolios or the query fails.
+    """
+    url = os.getenv("APEX_FINANCIAL_DB_URL") or os.getenv("DATABASE_URL")
+    if not url:
+        return None
+    try:
+        import psycopg
+        from psycopg.rows import dict_row
+    except ImportError:
+        logger.warning("APEX_FINANCIAL_DB_URL is set but the 'psycopg' package is not installed")
+        return None
+    try:
+        with psycopg.connect(url, row_factory=dict_row, connect_timeout=5) as connection:
+            portfolios = connection.execute(
+                "SELECT id, currency, total_value FROM financial_portfolios WHERE user_id = %s", (user_id,)
+            ).fetchall()
+            if not portfolios:
+                return None
+            ids = [portfolio["id"] for portfolio in portfolios]
+            positions = connection.execute(
+                "SELECT portfolio_id, quantity, avg_cost, current_price, market_value"
+                " FROM financial_positions WHERE portfolio_id = ANY(%s)",
+                (ids,),
+            ).fetchall()
+            transactions = connection.execute(
+                "SELECT transaction_type, total_amount, fees, transaction_date"
+                " FROM financial_transactions WHERE portfolio_id = ANY(%s)",
+                (ids,),
+            ).fetchall()
+            risk_scores = connection.execute(
+                "SELECT DISTINCT ON (portfolio_id) portfolio_id, volatility, risk_level, computed_at"
+                " FROM financial_risk_scores WHERE portfolio_id = ANY(%s)"
+                " ORDER BY portfolio_id, computed_at DESC",
+                (ids,),
+            ).fetchall()
+    except Exception as e:
+        logger.warning(f"Could not load financial data for {user_id}: {e}")
+        return None
+    return FinancialProfile.from_rows(portfolios, positions, transactions, risk_scores)
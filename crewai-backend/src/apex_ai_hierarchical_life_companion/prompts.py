@@ -0,0 +1,93 @@
+"""
+Task prompt rendering that keeps the static instructions a stable prefix.
+
+OpenAI and most other providers cache the longest prompt prefix they have seen
+recently, and serve those tokens faster and at a discount. CrewAI interpolates
+request values into a task's description where the placeholders stand. Many
+tasks.yaml descriptions name ``{user_name}`` or ``{ticker}`` in their first
+lines, so two requests' prompts part ways after a few words, and the hundreds of
+lines of instructions after that are never cached.
+
+render_task() renders a task's description and expected output with every
+placeholder replaced by a fixed reference (``<user_name>``). The request's
+values follow in a "Request details" block at the end. The instructions are then
+byte-identical across requests, and only the tail of the task prompt varies.
+Templates are compiled once and kept in memory.
+
+``APEX_PREFIX_CACHE_PROMPTS=0`` restores CrewAI's in-place interpolation. The
+share of prompt tokens the provider served from its cache is tracked as
+``apex_llm_cached_prompt_tokens_total`` and reported by prompt_cache_stats().
+"""
+import os
+import re
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple
+
+from . import metrics
+
+ENABLED = os.getenv("APEX_PREFIX_CACHE_PROMPTS", "1").lower() not in ("0", "false", "no")
+
+# Same placeholders CrewAI interpolates; JSON examples in task text never match
+_PLACEHOLDER = re.compile(r"\{([A-Za-z_][A-Za-z0-9_]*)\}")
+
+DETAILS_HEADING = "Request details (values of the <placeholders> above):"
+
+
+@lru_cache(maxsize=512)
+def compile_template(template: str) -> Tuple[str, Tuple[str, ...]]:
+    """``template`` with each ``{name}`` replaced by ``<name>``, and the names in first-seen order."""
+    names: Dict[str, None] = {}
+
+    def reference(match: "re.Match") -> str:
+        names.setdefault(match.group(1), None)
+        return f"<{match.group(1)}>"
+
+    return _PLACEHOLDER.sub(reference, template), tuple(names)
+
+
+def render_task(
+    description: str, expected_output: Optional[str], inputs: Dict[str, Any]
+) -> Tuple[str, Optional[str]]:
+    """
+    The task's description and expected output with the request values moved to the end.
+
+    CrewAI puts the expected output right after the description in the task
+    prompt, so the details block goes at the end of the expected output.
+    """
+    static_description, names = compile_template(description)
+    static_expected, expected_names = compile_template(expected_output) if expected_output else (expected_output, ())
+    fields: List[str] = list(names)
+    fields.extend(name for name in expected_names if name not in names)
+    details = [f"- {name}: {inputs[name]}" for name in fields if name in inputs]
+    if not details:
+        return static_description, static_expected
+    block = DETAILS_HEADING + "\n" + "\n".join(details)
+    if static_expected:
+        return static_description, f"{static_expected.rstrip()}\n\n{block}"
+    return f"{static_description.rstrip()}\n\n{block}", static_expected
+
+
+def prompt_cache_stats() -> Dict[str, Any]:
+    """Prompt tokens, and the share the provider served from its prefix cache, overall and per agent."""
+    counters, _ = metrics.registry.collect()
+    by_agent: Dict[str, Dict[str, float]] = {}
+    for (name, labels), value in counters.items():
+        if name == metrics.LLM_PROMPT_TOKENS.name:
+            by_agent.setdefault(labels[0], {"prompt": 0.0, "cached": 0.0})["prompt"] += value
+        elif name == metrics.LLM_CACHED_PROMPT_TOKENS.name:
+            by_agent.setdefault(labels[0], {"prompt": 0.0, "cached": 0.0})["cached"] += value
+
+    def summary(prompt: float, cached: float) -> Dict[str, Any]:
+        return {
+            "promptTokens": int(prompt),
+            "cachedPromptTokens": int(cached),
+            "hitRate": round(cached / prompt, 4) if prompt else None,
+        }
+
+    total_prompt = sum(entry["prompt"] for entry in by_agent.values())
+    total_cached = sum(entry["cached"] for entry in by_agent.values())
+    return {
+        "enabled": ENABLED,
+        **summary(total_prompt, total_cached),
+        "byAgent": {agent: summary(entry["prompt"], entry["cached"]) for agent, entry in sorted(by_agent.items())},
+    }
@@ -3,6 +3,7 @@ Autonomous Task Scheduler for Apex AI
 Runs proactive tasks 24/7 without user input
 """
 import os
+from apscheduler.executors.pool import ThreadPoolExecutor
 from apscheduler.schedulers.background import BackgroundScheduler
 from apscheduler.triggers.cron import CronTrigger
 from datetime import datetime
@@ -23,7 +24,10 @@ class ProactivityEngine:
     """
     
     def __init__(self):
-        self.scheduler = BackgroundScheduler()
+        # Scheduled crews are background throughput work: run them on a small
+        # dedicated pool so they never compete with interactive requests in bulk
+        workers = int(os.getenv("APEX_SCHEDULER_WORKERS", 1))
+        self.scheduler = BackgroundScheduler(executors={'default': ThreadPoolExecutor(workers)})
         self.setup_jobs()
     
     def setup_jobs(self):
@@ -73,7 +77,7 @@ class ProactivityEngine:
         logger.info("🌅 Morning Architect: Starting daily analysis...")
         
         try:
-            from apex_ai_hierarchical_life_companion.crew import ApexAiHierarchicalLifeCompanion
+            from apex_ai_hierarchical_life_companion import crew_registry
             
             # Run the morning architect task
             inputs = {
@@ -81,8 +85,10 @@ class ProactivityEngine:
                 'timestamp': datetime.now().isoformat()
             }
             
-            crew = ApexAiHierarchicalLifeCompanion().crew()
-            result = crew.kickoff_for_each(inputs=[inputs])
+            crew = crew_registry.build_crew('daily-path')
+            result = crew.kickoff_for_each(
+                inputs=[crew_registry.prepare_inputs('daily-path', inputs)]
+            )
             
             # Send proactive notification to frontend
             self.send_proactive_notification({
@@ -0,0 +1,372 @@
+"""
+Cache of life simulations keyed on what the user asked and the facts they gave.
+
+Users re-run "what if I quit my job" with one detail changed, such as their
+savings. The LLM cache only helps when the prompt is byte-identical, so every
+variation cost a full simulation. A SimulationCache stores finished
+simulations keyed on a fingerprint of:
+
+- the decision, normalized: lower case, punctuation and extra spaces dropped;
+- the fields of the user context. ``Key: value`` pairs are parsed from the
+  text, keys are normalized, and amounts such as "$50k" and "$50,000" compare
+  equal. Field order does not matter. Text outside ``Key: value`` pairs counts
+  as one "notes" field. The user's effective financial profile (stored records
+  with the figures passed to the tool applied) and the decision impact are
+  fields too;
+- the user and the simulation settings, so one user's simulations are never
+  served to another.
+
+A lookup returns one of three results:
+- ``hit``: the same decision and fields. The stored simulation is returned;
+- ``partial``: the same decision with some fields changed. Each changed field
+  maps to the life domains it bears on (a savings figure bears on Financial).
+  Only the Echo Paths whose key impacts touch those domains are re-written;
+  the other paths are kept as they were;
+- ``miss``: no stored simulation of the decision, or changes that touch every
+  path or fields of unknown domain. The simulation runs in full.
+
+Entries live in a SQLite file in WAL mode (``APEX_SIMULATION_CACHE_DB``, default
+``.apex/simulation-cache.sqlite3``) shared by all processes on the host. They
+expire after ``APEX_SIMULATION_CACHE_TTL`` seconds (default 7 days), and only
+the newest ``APEX_SIMULATION_CACHE_SIZE`` are kept. Hits, partial hits and the
+seconds they saved are exported as ``apex_simulation_cache_lookups_total`` and
+``apex_simulation_cache_seconds_saved_total``. ``APEX_SIMULATION_CACHE=0`` turns
+the cache off, and ``llm_cache.bypass()`` skips it.
+"""
+import hashlib
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from . import llm_cache, metrics
+
+logger = logging.getLogger(__name__)
+
+# Stored simulations of one decision compared against a changed context
+MAX_CANDIDATES = 20
+
+# More changed fields than this share of the context re-simulates in full
+MAX_CHANGED_SHARE = 0.5
+
+NOTES_FIELD = "notes"
+
+# Life domains of Echo Path key impacts, and the words in a context field's name that bear on each
+DOMAINS: Dict[str, Tuple[str, ...]] = {
+    "financial": (
+        "saving", "salary", "income", "pay", "debt", "loan", "mortgage", "rent", "expense", "spend", "budget",
+        "invest", "portfolio", "cash", "money", "net worth", "asset", "retirement", "financ", "cost", "price",
+    ),
+    "career": (
+        "job", "role", "career", "skill", "title", "employer", "company", "work", "experience", "industry",
+        "business", "profession", "education", "degree", "network",
+    ),
+    "relationships": ("family", "partner", "married", "marital", "child", "kid", "spouse", "friend", "relationship", "dependent"),
+    "health": ("health", "energy", "sleep", "stress", "fitness", "exercise", "age", "wellness"),
+    "time": ("hour", "time", "schedule", "calendar", "commute", "availability", "location", "city"),
+    "personal growth": ("goal", "value", "learning", "habit", "growth", "priorit", "risk tolerance", "dream"),
+}
+
+# Fields the tool adds from its structured arguments
+STRUCTURED_DOMAINS = {"financial_profile": "financial", "decision_impact": "financial"}
+
+_PAIR_START = re.compile(r"[,;]\s*(?=[A-Za-z][\w /&()'-]{0,40}:)")
+_PAIR = re.compile(r"^\s*(?:[-*•]|\d+[.)])?\s*([A-Za-z][\w /&()'-]{0,40}?)\s*:\s*(.*?)\s*$")
+_AMOUNT = re.compile(r"(?:[$€£]\s*)?(\d[\d,]*(?:\.\d+)?)(?:\s?([km])\b)?", re.I)
+_NON_WORD = re.compile(r"[^\w%/.]+")
+_SPACES = re.compile(r"\s+")
+
+LOOKUPS = metrics.registry.counter(
+    "apex_simulation_cache_lookups_total", "Simulation cache lookups by result (hit, partial, miss)", ("result",)
+)
+SECONDS_SAVED = metrics.registry.counter(
+    "apex_simulation_cache_seconds_saved_total", "Simulation time saved by full and partial cache hits"
+)
+
+
+def _amount(match: "re.Match") -> str:
+    value = float(match.group(1).replace(",", ""))
+    value *= {"k": 1e3, "m": 1e6}.get((match.group(2) or "").lower(), 1)
+    return f"{value:g}"
+
+
+def normalize_value(value: Any) -> str:
+    """``value`` in a form that ignores case, spacing, punctuation and how amounts are written."""
+    text = json.dumps(value, sort_keys=True, default=str) if not isinstance(value, str) else value
+    text = _AMOUNT.sub(_amount, text.lower())
+    return _SPACES.sub(" ", _NON_WORD.sub(" ", text)).strip()
+
+
+def normalize_key(key: str) -> str:
+    return _SPACES.sub("_", _NON_WORD.sub(" ", key.lower()).strip())
+
+
+def context_fields(user_context: str, **structured: Any) -> Dict[str, str]:
+    """
+    The normalized fields of ``user_context``, plus the ``structured`` tool
+    arguments that are set, each as one field.
+    """
+    fields: Dict[str, str] = {}
+    notes: List[str] = []
+    for line in (user_context or "").splitlines():
+        for part in _PAIR_START.split(line):
+            match = _PAIR.match(part)
+            if match and match.group(2):
+                fields[normalize_key(match.group(1))] = normalize_value(match.group(2))
+            elif part.strip():
+                notes.append(normalize_value(part))
+    if notes:
+        fields[NOTES_FIELD] = " ".join(notes)
+    for name, value in structured.items():
+        if value:
+            fields[name] = normalize_value(value)
+    return fields
+
+
+def field_domains(field: str) -> Set[str]:
+    """The life domains a context field bears on; empty when unknown."""
+    if field in STRUCTURED_DOMAINS:
+        return {STRUCTURED_DOMAINS[field]}
+    name = field.replace("_", " ")
+    return {domain for domain, words in DOMAINS.items() if any(word in name for word in words)}
+
+
+def affected_paths(result: Dict[str, Any], changed: Set[str]) -> Optional[List[int]]:
+    """
+    Indexes of the Echo Paths in ``result`` whose key impacts touch a domain of
+    the ``changed`` fields, or None if the whole simulation must be redone.
+    """
+    domains: Set[str] = set()
+    for field in changed:
+        field_domain = field_domains(field)
+        if not field_domain:
+            return None
+        domains |= field_domain
+    paths = result.get("echo_paths") or []
+    affected = []
+    for index, path in enumerate(paths):
+        impacts = path.get("key_impacts") or []
+        touched = {str(impact.get("domain", "")).lower() for impact in impacts if isinstance(impact, dict)}
+        # A path without impact domains cannot be shown to be unaffected
+        if not touched or any(domain in impact for domain in domains for impact in touched):
+            affected.append(index)
+    if not paths or len(affected) == len(paths):
+        return None
+    return affected
+
+
+def _hash(value: Any) -> str:
+    return hashlib.sha256(json.dumps(value, sort_keys=True).encode()).hexdigest()
+
+
+class CachedSimulation:
+    """A stored simulation found by SimulationCache.lookup()."""
+
+    def __init__(
+        self, result: Dict[str, Any], themes: List[Dict[str, Any]], elapsed: float, changed: Set[str],
+        refresh: Optional[List[int]],
+    ):
+        self.result = result
+        self.themes = themes
+        self.elapsed = elapsed
+        self.changed = changed
+        # Echo Paths to re-write; empty for a full hit
+        self.refresh = refresh or []
+
+    @property
+    def partial(self) -> bool:
+        return bool(self.refresh)
+
+
+class SimulationCache:
+    """
+    Finished simulations on disk, keyed on the decision and context fields.
+
+    Args:
+        path: SQLite file holding the cache
+        ttl: Seconds an entry is served
+        max_entries: Entries kept; the least recently used beyond this are evicted
+    """
+
+    EVICT_EVERY = 50
+
+    def __init__(self, path: str, ttl: float = 7 * 86400, max_entries: int = 5000):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=10)
+        self._lock = threading.Lock()
+        self._writes = 0
+        self.hits = 0
+        self.partial_hits = 0
+        self.misses = 0
+        self.seconds_saved = 0.0
+        with self._lock:
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS simulations ("
+                " key TEXT PRIMARY KEY,"
+                " decision TEXT NOT NULL,"
+                " fields TEXT NOT NULL,"
+                " result TEXT NOT NULL,"
+                " themes TEXT NOT NULL,"
+                " elapsed REAL NOT NULL,"
+                " created_at REAL NOT NULL,"
+                " last_used REAL NOT NULL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS simulations_decision ON simulations (decision, last_used)")
+
+    @classmethod
+    def from_env(cls) -> Optional["SimulationCache"]:
+        """Build a cache from ``APEX_SIMULATION_CACHE*``; None when it is turned off."""
+        if os.getenv("APEX_SIMULATION_CACHE", "1").lower() in ("0", "false", "no", "off"):
+            return None
+        return cls(
+            path=os.getenv("APEX_SIMULATION_CACHE_DB", ".apex/simulation-cache.sqlite3"),
+            ttl=float(os.getenv("APEX_SIMULATION_CACHE_TTL", 7 * 86400)),
+            max_entries=int(os.getenv("APEX_SIMULATION_CACHE_SIZE", 5000)),
+        )
+
+    @staticmethod
+    def decision_key(decision_query: str, scope: Dict[str, Any]) -> str:
+        """Fingerprint of the normalized decision and the simulation settings in ``scope``."""
+        return _hash({"decision": normalize_value(decision_query), **scope})
+
+    def lookup(self, decision_query: str, fields: Dict[str, str], scope: Dict[str, Any]) -> Optional[CachedSimulation]:
+        """The stored simulation to serve or refresh for this request, or None on a miss."""
+        decision = self.decision_key(decision_query, scope)
+        try:
+            found = self._lookup(decision, fields)
+        except Exception as e:
+            logger.warning(f"Simulation cache lookup failed: {e}")
+            found = None
+        if found is None:
+            self.misses += 1
+            LOOKUPS.inc("miss")
+        elif found.partial:
+            self.partial_hits += 1
+            LOOKUPS.inc("partial")
+        else:
+            self.hits += 1
+            LOOKUPS.inc("hit")
+        return found
+
+    def _lookup(self, decision: str, fields: Dict[str, str]) -> Optional[CachedSimulation]:
+        now = time.time()
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT key, fields, result, themes, elapsed FROM simulations"
+                " WHERE decision = ? AND created_at > ? ORDER BY last_used DESC LIMIT ?",
+                (decision, now - self.ttl, MAX_CANDIDATES),
+            ).fetchall()
+        best = None
+        for key, stored_fields, result, themes, elapsed in rows:
+            stored = json.loads(stored_fields)
+            changed = {name for name in set(stored) | set(fields) if stored.get(name) != fields.get(name)}
+            if best is None or len(changed) < len(best[1]):
+                best = (key, changed, result, themes, elapsed)
+            if not changed:
+                break
+        if best is None:
+            return None
+        key, changed, result, themes, elapsed = best
+        result = json.loads(result)
+        refresh = None
+        if changed:
+            if len(changed) > MAX_CHANGED_SHARE * max(len(fields), 1):
+                return None
+            refresh = affected_paths(result, changed)
+            if refresh is None:
+                return None
+        with self._lock:
+            self._db.execute("UPDATE simulations SET last_used = ? WHERE key = ?", (now, key))
+        return CachedSimulation(result, json.loads(themes), elapsed, changed, refresh)
+
+    def store(
+        self,
+        decision_query: str,
+        fields: Dict[str, str],
+        scope: Dict[str, Any],
+        result: Dict[str, Any],
+        themes: List[Dict[str, Any]],
+        elapsed: float,
+    ):
+        """Store a finished simulation. ``elapsed`` is what a full simulation of it took."""
+        decision = self.decision_key(decision_query, scope)
+        key = _hash({"decision": decision, "fields": fields})
+        now = time.time()
+        try:
+            with self._lock:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO simulations"
+                    " (key, decision, fields, result, themes, elapsed, created_at, last_used)"
+                    " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (key, decision, json.dumps(fields), json.dumps(result), json.dumps(themes), elapsed, now, now),
+                )
+                self._writes += 1
+                if self._writes % self.EVICT_EVERY == 1:
+                    self._db.execute("DELETE FROM simulations WHERE created_at <= ?", (now - self.ttl,))
+                    self._db.execute(
+                        "DELETE FROM simulations WHERE key NOT IN"
+                        " (SELECT key FROM simulations ORDER BY last_used DESC LIMIT ?)",
+                        (self.max_entries,),
+                    )
+        except Exception as e:
+            logger.warning(f"Simulation cache write failed: {e}")
+
+    def record_saved(self, seconds: float):
+        """Count ``seconds`` of simulation time saved by a hit or partial hit."""
+        if seconds > 0:
+            self.seconds_saved += seconds
+            SECONDS_SAVED.inc(amount=seconds)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            entries = self._db.execute("SELECT COUNT(*) FROM simulations").fetchone()[0]
+        lookups = self.hits + self.partial_hits + self.misses
+        return {
+            "path": self.path,
+            "entries": entries,
+            "maxEntries": self.max_entries,
+            "hits": self.hits,
+            "partialHits": self.partial_hits,
+            "misses": self.misses,
+            "hitRate": round(self.hits / lookups, 4) if lookups else None,
+            "partialHitRate": round(self.partial_hits / lookups, 4) if lookups else None,
+            "secondsSaved": round(self.seconds_saved, 2),
+        }
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+_cache: Optional[SimulationCache] = None
+_cache_pid: Optional[int] = None
+_cache_lock = threading.Lock()
+
+
+def get_cache() -> Optional[SimulationCache]:
+    """This process's cache, opened on first use; None when it is off or bypassed."""
+    global _cache, _cache_pid
+    if llm_cache.bypassed():
+        return None
+    # A connection must not cross a fork, so a forked worker opens its own.
+    if _cache_pid != os.getpid():
+        with _cache_lock:
+            if _cache_pid != os.getpid():
+                try:
+                    _cache = SimulationCache.from_env()
+                except Exception as e:
+                    logger.warning(f"Simulation cache unavailable: {e}")
+                    _cache = None
+                _cache_pid = os.getpid()
+    return _cache
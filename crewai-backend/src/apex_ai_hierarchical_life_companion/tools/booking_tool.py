@@ -4,6 +4,8 @@ from pydantic import BaseModel, Field
 import requests
 import os
 
+from ..deadlines import tool_timeout
+
 
 class BookingSearchInput(BaseModel):
     """Input schema for Booking.com hotel search."""
@@ -80,7 +82,7 @@ class BookingTool(BaseTool):
             if min_rating:
                 params["filter_by_currency"] = f"review_score={min_rating}"
             
-            response = requests.get(url, headers=headers, params=params, timeout=30)
+            response = requests.get(url, headers=headers, params=params, timeout=tool_timeout(30))
             response.raise_for_status()
             data = response.json()
             
@@ -9,6 +9,16 @@ import os
 from datetime import datetime, timedelta
 from googleapiclient.discovery import build
 from google.oauth2.credentials import Credentials
+import httplib2
+from google_auth_httplib2 import AuthorizedHttp
+
+from ..deadlines import tool_timeout
+
+
+def _execute(request):
+    """Run a Google API request with an HTTP timeout that fits the current deadline."""
+    http = AuthorizedHttp(request.http.credentials, http=httplib2.Http(timeout=tool_timeout(30)))
+    return request.execute(http=http)
 
 class CalendarTool(BaseTool):
     name: str = "CalendarTool"
@@ -79,14 +89,14 @@ class CalendarTool(BaseTool):
             if not time_min:
                 time_min = datetime.utcnow().isoformat() + 'Z'
             
-            events_result = service.events().list(
+            events_result = _execute(service.events().list(
                 calendarId='primary',
                 timeMin=time_min,
                 timeMax=time_max,
                 maxResults=max_results,
                 singleEvents=True,
                 orderBy='startTime'
-            ).execute()
+            ))
             
             events = events_result.get('items', [])
             
@@ -116,7 +126,7 @@ class CalendarTool(BaseTool):
     def _get_event(self, service, event_id: str) -> str:
         """Get details of a specific event"""
         try:
-            event = service.events().get(calendarId='primary', eventId=event_id).execute()
+            event = _execute(service.events().get(calendarId='primary', eventId=event_id))
             
             summary = event.get('summary', 'No title')
             start = event['start'].get('dateTime', event['start'].get('date'))
@@ -164,7 +174,7 @@ class CalendarTool(BaseTool):
             if attendees:
                 event['attendees'] = [{'email': email} for email in attendees]
             
-            created_event = service.events().insert(calendarId='primary', body=event).execute()
+            created_event = _execute(service.events().insert(calendarId='primary', body=event))
             
             return f"Event created successfully!\nEvent ID: {created_event['id']}\nLink: {created_event.get('htmlLink', 'N/A')}"
             
@@ -174,7 +184,7 @@ class CalendarTool(BaseTool):
     def _update_event(self, service, event_id: str, **updates) -> str:
         """Update an existing event"""
         try:
-            event = service.events().get(calendarId='primary', eventId=event_id).execute()
+            event = _execute(service.events().get(calendarId='primary', eventId=event_id))
             
             # Update fields
             if 'summary' in updates:
@@ -188,7 +198,7 @@ class CalendarTool(BaseTool):
             if 'location' in updates:
                 event['location'] = updates['location']
             
-            updated_event = service.events().update(calendarId='primary', eventId=event_id, body=event).execute()
+            updated_event = _execute(service.events().update(calendarId='primary', eventId=event_id, body=event))
             
             return f"Event updated successfully!\nEvent ID: {updated_event['id']}"
             
@@ -198,7 +208,7 @@ class CalendarTool(BaseTool):
     def _delete_event(self, service, event_id: str) -> str:
         """Delete an event"""
         try:
-            service.events().delete(calendarId='primary', eventId=event_id).execute()
+            _execute(service.events().delete(calendarId='primary', eventId=event_id))
             return f"Event {event_id} deleted successfully."
             
         except Exception as e:
@@ -6,6 +6,16 @@ from email.mime.text import MIMEText
 from google.oauth2.credentials import Credentials
 from googleapiclient.discovery import build
 from googleapiclient.errors import HttpError
+import httplib2
+from google_auth_httplib2 import AuthorizedHttp
+
+from ..deadlines import tool_timeout
+
+
+def _execute(request):
+    """Run a Google API request with an HTTP timeout that fits the current deadline."""
+    http = AuthorizedHttp(request.http.credentials, http=httplib2.Http(timeout=tool_timeout(30)))
+    return request.execute(http=http)
 
 
 class EmailTool(BaseTool):
@@ -24,8 +34,8 @@ class EmailTool(BaseTool):
     def __init__(self, user_id: Optional[str] = None):
         super().__init__()
         self.user_id = user_id or "me"
+        # Built on first use, so constructing a crew makes no Google API calls
         self.service = None
-        self._initialize_service()
 
     def _initialize_service(self):
         """Initialize the Gmail API service with OAuth credentials."""
@@ -80,6 +90,8 @@ class EmailTool(BaseTool):
             to: Recipient email address (for send_email)
             subject: Email subject (for send_email)
         """
+        if not self.service:
+            self._initialize_service()
         if not self.service:
             return "Error: Gmail service not initialized. Please check OAuth credentials."
         
@@ -110,11 +122,11 @@ class EmailTool(BaseTool):
         """
         try:
             # Search for messages
-            results = self.service.users().messages().list(
+            results = _execute(self.service.users().messages().list(
                 userId=self.user_id,
                 q=query,
                 maxResults=max_results
-            ).execute()
+            ))
             
             messages = results.get('messages', [])
             
@@ -124,12 +136,12 @@ class EmailTool(BaseTool):
             # Fetch details for each message
             email_list = []
             for msg in messages:
-                msg_data = self.service.users().messages().get(
+                msg_data = _execute(self.service.users().messages().get(
                     userId=self.user_id,
                     id=msg['id'],
                     format='metadata',
                     metadataHeaders=['From', 'Subject', 'Date']
-                ).execute()
+                ))
                 
                 headers = msg_data.get('payload', {}).get('headers', [])
                 from_header = next((h['value'] for h in headers if h['name'] == 'From'), 'Unknown')
@@ -164,11 +176,11 @@ class EmailTool(BaseTool):
         """
         try:
             # Get the thread
-            thread = self.service.users().threads().get(
+            thread = _execute(self.service.users().threads().get(
                 userId=self.user_id,
                 id=thread_id,
                 format='full'
-            ).execute()
+            ))
             
             messages = thread.get('messages', [])
             
@@ -217,12 +229,12 @@ class EmailTool(BaseTool):
         """
         try:
             # Get the thread to find the latest message
-            thread = self.service.users().threads().get(
+            thread = _execute(self.service.users().threads().get(
                 userId=self.user_id,
                 id=thread_id,
                 format='metadata',
                 metadataHeaders=['From', 'Subject', 'Message-ID']
-            ).execute()
+            ))
             
             messages = thread.get('messages', [])
             if not messages:
@@ -257,7 +269,7 @@ class EmailTool(BaseTool):
             raw_message = base64.urlsafe_b64encode(message.as_bytes()).decode('utf-8')
             
             # Create the draft
-            draft = self.service.users().drafts().create(
+            draft = _execute(self.service.users().drafts().create(
                 userId=self.user_id,
                 body={
                     'message': {
@@ -265,7 +277,7 @@ class EmailTool(BaseTool):
                         'threadId': thread_id
                     }
                 }
-            ).execute()
+            ))
             
             draft_id = draft.get('id')
             return f"Successfully created draft reply in thread {thread_id}\nDraft ID: {draft_id}"
@@ -295,10 +307,10 @@ class EmailTool(BaseTool):
             raw_message = base64.urlsafe_b64encode(message.as_bytes()).decode('utf-8')
             
             # Send the message
-            sent_message = self.service.users().messages().send(
+            sent_message = _execute(self.service.users().messages().send(
                 userId=self.user_id,
                 body={'raw': raw_message}
-            ).execute()
+            ))
             
             message_id = sent_message.get('id')
             return f"Successfully sent email to {to}\nSubject: {subject}\nMessage ID: {message_id}"
@@ -4,6 +4,8 @@ from pydantic import BaseModel, Field
 import os
 import requests
 
+from ..deadlines import tool_timeout
+
 
 class LinkedInToolInput(BaseModel):
     """Input schema for LinkedInTool."""
@@ -49,7 +51,8 @@ class LinkedInTool(BaseTool):
                 response = requests.get(
                     f"{base_url}/me",
                     headers=headers,
-                    params={"projection": "(id,firstName,lastName,headline,positions,skills)"}
+                    params={"projection": "(id,firstName,lastName,headline,positions,skills)"},
+                    timeout=tool_timeout(30)
                 )
                 response.raise_for_status()
                 profile = response.json()
@@ -71,7 +74,8 @@ LinkedIn Profile Analysis:
                     params={
                         "keywords": query,
                         "count": 10
-                    }
+                    },
+                    timeout=tool_timeout(30)
                 )
                 response.raise_for_status()
                 jobs = response.json().get('elements', [])
@@ -87,7 +91,8 @@ LinkedIn Profile Analysis:
                 response = requests.get(
                     f"{base_url}/connections",
                     headers=headers,
-                    params={"count": 50}
+                    params={"count": 50},
+                    timeout=tool_timeout(30)
                 )
                 response.raise_for_status()
                 connections = response.json().get('elements', [])
@@ -116,7 +121,8 @@ Network Analysis:
                 response = requests.get(
                     f"{base_url}/jobSearch",
                     headers=headers,
-                    params={"keywords": query, "count": 5}
+                    params={"keywords": query, "count": 5},
+                    timeout=tool_timeout(30)
                 )
                 response.raise_for_status()
                 jobs = response.json().get('elements', [])
@@ -131,7 +137,8 @@ Network Analysis:
                 profile_response = requests.get(
                     f"{base_url}/me",
                     headers=headers,
-                    params={"projection": "(skills)"}
+                    params={"projection": "(skills)"},
+                    timeout=tool_timeout(30)
                 )
                 profile_response.raise_for_status()
                 user_skills = set([s.get('name', '') for s in profile_response.json().get('skills', {}).get('values', [])])
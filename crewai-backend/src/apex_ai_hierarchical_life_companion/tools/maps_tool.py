@@ -4,6 +4,8 @@ from pydantic import BaseModel, Field
 import os
 import requests
 
+from ..deadlines import tool_timeout
+
 
 class MapsTravelInput(BaseModel):
     """Input schema for MapsTool."""
@@ -50,7 +52,7 @@ class MapsTool(BaseTool):
         }
         
         try:
-            response = requests.get(url, params=params)
+            response = requests.get(url, params=params, timeout=tool_timeout(30))
             response.raise_for_status()
             data = response.json()
             
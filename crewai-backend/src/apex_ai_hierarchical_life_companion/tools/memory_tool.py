@@ -4,7 +4,11 @@ import json
 import os
 from datetime import datetime
 import numpy as np
-from openai import OpenAI
+
+from .. import llm_gateway
+from ..compaction import count_tokens
+
+EMBEDDING_MODEL = "text-embedding-3-small"
 
 class MemoryTool(BaseTool):
     name: str = "MemoryTool"
@@ -21,7 +25,8 @@ class MemoryTool(BaseTool):
 
     def __init__(self):
         super().__init__()
-        self.client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+        # Created on first embedding request
+        self.client = None
         self.memory_file = "data/memories.json"
         self.embeddings_file = "data/embeddings.npy"
         self._ensure_data_dir()
@@ -54,10 +59,14 @@ class MemoryTool(BaseTool):
         np.save(self.embeddings_file, self.embeddings)
 
     def _get_embedding(self, text: str) -> List[float]:
-        """Generate embedding using OpenAI API"""
-        response = self.client.embeddings.create(
-            model="text-embedding-3-small",
-            input=text
+        """Generate embedding using OpenAI API, through the shared LLM gateway"""
+        if self.client is None:
+            self.client = llm_gateway.openai_client()
+        response = llm_gateway.get_gateway().run(
+            EMBEDDING_MODEL,
+            lambda: self.client.embeddings.create(model=EMBEDDING_MODEL, input=text),
+            prompt_tokens=count_tokens(text),
+            max_tokens=0,
         )
         return response.data[0].embedding
 
@@ -4,6 +4,8 @@ import os
 import requests
 from datetime import datetime
 
+from ..deadlines import tool_timeout
+
 
 class NotionTool(BaseTool):
     name: str = "NotionTool"
@@ -80,7 +82,7 @@ class NotionTool(BaseTool):
                 }
             }
         
-        response = requests.post(url, headers=self.headers, json=payload)
+        response = requests.post(url, headers=self.headers, json=payload, timeout=tool_timeout(30))
         response.raise_for_status()
         
         data = response.json()
@@ -103,13 +105,13 @@ class NotionTool(BaseTool):
         """Read the full content of a Notion page."""
         # Get page properties
         page_url = f"{self.base_url}/pages/{page_id}"
-        page_response = requests.get(page_url, headers=self.headers)
+        page_response = requests.get(page_url, headers=self.headers, timeout=tool_timeout(30))
         page_response.raise_for_status()
         page_data = page_response.json()
         
         # Get page blocks (content)
         blocks_url = f"{self.base_url}/blocks/{page_id}/children"
-        blocks_response = requests.get(blocks_url, headers=self.headers)
+        blocks_response = requests.get(blocks_url, headers=self.headers, timeout=tool_timeout(30))
         blocks_response.raise_for_status()
         blocks_data = blocks_response.json()
         
@@ -184,7 +186,7 @@ class NotionTool(BaseTool):
             children = self._markdown_to_blocks(content)
             payload["children"] = children
         
-        response = requests.post(url, headers=self.headers, json=payload)
+        response = requests.post(url, headers=self.headers, json=payload, timeout=tool_timeout(30))
         response.raise_for_status()
         
         data = response.json()
@@ -211,7 +213,7 @@ class NotionTool(BaseTool):
         
         payload = {"properties": formatted_properties}
         
-        response = requests.patch(url, headers=self.headers, json=payload)
+        response = requests.patch(url, headers=self.headers, json=payload, timeout=tool_timeout(30))
         response.raise_for_status()
         
         return f"Successfully updated page {page_id} with properties: {list(properties.keys())}"
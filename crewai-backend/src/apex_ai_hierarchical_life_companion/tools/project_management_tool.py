@@ -4,6 +4,8 @@ from pydantic import BaseModel, Field
 import os
 import requests
 
+from ..deadlines import tool_timeout
+
 
 class ProjectManagementToolInput(BaseModel):
     """Input schema for ProjectManagementTool."""
@@ -67,7 +69,7 @@ class ProjectManagementTool(BaseTool):
         
         try:
             if action == "list_projects":
-                response = requests.get(f"{base_url}/workspaces", headers=headers)
+                response = requests.get(f"{base_url}/workspaces", headers=headers, timeout=tool_timeout(30))
                 response.raise_for_status()
                 workspaces = response.json().get('data', [])
                 
@@ -78,7 +80,8 @@ class ProjectManagementTool(BaseTool):
                 projects_response = requests.get(
                     f"{base_url}/projects",
                     headers=headers,
-                    params={"workspace": workspace_id}
+                    params={"workspace": workspace_id},
+                    timeout=tool_timeout(30)
                 )
                 projects_response.raise_for_status()
                 projects = projects_response.json().get('data', [])
@@ -93,7 +96,8 @@ class ProjectManagementTool(BaseTool):
                 response = requests.get(
                     f"{base_url}/tasks",
                     headers=headers,
-                    params={"project": project_id, "opt_fields": "name,completed,due_on"}
+                    params={"project": project_id, "opt_fields": "name,completed,due_on"},
+                    timeout=tool_timeout(30)
                 )
                 response.raise_for_status()
                 tasks = response.json().get('data', [])
@@ -120,7 +124,7 @@ Project Tasks (Completion: {completed}/{total}):
                     }
                 }
                 
-                response = requests.post(f"{base_url}/tasks", headers=headers, json=data)
+                response = requests.post(f"{base_url}/tasks", headers=headers, json=data, timeout=tool_timeout(30))
                 response.raise_for_status()
                 task = response.json().get('data', {})
                 
@@ -128,7 +132,7 @@ Project Tasks (Completion: {completed}/{total}):
             
             elif action == "get_productivity_stats":
                 # Get all tasks across projects
-                response = requests.get(f"{base_url}/workspaces", headers=headers)
+                response = requests.get(f"{base_url}/workspaces", headers=headers, timeout=tool_timeout(30))
                 response.raise_for_status()
                 workspaces = response.json().get('data', [])
                 
@@ -139,7 +143,8 @@ Project Tasks (Completion: {completed}/{total}):
                 tasks_response = requests.get(
                     f"{base_url}/tasks",
                     headers=headers,
-                    params={"workspace": workspace_id, "assignee": "me", "opt_fields": "completed,completed_at"}
+                    params={"workspace": workspace_id, "assignee": "me", "opt_fields": "completed,completed_at"},
+                    timeout=tool_timeout(30)
                 )
                 tasks_response.raise_for_status()
                 tasks = tasks_response.json().get('data', [])
@@ -177,7 +182,7 @@ Productivity Statistics:
         
         try:
             if action == "list_projects":
-                response = requests.get(f"{base_url}/members/me/boards", params=auth_params)
+                response = requests.get(f"{base_url}/members/me/boards", params=auth_params, timeout=tool_timeout(30))
                 response.raise_for_status()
                 boards = response.json()
                 
@@ -188,7 +193,7 @@ Productivity Statistics:
                 if not project_id:
                     return "Error: project_id (board_id) required for list_tasks action"
                 
-                response = requests.get(f"{base_url}/boards/{project_id}/cards", params=auth_params)
+                response = requests.get(f"{base_url}/boards/{project_id}/cards", params=auth_params, timeout=tool_timeout(30))
                 response.raise_for_status()
                 cards = response.json()
                 
@@ -200,7 +205,7 @@ Productivity Statistics:
                     return "Error: project_id (board_id) and task_name required"
                 
                 # Get first list on the board
-                lists_response = requests.get(f"{base_url}/boards/{project_id}/lists", params=auth_params)
+                lists_response = requests.get(f"{base_url}/boards/{project_id}/lists", params=auth_params, timeout=tool_timeout(30))
                 lists_response.raise_for_status()
                 lists = lists_response.json()
                 
@@ -216,7 +221,7 @@ Productivity Statistics:
                     "idList": list_id
                 }
                 
-                response = requests.post(f"{base_url}/cards", params=card_data)
+                response = requests.post(f"{base_url}/cards", params=card_data, timeout=tool_timeout(30))
                 response.raise_for_status()
                 card = response.json()
                 
@@ -244,7 +249,7 @@ Productivity Statistics:
         
         try:
             if action == "list_projects":
-                response = requests.get(f"{jira_url}/rest/api/3/project", auth=auth, headers=headers)
+                response = requests.get(f"{jira_url}/rest/api/3/project", auth=auth, headers=headers, timeout=tool_timeout(30))
                 response.raise_for_status()
                 projects = response.json()
                 
@@ -260,7 +265,8 @@ Productivity Statistics:
                     f"{jira_url}/rest/api/3/search",
                     auth=auth,
                     headers=headers,
-                    params={"jql": jql, "maxResults": 20}
+                    params={"jql": jql, "maxResults": 20},
+                    timeout=tool_timeout(30)
                 )
                 response.raise_for_status()
                 issues = response.json().get('issues', [])
@@ -294,7 +300,8 @@ Productivity Statistics:
                     f"{jira_url}/rest/api/3/issue",
                     auth=auth,
                     headers=headers,
-                    json=issue_data
+                    json=issue_data,
+                    timeout=tool_timeout(30)
                 )
                 response.raise_for_status()
                 issue = response.json()
@@ -4,13 +4,195 @@ SimulationTool - The Predictive Engine for Life Simulations
 This tool uses advanced LLM capabilities to simulate probable future outcomes
 based on comprehensive user context. It doesn't call external APIs but leverages
 the core LLM to generate structured predictions about life decisions.
+
+Simulations go through the shared LLM cache, so re-running the same decision
+with the same context returns the stored simulation without an API call. Calls
+that do reach the API go through the LLM gateway's shared client and rate limits.
+
+In parallel mode (the default; ``APEX_SIMULATION_PARALLEL=0`` turns it off) a
+short planning call first assigns each Echo Path a distinct theme and a first
+probability. The paths are then written by concurrent completions instead of
+one long one, so latency no longer grows with the number of paths. Each path is
+passed to ``path_listener`` as soon as it is written, which lets the API stream
+it to the client. The merged result has the same JSON structure as a
+single-call simulation, with probabilities normalized to sum to 100.
+
+When the user's finances are known, from the ``financial_*`` tables for
+``user_id`` or from ``financial_profile``, a Monte Carlo projection (see
+projection) runs first, with and without the decision's ``decision_impact``.
+Its outcome distribution is given to the LLM as grounded numbers and returned
+as ``financial_projection``.
+
+Finished simulations are kept in the simulation cache (see simulation_cache),
+keyed on the normalized decision and the fields of the user context. A repeat
+is served from it, and when only some fields changed, only the Echo Paths those
+fields affect are written again; the result then says which in
+``simulation_cache``.
 """
 
 from crewai_tools import BaseTool
-from typing import Optional, Dict, Any
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Optional, Dict, Any, Callable, Iterable, List, Tuple
+import contextvars
 import json
+import logging
 import os
-from openai import OpenAI
+import time
+
+from .. import llm_cache, llm_gateway, projection, simulation_cache
+from ..compaction import count_tokens
+
+logger = logging.getLogger(__name__)
+
+SIMULATION_MODEL = "gpt-4o"
+MAX_PATHS = 5
+PARALLEL = os.getenv("APEX_SIMULATION_PARALLEL", "1").lower() not in ("0", "false", "no")
+
+SYSTEM_PROMPT = "You are the Apex Predictive Intelligence Core. You generate structured, realistic life simulations based on comprehensive user data."
+
+PLAN_PROMPT = """You are the Apex Predictive Intelligence Core, planning a simulation of probable future outcomes.
+
+DECISION TO SIMULATE:
+{decision_query}
+
+COMPREHENSIVE USER CONTEXT:
+{user_context}
+
+YOUR MISSION:
+Plan {num_paths} distinct, probable future paths ("Echo Paths") that could result from this decision. The paths will be written out separately, so make their themes clearly different: together they should cover the realistic range of outcomes, positive and negative, including unintended consequences.
+
+For each path, provide:
+1. **title**: A compelling 3-5 word name for this path
+2. **theme**: One or two sentences on what happens on this path and what drives it
+3. **probability**: A realistic probability percentage (0-100) based on the user's context
+
+Probabilities should add up to approximately 100%. Where the context includes a MONTE CARLO FINANCIAL PROJECTION, ground them in its figures.
+
+Return a valid JSON object with this exact structure:
+{{
+    "decision": "The decision being simulated",
+    "paths": [
+        {{"title": "Path name", "theme": "What happens and why", "probability": 45}},
+        ...
+    ],
+    "recommendation": "A brief strategic recommendation weighing these paths",
+    "confidence_level": "High/Medium/Low - your confidence in these predictions"
+}}"""
+
+PATH_PROMPT = """You are the Apex Predictive Intelligence Core, writing one Echo Path of a life simulation.
+
+DECISION TO SIMULATE:
+{decision_query}
+
+COMPREHENSIVE USER CONTEXT:
+{user_context}
+
+THE PLANNED ECHO PATHS:
+{plan}
+
+YOUR MISSION:
+Write out Echo Path {number}, "{title}": {theme}
+Stay within this path's theme; the other paths are written separately.
+
+Provide:
+1. **title**: The path's name
+2. **probability**: A realistic probability percentage (0-100); the plan estimated {probability}
+3. **narrative**: A 2-3 paragraph story describing how this path unfolds over the next 6-12 months
+4. **key_impacts**: A list of 4-6 specific impacts across different life domains (financial, career, relationships, health, personal growth, time)
+
+Be realistic and grounded in the user's actual situation, account for second-order effects, and include concrete numbers and timelines where relevant. Where the context includes a MONTE CARLO FINANCIAL PROJECTION, use its figures for financial impacts.
+
+Return a valid JSON object with this exact structure:
+{{
+    "title": "Path name",
+    "probability": 45,
+    "narrative": "Detailed narrative...",
+    "key_impacts": [
+        {{"domain": "Financial", "impact": "Specific impact description"}},
+        ...
+    ]
+}}"""
+
+
+def normalize_probabilities(paths: List[Dict[str, Any]]) -> None:
+    """Scale the paths' probabilities to whole percentages summing to 100 (largest remainder)."""
+    weights = []
+    for path in paths:
+        try:
+            weights.append(max(float(path.get("probability") or 0), 0.0))
+        except (TypeError, ValueError):
+            weights.append(0.0)
+    total = sum(weights)
+    if total <= 0:
+        weights, total = [1.0] * len(paths), float(len(paths))
+    shares = [weight * 100 / total for weight in weights]
+    rounded = [int(share) for share in shares]
+    by_remainder = sorted(range(len(paths)), key=lambda i: shares[i] - rounded[i], reverse=True)
+    for i in by_remainder[:100 - sum(rounded)]:
+        rounded[i] += 1
+    for path, probability in zip(paths, rounded):
+        path["probability"] = probability
+
+
+def _complete(params: Dict[str, Any]) -> Dict[str, Any]:
+    """The parsed JSON completion for ``params``, from the LLM cache or through the gateway."""
+    cache = llm_cache.get_cache()
+    cached_result = cache.get(params) if cache is not None else None
+    result = cached_result
+    if result is None:
+        client = llm_gateway.openai_client()
+        response = llm_gateway.get_gateway().run(
+            params["model"],
+            lambda: client.chat.completions.create(**params),
+            prompt_tokens=sum(count_tokens(message["content"]) for message in params["messages"]),
+            max_tokens=params["max_tokens"],
+            completion_tokens=lambda reply: count_tokens(reply.choices[0].message.content or ""),
+        )
+        result = response.choices[0].message.content
+    parsed = json.loads(result)
+    # Only well-formed simulations are cached
+    if cache is not None and cached_result is None:
+        cache.put(params, result)
+    return parsed
+
+
+def _financial_profile(
+    user_id: Optional[str], figures: Optional[Dict[str, Any]]
+) -> Optional[projection.FinancialProfile]:
+    """The user's stored finances with ``figures`` applied, or None when nothing is known about them."""
+    profile = projection.load_financial_profile(user_id) if user_id else None
+    if profile is None and not figures:
+        return None
+    profile = (profile or projection.FinancialProfile()).updated(figures)
+    if not (profile.net_worth or profile.monthly_income or profile.monthly_expenses):
+        return None
+    return profile
+
+
+def _financial_projection(
+    profile: Optional[projection.FinancialProfile], impact: Optional[Dict[str, Any]]
+) -> Optional[Dict[str, Any]]:
+    """The projection report for ``profile``, or None without one."""
+    if profile is None:
+        return None
+    try:
+        return projection.compare(profile, projection.Decision.from_dict(impact))
+    except Exception as e:
+        logger.warning(f"Financial projection failed: {e}")
+        return None
+
+
+def _params(prompt: str, max_tokens: int) -> Dict[str, Any]:
+    return {
+        "model": SIMULATION_MODEL,
+        "messages": [
+            {"role": "system", "content": SYSTEM_PROMPT},
+            {"role": "user", "content": prompt},
+        ],
+        "temperature": 0.7,
+        "max_tokens": max_tokens,
+        "response_format": {"type": "json_object"},
+    }
 
 
 class SimulationTool(BaseTool):
@@ -19,14 +201,24 @@ class SimulationTool(BaseTool):
         "Simulates probable future outcomes of major life decisions by analyzing "
         "comprehensive user context (finances, goals, time, energy, habits, etc.). "
         "Returns 3-5 structured 'Echo Paths' with probabilities, narratives, and key impacts. "
-        "Use this when the user asks 'what if' questions about major life decisions."
+        "Use this when the user asks 'what if' questions about major life decisions. "
+        "Pass user_id, and financial_profile with any known figures (cash, invested, monthly_income, "
+        "monthly_expenses, annual_return, ...), to ground the simulation in a Monte Carlo projection; "
+        "describe the decision's financial effect in decision_impact (start_month, income_change as a "
+        "fraction, income_gap_months, expense_change per month, one_off_cost)."
     )
+    parallel: bool = PARALLEL
+    # Called with (index, path) as each Echo Path is written in parallel mode; set for one run by the API
+    path_listener: Optional[Callable[[int, Dict[str, Any]], None]] = None
 
     def _run(
         self,
         decision_query: str,
         user_context: str,
-        num_paths: int = 3
+        num_paths: int = 3,
+        user_id: Optional[str] = None,
+        financial_profile: Optional[Dict[str, Any]] = None,
+        decision_impact: Optional[Dict[str, Any]] = None
     ) -> str:
         """
         Run a life simulation based on a decision query and comprehensive user context.
@@ -35,23 +227,83 @@ class SimulationTool(BaseTool):
             decision_query: The decision or question to simulate (e.g., "What if I quit my job to start a business?")
             user_context: Comprehensive context about the user's current life state (finances, goals, time, energy, etc.)
             num_paths: Number of probable future paths to generate (default: 3, max: 5)
+            user_id: User whose financial_* records seed the Monte Carlo projection
+            financial_profile: Known financial figures, overriding the stored ones (see projection.FinancialProfile)
+            decision_impact: The decision's financial effect (see projection.Decision)
         
         Returns:
             A JSON string containing structured simulation results with multiple Echo Paths
         """
         try:
-            # Initialize OpenAI client
-            api_key = os.getenv("OPENAI_API_KEY")
-            if not api_key:
+            if not os.getenv("OPENAI_API_KEY"):
                 return json.dumps({
                     "error": "OpenAI API key not configured",
                     "message": "Please set OPENAI_API_KEY in your environment variables"
                 })
+            num_paths = max(1, min(int(num_paths), MAX_PATHS))
+            started = time.perf_counter()
+            cache = simulation_cache.get_cache()
+            profile = _financial_profile(user_id, financial_profile)
+            # Keyed on the user and on the finances the projection uses, stored or passed in, so
+            # one user's paths are never served to another or kept once their finances change
+            fields = simulation_cache.context_fields(
+                user_context,
+                financial_profile=profile.to_dict() if profile is not None else None,
+                decision_impact=decision_impact,
+            )
+            scope = {"model": SIMULATION_MODEL, "num_paths": num_paths, "user_id": user_id}
+            cached = cache.lookup(decision_query, fields, scope) if cache is not None else None
+
+            financial_projection = _financial_projection(profile, decision_impact)
+            if financial_projection is not None:
+                user_context = (
+                    f"{user_context}\n\nMONTE CARLO FINANCIAL PROJECTION:\n{projection.describe(financial_projection)}"
+                )
+
+            if cached is not None and not cached.partial:
+                parsed_result = cached.result
+                if self.path_listener is not None:
+                    for index, path in enumerate(parsed_result.get("echo_paths") or []):
+                        self.path_listener(index, path)
+            else:
+                if cached is not None:
+                    parsed_result = self._refresh_paths(decision_query, user_context, cached)
+                    themes = cached.themes
+                elif self.parallel and num_paths > 1:
+                    parsed_result, themes = self._simulate_parallel(decision_query, user_context, num_paths)
+                else:
+                    parsed_result, themes = self._simulate_single(decision_query, user_context, num_paths)
+                if cache is not None and parsed_result.get("echo_paths"):
+                    # A refreshed entry keeps the cost of the full simulation it stands in for
+                    elapsed = cached.elapsed if cached is not None else time.perf_counter() - started
+                    cache.store(decision_query, fields, scope, parsed_result, themes, elapsed)
+
+            if cached is not None:
+                cache.record_saved(cached.elapsed - (time.perf_counter() - started))
+                status = {"result": "partial" if cached.partial else "hit"}
+                if cached.partial:
+                    status["refreshed_paths"] = [index + 1 for index in cached.refresh]
+                parsed_result = {**parsed_result, "simulation_cache": status}
+            if financial_projection is not None:
+                parsed_result = {**parsed_result, "financial_projection": financial_projection}
+            return json.dumps(parsed_result, indent=2)
             
-            client = OpenAI(api_key=api_key)
-            
-            # Construct the simulation prompt
-            simulation_prompt = f"""You are the Apex Predictive Intelligence Core, an advanced AI system capable of simulating probable future outcomes based on comprehensive life data.
+        except json.JSONDecodeError as e:
+            return json.dumps({
+                "error": "Failed to parse simulation results",
+                "message": f"JSON parsing error: {str(e)}"
+            })
+        except Exception as e:
+            return json.dumps({
+                "error": "Simulation failed",
+                "message": f"Error: {str(e)}"
+            })
+
+    def _simulate_single(
+        self, decision_query: str, user_context: str, num_paths: int
+    ) -> Tuple[Dict[str, Any], List[Dict[str, Any]]]:
+        """All Echo Paths in one completion, and a theme per path for later refreshes."""
+        simulation_prompt = f"""You are the Apex Predictive Intelligence Core, an advanced AI system capable of simulating probable future outcomes based on comprehensive life data.
 
 DECISION TO SIMULATE:
 {decision_query}
@@ -75,6 +327,7 @@ CRITICAL REQUIREMENTS:
 - Ensure probabilities add up to approximately 100%
 - Make narratives specific and actionable, not generic
 - Include concrete numbers and timelines where relevant
+- Where the context includes a MONTE CARLO FINANCIAL PROJECTION, ground financial impacts and probabilities in its figures
 
 Return your response as a valid JSON object with this exact structure:
 {{
@@ -96,42 +349,95 @@ Return your response as a valid JSON object with this exact structure:
     "confidence_level": "High/Medium/Low - your confidence in these predictions"
 }}"""
 
-            # Call GPT-4o for simulation
-            response = client.chat.completions.create(
-                model="gpt-4o",
-                messages=[
-                    {
-                        "role": "system",
-                        "content": "You are the Apex Predictive Intelligence Core. You generate structured, realistic life simulations based on comprehensive user data."
-                    },
-                    {
-                        "role": "user",
-                        "content": simulation_prompt
-                    }
-                ],
-                temperature=0.7,
-                max_tokens=3000,
-                response_format={"type": "json_object"}
-            )
-            
-            # Extract and return the simulation results
-            simulation_result = response.choices[0].message.content
-            
-            # Validate JSON structure
-            parsed_result = json.loads(simulation_result)
-            
-            return json.dumps(parsed_result, indent=2)
-            
-        except json.JSONDecodeError as e:
-            return json.dumps({
-                "error": "Failed to parse simulation results",
-                "message": f"JSON parsing error: {str(e)}"
-            })
-        except Exception as e:
-            return json.dumps({
-                "error": "Simulation failed",
-                "message": f"Error: {str(e)}"
-            })
+        # Call GPT-4o for simulation
+        result = _complete(_params(simulation_prompt, 3000))
+        result["echo_paths"] = [path for path in result.get("echo_paths") or [] if isinstance(path, dict)]
+        themes = [
+            {
+                "title": path.get("title"),
+                "theme": str(path.get("narrative") or "").split(". ")[0],
+                "probability": path.get("probability"),
+            }
+            for path in result["echo_paths"]
+        ]
+        return result, themes
+
+    def _simulate_parallel(
+        self, decision_query: str, user_context: str, num_paths: int
+    ) -> Tuple[Dict[str, Any], List[Dict[str, Any]]]:
+        """Plan the path themes in one call, then write every path concurrently and merge them."""
+        plan = _complete(_params(
+            PLAN_PROMPT.format(decision_query=decision_query, user_context=user_context, num_paths=num_paths), 800
+        ))
+        planned = [path for path in plan.get("paths") or [] if isinstance(path, dict)][:num_paths]
+        if not planned:
+            raise ValueError("Simulation plan contains no paths")
+        written = self._write_paths(decision_query, user_context, planned, range(len(planned)))
+        if not written:
+            raise ValueError("Every Echo Path failed")
+        kept = sorted(written)
+        echo_paths = [written[index] for index in kept]
+        normalize_probabilities(echo_paths)
+        result = {
+            "decision": plan.get("decision") or decision_query,
+            "echo_paths": echo_paths,
+            "recommendation": plan.get("recommendation", ""),
+            "confidence_level": plan.get("confidence_level", ""),
+        }
+        return result, [planned[index] for index in kept]
+
+    def _refresh_paths(self, decision_query: str, user_context: str, cached: Any) -> Dict[str, Any]:
+        """A cached simulation with the Echo Paths its changed context affects written again."""
+        paths = [dict(path) for path in cached.result["echo_paths"]]
+        listener = self.path_listener
+        if listener is not None:
+            for index, path in enumerate(paths):
+                if index not in cached.refresh:
+                    listener(index, path)
+        written = self._write_paths(decision_query, user_context, cached.themes, cached.refresh)
+        if not written:
+            raise ValueError("Every refreshed Echo Path failed")
+        # A path that fails to refresh keeps its previous version
+        for index, path in written.items():
+            paths[index] = path
+        normalize_probabilities(paths)
+        return {**cached.result, "echo_paths": paths}
+
+    def _write_paths(
+        self, decision_query: str, user_context: str, themes: List[Dict[str, Any]], indexes: Iterable[int]
+    ) -> Dict[int, Dict[str, Any]]:
+        """Write the Echo Paths at ``indexes`` of ``themes`` concurrently; failed paths are left out."""
+        outline = "\n".join(
+            f"{number}. {path.get('title')} ({path.get('probability')}%): {path.get('theme')}"
+            for number, path in enumerate(themes, 1)
+        )
+
+        def write(index: int) -> Dict[str, Any]:
+            path = themes[index]
+            return _complete(_params(PATH_PROMPT.format(
+                decision_query=decision_query, user_context=user_context, plan=outline, number=index + 1,
+                title=path.get("title"), theme=path.get("theme"), probability=path.get("probability"),
+            ), 1200))
+
+        indexes = list(indexes)
+        written: Dict[int, Dict[str, Any]] = {}
+        listener = self.path_listener
+        with ThreadPoolExecutor(max_workers=max(len(indexes), 1), thread_name_prefix="echo-path") as pool:
+            # Each thread runs in a copy of this context, so the request deadline and trace carry over
+            futures = {pool.submit(contextvars.copy_context().run, write, index): index for index in indexes}
+            for future in as_completed(futures):
+                index = futures[future]
+                try:
+                    path = future.result()
+                except Exception as e:
+                    logger.warning(f"Echo Path {index + 1} failed: {e}")
+                    continue
+                path.setdefault("title", themes[index].get("title"))
+                path.setdefault("probability", themes[index].get("probability"))
+                written[index] = path
+                if listener is not None:
+                    listener(index, path)
+        return written
 
 
 # Export the tool for use in CrewAI
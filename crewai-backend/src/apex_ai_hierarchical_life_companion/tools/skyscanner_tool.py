@@ -5,6 +5,8 @@ import requests
 import os
 from datetime import datetime
 
+from ..deadlines import tool_timeout
+
 
 class SkyscannerSearchInput(BaseModel):
     """Input schema for Skyscanner flight search."""
@@ -88,7 +90,7 @@ class SkyscannerTool(BaseTool):
                     "date": {"year": int(end_date[:4]), "month": int(end_date[5:7]), "day": int(end_date[8:10])}
                 })
             
-            response = requests.post(url, json=query, headers=headers, timeout=30)
+            response = requests.post(url, json=query, headers=headers, timeout=tool_timeout(30))
             response.raise_for_status()
             data = response.json()
             
@@ -4,6 +4,8 @@ from pydantic import BaseModel, Field
 import requests
 import os
 
+from ..deadlines import tool_timeout
+
 
 class ViatorSearchInput(BaseModel):
     """Input schema for Viator activity search."""
@@ -64,7 +66,7 @@ class ViatorTool(BaseTool):
             if interest_keywords:
                 params["searchTerm"] = " ".join(interest_keywords)
             
-            response = requests.get(url, headers=headers, params=params, timeout=30)
+            response = requests.get(url, headers=headers, params=params, timeout=tool_timeout(30))
             response.raise_for_status()
             data = response.json()
             
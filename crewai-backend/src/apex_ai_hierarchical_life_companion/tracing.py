@@ -0,0 +1,352 @@
+"""
+Lightweight request tracing.
+
+A sampled request gets a trace: a tree of spans for the HTTP request, the crew
+job and kickoff, every task, LLM call and tool call, and every outbound HTTP
+call made through ``requests`` or ``httplib2`` (which googleapiclient uses).
+When the last span of a trace ends, the trace is written to local disk by a
+background thread in two formats:
+- Chrome trace-event JSON, one file per trace (open in chrome://tracing or
+  https://ui.perfetto.dev);
+- OTLP/JSON, one ExportTraceServiceRequest per line, which the OpenTelemetry
+  Collector's file receiver and most tracing backends can import.
+
+Unsampled requests pay for one context-variable lookup per instrumented call.
+Sampling is probabilistic (``APEX_TRACE_SAMPLE``) and capped at
+``APEX_TRACE_MAX_PER_SEC`` traces per second; ``X-Apex-Trace: 1`` forces a
+trace for one request.
+
+The current span is a context variable. Code that hands work to another
+thread must carry the context over (JobManager and InstrumentedTask do).
+"""
+import json
+import logging
+import os
+import queue
+import random
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+SERVICE_NAME = "apex-ai-crewai-backend"
+
+SAMPLE_RATE = float(os.getenv("APEX_TRACE_SAMPLE", 0.01))
+MAX_TRACES_PER_SEC = float(os.getenv("APEX_TRACE_MAX_PER_SEC", 1))
+TRACE_DIR = os.getenv("APEX_TRACE_DIR", ".apex/traces")
+# Chrome trace files kept before the oldest are deleted
+MAX_TRACE_FILES = int(os.getenv("APEX_TRACE_MAX_FILES", 500))
+
+# OTLP span kinds
+KIND_INTERNAL = 1
+KIND_SERVER = 2
+KIND_CLIENT = 3
+
+_current: ContextVar[Optional["Span"]] = ContextVar("apex_span", default=None)
+
+
+class Trace:
+    """Spans of one sampled request; exported once no span is open."""
+
+    def __init__(self):
+        self.trace_id = f"{random.getrandbits(128):032x}"
+        self.spans: List["Span"] = []
+        self.open = 0
+        self._lock = threading.Lock()
+
+    def _opened(self, span: "Span"):
+        with self._lock:
+            self.spans.append(span)
+            self.open += 1
+
+    def _closed(self):
+        with self._lock:
+            self.open -= 1
+            finished = self.open == 0
+        if finished:
+            exporter.submit(self)
+
+
+class Span:
+    def __init__(
+        self,
+        trace: Trace,
+        name: str,
+        parent: Optional["Span"] = None,
+        kind: int = KIND_INTERNAL,
+        attributes: Optional[Dict[str, Any]] = None,
+    ):
+        self.trace = trace
+        self.name = name
+        self.span_id = f"{random.getrandbits(64):016x}"
+        self.parent_id = parent.span_id if parent is not None else None
+        self.kind = kind
+        self.attributes: Dict[str, Any] = dict(attributes or {})
+        self.thread_id = threading.get_ident()
+        self.start_ns = time.time_ns()
+        self.end_ns: Optional[int] = None
+        self.error: Optional[str] = None
+        trace._opened(self)
+
+    def set(self, key: str, value: Any):
+        self.attributes[key] = value
+
+    def end(self, error: Optional[BaseException] = None):
+        if self.end_ns is not None:
+            return
+        if error is not None:
+            self.error = f"{type(error).__name__}: {error}"
+        self.end_ns = time.time_ns()
+        self.trace._closed()
+
+
+class _Sampler:
+    """Probabilistic sampling with a traces-per-second cap (token bucket)."""
+
+    def __init__(self, rate: float, per_second: float):
+        self.rate = rate
+        self.per_second = per_second
+        self._tokens = per_second
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def sample(self) -> bool:
+        if self.rate <= 0 or random.random() >= self.rate:
+            return False
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.per_second, self._tokens + (now - self._updated) * self.per_second)
+            self._updated = now
+            if self._tokens < 1:
+                return False
+            self._tokens -= 1
+            return True
+
+
+sampler = _Sampler(SAMPLE_RATE, MAX_TRACES_PER_SEC)
+
+
+def current_span() -> Optional[Span]:
+    return _current.get()
+
+
+def start_root(name: str, force: bool = False, **attributes: Any) -> Optional[Span]:
+    """Start a new trace's root span if this request is sampled (or ``force``), else return None."""
+    if not (force or sampler.sample()):
+        return None
+    return Span(Trace(), name, kind=KIND_SERVER, attributes=attributes)
+
+
+def start_span(name: str, kind: int = KIND_INTERNAL, **attributes: Any) -> Optional[Span]:
+    """Start a child of the current span without making it current. None outside a trace."""
+    parent = _current.get()
+    if parent is None:
+        return None
+    return Span(parent.trace, name, parent, kind, attributes)
+
+
+@contextmanager
+def use_span(span: Optional[Span], end: bool = True) -> Iterator[Optional[Span]]:
+    """
+    Make ``span`` current for the block and end it afterwards, unless ``end`` is
+    False and the caller ends it. None is a no-op.
+    """
+    if span is None:
+        yield None
+        return
+    token = _current.set(span)
+    try:
+        yield span
+    except BaseException as e:
+        if end:
+            span.end(e)
+        raise
+    finally:
+        _current.reset(token)
+        if end:
+            span.end()
+
+
+@contextmanager
+def span(name: str, kind: int = KIND_INTERNAL, **attributes: Any) -> Iterator[Optional[Span]]:
+    """Trace the block as a child of the current span. A no-op outside a sampled trace."""
+    with use_span(start_span(name, kind, **attributes)) as child:
+        yield child
+
+
+def chrome_trace(trace: Trace) -> Dict[str, Any]:
+    """The trace as Chrome trace-event JSON (complete events, microsecond timestamps)."""
+    pid = os.getpid()
+    events = []
+    for s in trace.spans:
+        args = {**s.attributes, "span_id": s.span_id, "parent_id": s.parent_id}
+        if s.error:
+            args["error"] = s.error
+        events.append({
+            "name": s.name,
+            "cat": s.name.split(" ", 1)[0],
+            "ph": "X",
+            "ts": s.start_ns / 1000,
+            "dur": ((s.end_ns or s.start_ns) - s.start_ns) / 1000,
+            "pid": pid,
+            "tid": s.thread_id,
+            "args": args,
+        })
+    return {"traceEvents": events, "displayTimeUnit": "ms", "otherData": {"trace_id": trace.trace_id}}
+
+
+def _otlp_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def otlp_trace(trace: Trace) -> Dict[str, Any]:
+    """The trace as an OTLP/JSON ExportTraceServiceRequest."""
+    spans = []
+    for s in trace.spans:
+        span_json = {
+            "traceId": trace.trace_id,
+            "spanId": s.span_id,
+            "name": s.name,
+            "kind": s.kind,
+            "startTimeUnixNano": str(s.start_ns),
+            "endTimeUnixNano": str(s.end_ns or s.start_ns),
+            "attributes": [{"key": k, "value": _otlp_value(v)} for k, v in s.attributes.items()],
+            "status": {"code": 2, "message": s.error} if s.error else {"code": 1},
+        }
+        if s.parent_id:
+            span_json["parentSpanId"] = s.parent_id
+        spans.append(span_json)
+    return {
+        "resourceSpans": [{
+            "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": SERVICE_NAME}}]},
+            "scopeSpans": [{"scope": {"name": "apex_ai_hierarchical_life_companion.tracing"}, "spans": spans}],
+        }]
+    }
+
+
+class TraceExporter:
+    """Writes finished traces to ``directory`` on a background thread; drops traces if it falls behind."""
+
+    def __init__(self, directory: str = TRACE_DIR, max_files: int = MAX_TRACE_FILES, backlog: int = 100):
+        self.directory = directory
+        self.max_files = max_files
+        self.exported = 0
+        self.dropped = 0
+        self._queue: "queue.Queue[Trace]" = queue.Queue(maxsize=backlog)
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def submit(self, trace: Trace):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="trace-exporter", daemon=True)
+                self._thread.start()
+        try:
+            self._queue.put_nowait(trace)
+        except queue.Full:
+            self.dropped += 1
+
+    def _run(self):
+        while True:
+            trace = self._queue.get()
+            try:
+                self.write(trace)
+                self.exported += 1
+            except Exception as e:
+                logger.warning(f"Could not export trace {trace.trace_id}: {e}")
+
+    def write(self, trace: Trace):
+        os.makedirs(self.directory, exist_ok=True)
+        with open(os.path.join(self.directory, f"{trace.trace_id}.trace.json"), "w") as f:
+            json.dump(chrome_trace(trace), f, default=str)
+        day = datetime.now(timezone.utc).strftime("%Y%m%d")
+        with open(os.path.join(self.directory, f"otlp-{day}.jsonl"), "a") as f:
+            f.write(json.dumps(otlp_trace(trace), default=str) + "\n")
+        self._prune()
+
+    def _prune(self):
+        files = [
+            os.path.join(self.directory, name)
+            for name in os.listdir(self.directory)
+            if name.endswith(".trace.json")
+        ]
+        if len(files) <= self.max_files:
+            return
+        files.sort(key=os.path.getmtime)
+        for path in files[: len(files) - self.max_files]:
+            os.remove(path)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "sample_rate": sampler.rate,
+            "max_traces_per_sec": sampler.per_second,
+            "exported": self.exported,
+            "dropped": self.dropped,
+            "backlog": self._queue.qsize(),
+            "directory": self.directory,
+        }
+
+
+exporter = TraceExporter()
+
+
+def _url_without_query(url: str) -> str:
+    # Query strings carry API keys (e.g. the Google Maps key); never record them.
+    return str(url).split("?", 1)[0]
+
+
+_instrumented = False
+
+
+def instrument_http():
+    """Trace outbound HTTP made with requests and httplib2 (googleapiclient). Safe to call more than once."""
+    global _instrumented
+    if _instrumented:
+        return
+    _instrumented = True
+
+    try:
+        import requests
+    except ImportError:
+        requests = None
+    if requests is not None:
+        send = requests.Session.send
+
+        def traced_send(session, request, **kwargs):
+            child = start_span(f"HTTP {request.method}", KIND_CLIENT, url=_url_without_query(request.url))
+            if child is None:
+                return send(session, request, **kwargs)
+            with use_span(child):
+                response = send(session, request, **kwargs)
+                child.set("http.status_code", response.status_code)
+                return response
+
+        requests.Session.send = traced_send
+
+    try:
+        import httplib2
+    except ImportError:
+        httplib2 = None
+    if httplib2 is not None:
+        http_request = httplib2.Http.request
+
+        def traced_request(http, uri, method="GET", *args, **kwargs):
+            child = start_span(f"HTTP {method}", KIND_CLIENT, url=_url_without_query(uri))
+            if child is None:
+                return http_request(http, uri, method, *args, **kwargs)
+            with use_span(child):
+                response, content = http_request(http, uri, method, *args, **kwargs)
+                child.set("http.status_code", getattr(response, "status", 0))
+                return response, content
+
+        httplib2.Http.request = traced_request
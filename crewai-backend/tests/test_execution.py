@@ -0,0 +1,87 @@
+from types import SimpleNamespace
+
+import pytest
+
+from apex_ai_hierarchical_life_companion.execution import dependency_levels, plan_parallel_execution
+
+
+def make_tasks(*contexts):
+    """Tasks named t0, t1, ... whose context is the listed indexes, or implicit for None."""
+    tasks = []
+    for index, context in enumerate(contexts):
+        upstream = None if context is None else [tasks[i] for i in context]
+        tasks.append(SimpleNamespace(name=f"t{index}", context=upstream, async_execution=False))
+    return tasks
+
+
+def waits_for(ordered):
+    """
+    For each task, the tasks CrewAI has finished when it starts: async tasks
+    run until the next synchronous task, which waits for all of them first.
+    """
+    finished, pending, seen = set(), [], {}
+    for task in ordered:
+        if task.async_execution:
+            seen[task.name] = set(finished)
+            pending.append(task.name)
+        else:
+            finished.update(pending)
+            pending.clear()
+            seen[task.name] = set(finished)
+            finished.add(task.name)
+    return seen
+
+
+def upstream_names(task, tasks):
+    context = task.context if task.context is not None else tasks[: tasks.index(task)]
+    return {dep.name for dep in context}
+
+
+def test_dependency_levels():
+    assert dependency_levels(make_tasks([], [], [0, 1])) == [0, 0, 1]
+    assert dependency_levels(make_tasks([], [], [0, 1], [0, 1])) == [0, 0, 1, 1]
+    assert dependency_levels(make_tasks(None, None, None)) == [0, 1, 2]
+    assert dependency_levels(make_tasks([], [0], [], [1, 2])) == [0, 1, 0, 2]
+
+
+@pytest.mark.parametrize(
+    "contexts",
+    [
+        ([], [], [0, 1]),
+        ([], [], [0, 1], [0, 1]),
+        ([], [], [0, 1], [0, 1], [2, 3]),
+        ([], [], [], [0], [1, 2], [3, 4]),
+        ([], [0], [], [1, 2]),
+        (None, None, None),
+    ],
+)
+def test_plan_starts_tasks_after_their_upstream_tasks(contexts):
+    tasks = make_tasks(*contexts)
+    ordered = plan_parallel_execution(tasks, enabled=True)
+    assert sorted(task.name for task in ordered) == sorted(task.name for task in tasks)
+    assert not (ordered[-1].async_execution and ordered[-2].async_execution)
+    seen = waits_for(ordered)
+    for task in tasks:
+        assert upstream_names(task, tasks) <= seen[task.name], task.name
+
+
+def test_plan_runs_first_level_concurrently():
+    ordered = plan_parallel_execution(make_tasks([], [], [0, 1]), enabled=True)
+    assert [task.async_execution for task in ordered] == [True, True, False]
+
+    # The first task of the second level is the barrier, so only the first level runs fully in parallel
+    ordered = plan_parallel_execution(make_tasks([], [], [0, 1], [0, 1]), enabled=True)
+    assert [task.async_execution for task in ordered] == [True, True, False, True]
+    seen = waits_for(ordered)
+    assert seen["t0"] == seen["t1"] == set()
+
+
+def test_plan_ends_on_at_most_one_async_task():
+    ordered = plan_parallel_execution(make_tasks([], [], [0, 1], [0, 1], [0, 1]), enabled=True)
+    assert [task.async_execution for task in ordered] == [True, True, False, True, False]
+
+
+def test_plan_disabled_keeps_declared_order():
+    tasks = make_tasks([], [], [0, 1])
+    assert plan_parallel_execution(tasks, enabled=False) == tasks
+    assert not any(task.async_execution for task in tasks)